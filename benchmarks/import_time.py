@@ -0,0 +1,80 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Times the cold start of up_pyperplan: every statement is run, and timed, in a new interpreter,
+and the median over the repetitions is reported, together with the heavy modules it loaded.
+
+The "eager" statement also imports what the engine used to import when it was imported: ConfigSpace,
+pyperplan.planner with all the search and heuristic modules, the optional modules of the engine, and the
+version, that runs git in a checkout. unified_planning.engines is the part of unified_planning that the engine
+can not do without: with the versions of unified_planning that import ConfigSpace themselves, it takes most of
+the time, and the difference between the statements is the time of up_pyperplan alone.
+
+    python -m benchmarks.import_time --repeat 10
+"""
+
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+
+STATEMENTS = [
+    ('unified_planning.engines', 'import unified_planning.engines'),
+    ('up_pyperplan', 'import up_pyperplan'),
+    ('up_pyperplan.engine', 'import up_pyperplan.engine'),
+    ('EngineImpl()', 'import up_pyperplan.engine; up_pyperplan.engine.EngineImpl()'),
+    ('eager', 'import ConfigSpace, pyperplan.planner, up_pyperplan, up_pyperplan.engine, up_pyperplan.autoconfig, '
+              'up_pyperplan.batch, up_pyperplan.search, up_pyperplan.pruning, up_pyperplan.custom_heuristic; up_pyperplan.__version__'),
+]
+
+HEAVY_MODULES = ['ConfigSpace', 'pyperplan.planner', 'pyperplan.search', 'pyperplan.grounding', 'subprocess', 'multiprocessing',
+                 'concurrent.futures', 'mmap', 'numpy', 'scipy']
+
+_CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"time": elapsed, "modules": [m for m in {modules!r} if m in sys.modules]}}))
+'''
+
+
+def measure(statement: str, repeat: int) -> Dict:
+    '''Runs statement in repeat new interpreters, returning the median time and the heavy modules loaded.'''
+    times: List[float] = []
+    modules: List[str] = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', _CHILD.format(statement=statement, modules=HEAVY_MODULES)])
+        data = json.loads(output.decode().strip().splitlines()[-1])
+        times.append(data['time'])
+        modules = data['modules']
+    return {'median': statistics.median(times), 'min': min(times), 'modules': modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    print(f'{"statement":>26} {"median":>9} {"min":>9}  modules loaded')
+    for name, statement in STATEMENTS:
+        result = measure(statement, args.repeat)
+        print(f'{name:>26} {result["median"]:>8.3f}s {result["min"]:>8.3f}s  {", ".join(result["modules"])}')
+
+
+if __name__ == '__main__':
+    main()
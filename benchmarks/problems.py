@@ -0,0 +1,255 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Scalable STRIPS problem families, built with the unified_planning API.
+
+Every generator takes the size of the problem, the number of blocks, packages or balls, and a
+seed; the same size and seed always give the same problem.
+"""
+
+
+import random
+from typing import Callable, Dict, List
+import unified_planning as up
+from unified_planning.shortcuts import BoolType, Fluent, InstantaneousAction, Object, Problem, UserType
+
+
+def _towers(blocks: List['up.model.Object'], rng: random.Random) -> List[List['up.model.Object']]:
+    '''Returns the blocks shuffled and split in random towers, each one listed from the bottom.'''
+    blocks = list(blocks)
+    rng.shuffle(blocks)
+    towers: List[List['up.model.Object']] = []
+    for b in blocks:
+        if towers and rng.random() < 0.6:
+            rng.choice(towers).append(b)
+        else:
+            towers.append([b])
+    return towers
+
+
+def blocksworld(size: int, seed: int = 0) -> 'up.model.Problem':
+    '''Blocksworld with a gripper and size blocks, from random towers to other random towers.'''
+    rng = random.Random(seed)
+    Block = UserType("Block")
+    on = Fluent("on", BoolType(), x=Block, y=Block)
+    ontable = Fluent("ontable", BoolType(), x=Block)
+    clear = Fluent("clear", BoolType(), x=Block)
+    handempty = Fluent("handempty", BoolType())
+    holding = Fluent("holding", BoolType(), x=Block)
+
+    pickup = InstantaneousAction("pickup", x=Block)
+    x, = pickup.parameters
+    pickup.add_precondition(clear(x))
+    pickup.add_precondition(ontable(x))
+    pickup.add_precondition(handempty())
+    pickup.add_effect(holding(x), True)
+    pickup.add_effect(ontable(x), False)
+    pickup.add_effect(clear(x), False)
+    pickup.add_effect(handempty(), False)
+
+    putdown = InstantaneousAction("putdown", x=Block)
+    x, = putdown.parameters
+    putdown.add_precondition(holding(x))
+    putdown.add_effect(ontable(x), True)
+    putdown.add_effect(clear(x), True)
+    putdown.add_effect(handempty(), True)
+    putdown.add_effect(holding(x), False)
+
+    stack = InstantaneousAction("stack", x=Block, y=Block)
+    x, y = stack.parameters
+    stack.add_precondition(holding(x))
+    stack.add_precondition(clear(y))
+    stack.add_effect(on(x, y), True)
+    stack.add_effect(clear(x), True)
+    stack.add_effect(handempty(), True)
+    stack.add_effect(holding(x), False)
+    stack.add_effect(clear(y), False)
+
+    unstack = InstantaneousAction("unstack", x=Block, y=Block)
+    x, y = unstack.parameters
+    unstack.add_precondition(on(x, y))
+    unstack.add_precondition(clear(x))
+    unstack.add_precondition(handempty())
+    unstack.add_effect(holding(x), True)
+    unstack.add_effect(clear(y), True)
+    unstack.add_effect(on(x, y), False)
+    unstack.add_effect(clear(x), False)
+    unstack.add_effect(handempty(), False)
+
+    problem = Problem(f'blocksworld{size}')
+    for f in [on, ontable, clear, handempty, holding]:
+        problem.add_fluent(f, default_initial_value=False)
+    problem.add_actions([pickup, putdown, stack, unstack])
+    blocks = [Object(f'b{i}', Block) for i in range(size)]
+    problem.add_objects(blocks)
+    problem.set_initial_value(handempty(), True)
+    initial_pairs = set()
+    for tower in _towers(blocks, rng):
+        problem.set_initial_value(ontable(tower[0]), True)
+        problem.set_initial_value(clear(tower[-1]), True)
+        for below, above in zip(tower, tower[1:]):
+            problem.set_initial_value(on(above, below), True)
+            initial_pairs.add((above, below))
+    # the goal towers are drawn again until some goal is not already true
+    while True:
+        goal_pairs = [(above, below) for tower in _towers(blocks, rng) for below, above in zip(tower, tower[1:])]
+        if size < 2 or any(pair not in initial_pairs for pair in goal_pairs):
+            break
+    for above, below in goal_pairs:
+        problem.add_goal(on(above, below))
+    return problem
+
+
+def logistics(size: int, seed: int = 0) -> 'up.model.Problem':
+    '''Logistics with size packages, max(2, size // 2) cities of two locations, one of them an airport,
+    a truck per city and an airplane, moving the packages between random locations.'''
+    rng = random.Random(seed)
+    Locatable = UserType("Locatable")
+    Package = UserType("Package", Locatable)
+    Vehicle = UserType("Vehicle", Locatable)
+    Truck = UserType("Truck", Vehicle)
+    Airplane = UserType("Airplane", Vehicle)
+    Location = UserType("Location")
+    Airport = UserType("Airport", Location)
+    City = UserType("City")
+    at = Fluent("at", BoolType(), o=Locatable, l=Location)
+    inside = Fluent("in", BoolType(), p=Package, v=Vehicle)
+    in_city = Fluent("in_city", BoolType(), l=Location, c=City)
+
+    load_truck = InstantaneousAction("load_truck", p=Package, t=Truck, l=Location)
+    p, t, l = load_truck.parameters
+    load_truck.add_precondition(at(t, l))
+    load_truck.add_precondition(at(p, l))
+    load_truck.add_effect(at(p, l), False)
+    load_truck.add_effect(inside(p, t), True)
+
+    unload_truck = InstantaneousAction("unload_truck", p=Package, t=Truck, l=Location)
+    p, t, l = unload_truck.parameters
+    unload_truck.add_precondition(at(t, l))
+    unload_truck.add_precondition(inside(p, t))
+    unload_truck.add_effect(inside(p, t), False)
+    unload_truck.add_effect(at(p, l), True)
+
+    load_airplane = InstantaneousAction("load_airplane", p=Package, a=Airplane, l=Airport)
+    p, a, l = load_airplane.parameters
+    load_airplane.add_precondition(at(p, l))
+    load_airplane.add_precondition(at(a, l))
+    load_airplane.add_effect(at(p, l), False)
+    load_airplane.add_effect(inside(p, a), True)
+
+    unload_airplane = InstantaneousAction("unload_airplane", p=Package, a=Airplane, l=Airport)
+    p, a, l = unload_airplane.parameters
+    unload_airplane.add_precondition(inside(p, a))
+    unload_airplane.add_precondition(at(a, l))
+    unload_airplane.add_effect(inside(p, a), False)
+    unload_airplane.add_effect(at(p, l), True)
+
+    drive_truck = InstantaneousAction("drive_truck", t=Truck, f=Location, to=Location, c=City)
+    t, f, to, c = drive_truck.parameters
+    drive_truck.add_precondition(at(t, f))
+    drive_truck.add_precondition(in_city(f, c))
+    drive_truck.add_precondition(in_city(to, c))
+    drive_truck.add_effect(at(t, f), False)
+    drive_truck.add_effect(at(t, to), True)
+
+    fly_airplane = InstantaneousAction("fly_airplane", a=Airplane, f=Airport, to=Airport)
+    a, f, to = fly_airplane.parameters
+    fly_airplane.add_precondition(at(a, f))
+    fly_airplane.add_effect(at(a, f), False)
+    fly_airplane.add_effect(at(a, to), True)
+
+    problem = Problem(f'logistics{size}')
+    for fl in [at, inside, in_city]:
+        problem.add_fluent(fl, default_initial_value=False)
+    problem.add_actions([load_truck, unload_truck, load_airplane, unload_airplane, drive_truck, fly_airplane])
+    locations: List['up.model.Object'] = []
+    airports: List['up.model.Object'] = []
+    for i in range(max(2, size // 2)):
+        city = Object(f'city{i}', City)
+        airport = Object(f'airport{i}', Airport)
+        office = Object(f'office{i}', Location)
+        truck = Object(f'truck{i}', Truck)
+        problem.add_objects([city, airport, office, truck])
+        problem.set_initial_value(in_city(airport, city), True)
+        problem.set_initial_value(in_city(office, city), True)
+        problem.set_initial_value(at(truck, rng.choice([airport, office])), True)
+        locations.extend([airport, office])
+        airports.append(airport)
+    airplane = Object('airplane0', Airplane)
+    problem.add_object(airplane)
+    problem.set_initial_value(at(airplane, rng.choice(airports)), True)
+    for i in range(size):
+        package = Object(f'p{i}', Package)
+        problem.add_object(package)
+        start, goal = rng.sample(locations, 2)
+        problem.set_initial_value(at(package, start), True)
+        problem.add_goal(at(package, goal))
+    return problem
+
+
+def gripper(size: int, seed: int = 0) -> 'up.model.Problem':
+    '''Gripper with two rooms, a robot with two grippers and size balls to move from the first room to the second.'''
+    Room = UserType("Room")
+    Ball = UserType("Ball")
+    Gripper = UserType("Gripper")
+    at_robby = Fluent("at_robby", BoolType(), r=Room)
+    at = Fluent("at", BoolType(), b=Ball, r=Room)
+    free = Fluent("free", BoolType(), g=Gripper)
+    carry = Fluent("carry", BoolType(), b=Ball, g=Gripper)
+
+    move = InstantaneousAction("move", f=Room, t=Room)
+    f, t = move.parameters
+    move.add_precondition(at_robby(f))
+    move.add_effect(at_robby(t), True)
+    move.add_effect(at_robby(f), False)
+
+    pick = InstantaneousAction("pick", b=Ball, r=Room, g=Gripper)
+    b, r, g = pick.parameters
+    pick.add_precondition(at(b, r))
+    pick.add_precondition(at_robby(r))
+    pick.add_precondition(free(g))
+    pick.add_effect(carry(b, g), True)
+    pick.add_effect(at(b, r), False)
+    pick.add_effect(free(g), False)
+
+    drop = InstantaneousAction("drop", b=Ball, r=Room, g=Gripper)
+    b, r, g = drop.parameters
+    drop.add_precondition(carry(b, g))
+    drop.add_precondition(at_robby(r))
+    drop.add_effect(at(b, r), True)
+    drop.add_effect(free(g), True)
+    drop.add_effect(carry(b, g), False)
+
+    problem = Problem(f'gripper{size}')
+    for fl in [at_robby, at, free, carry]:
+        problem.add_fluent(fl, default_initial_value=False)
+    problem.add_actions([move, pick, drop])
+    rooma, roomb = Object('rooma', Room), Object('roomb', Room)
+    grippers = [Object('left', Gripper), Object('right', Gripper)]
+    balls = [Object(f'ball{i}', Ball) for i in range(size)]
+    problem.add_objects([rooma, roomb] + grippers + balls)
+    problem.set_initial_value(at_robby(rooma), True)
+    for g in grippers:
+        problem.set_initial_value(free(g), True)
+    for ball in balls:
+        problem.set_initial_value(at(ball, rooma), True)
+        problem.add_goal(at(ball, roomb))
+    return problem
+
+
+FAMILIES: Dict[str, Callable[[int, int], 'up.model.Problem']] = {
+    'blocksworld': blocksworld,
+    'logistics': logistics,
+    'gripper': gripper,
+}
@@ -0,0 +1,129 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Times up_pyperplan.grounder.rewrite_back_task on synthetic tasks with a growing number of
+operators, against the previous implementation that checked the fresh names and added the
+actions one at a time on the Problem, taking quadratic time.
+
+The previous implementation is only run on the tasks with at most --legacy-max operators, 20000 by
+default: it takes about a minute at 20000 operators and, growing quadratically, about half an hour
+at 100000, so with the defaults the row of 100000 operators reports no legacy time and no speedup.
+Pass a larger --legacy-max to time it there too.
+
+    python -m benchmarks.rewrite_back --operators 1000 10000 100000 --legacy-max 20000
+    python -m benchmarks.rewrite_back --operators 100000 --legacy-max 100000
+"""
+
+
+import argparse
+import math
+import time
+from typing import Dict, List, Tuple
+import unified_planning as up
+from unified_planning.shortcuts import BoolType, Fluent, InstantaneousAction, Object, Problem, UserType
+from pyperplan.task import Operator, Task # type: ignore
+from up_pyperplan.grounder import _change_notation, _get_original_action_and_parameters_name, rewrite_back_task
+
+
+def make_task(n_operators: int) -> Tuple[Task, 'up.model.Problem']:
+    '''Returns a grounded task with (at least) n_operators "move" operators between locations,
+    together with the lifted problem it comes from.'''
+    n_locations = max(2, math.ceil((1 + math.sqrt(1 + 4 * n_operators)) / 2))
+    Location = UserType("Location")
+    at = Fluent("at", BoolType(), l=Location)
+    move = InstantaneousAction("move", f=Location, t=Location)
+    f, t = move.parameters
+    move.add_precondition(at(f))
+    move.add_effect(at(t), True)
+    move.add_effect(at(f), False)
+    locations = [Object(f'l{i}', Location) for i in range(n_locations)]
+    problem = Problem(f'move{n_operators}')
+    problem.add_fluent(at, default_initial_value=False)
+    problem.add_action(move)
+    problem.add_objects(locations)
+    problem.set_initial_value(at(locations[0]), True)
+    problem.add_goal(at(locations[-1]))
+    facts = [f'(at {l.name})' for l in locations]
+    operators = [Operator(f'(move {a.name} {b.name})', {fa}, {fb}, {fa})
+                 for a, fa in zip(locations, facts) for b, fb in zip(locations, facts) if a != b]
+    task = Task(problem.name, set(facts), {facts[0]}, {facts[-1]}, operators)
+    return (task, problem)
+
+
+def _legacy_get_fresh_name(new_problem: 'up.model.Problem', name: str) -> str:
+    new_name = name
+    count = 0
+    while(new_problem.has_name(new_name)):
+        new_name = f'{name}_{str(count)}'
+        count += 1
+    return new_name
+
+
+def legacy_rewrite_back_task(task: Task, original_problem: 'up.model.Problem') -> Tuple['up.model.Problem', Dict]:
+    '''The implementation of rewrite_back_task before the name index and the bulk insertion.'''
+    grounded_problem = up.model.Problem(task.name, original_problem.environment)
+    rewrite_back_map: Dict = {}
+    vars_to_fluent_map: Dict[str, 'up.model.FNode'] = {}
+    for f in original_problem.fluents:
+        grounded_problem.add_fluent(f, default_initial_value=False)
+    grounded_problem.add_objects(original_problem.all_objects)
+    for fact in task.facts:
+        fluent_name, object_names = _get_original_action_and_parameters_name(fact)
+        objects = [original_problem.object(n) for n in object_names]
+        fluent = original_problem.fluent(fluent_name)
+        vars_to_fluent_map[fact] = fluent(*objects)
+    for init in task.initial_state:
+        grounded_problem.set_initial_value(vars_to_fluent_map[init], True)
+    for goal in task.goals:
+        grounded_problem.add_goal(vars_to_fluent_map[goal])
+    for operator in task.operators:
+        new_action = up.model.InstantaneousAction(_legacy_get_fresh_name(grounded_problem, _change_notation(operator.name)))
+        original_action_name, parameters_names = _get_original_action_and_parameters_name(operator.name)
+        for prec in operator.preconditions:
+            new_action.add_precondition(vars_to_fluent_map[prec])
+        for fluent_to_add in operator.add_effects:
+            new_action.add_effect(vars_to_fluent_map[fluent_to_add], True)
+        for fluent_to_del in operator.del_effects:
+            new_action.add_effect(vars_to_fluent_map[fluent_to_del], False)
+        grounded_problem.add_action(new_action)
+        parameters: List['up.model.Object'] = [original_problem.object(p) for p in parameters_names]
+        rewrite_back_map[new_action] = (original_problem.action(original_action_name), original_problem.environment.expression_manager.auto_promote(parameters))
+    return (grounded_problem, rewrite_back_map)
+
+
+def _time(function, task: Task, problem: 'up.model.Problem') -> float:
+    start = time.perf_counter()
+    function(task, problem)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--operators', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=20000,
+                        help='largest number of operators the legacy implementation is run on, as it is quadratic')
+    args = parser.parse_args()
+    print(f'{"operators":>10} {"rewrite_back_task":>18} {"legacy":>10} {"speedup":>8}')
+    for n in args.operators:
+        task, problem = make_task(n)
+        new_time = _time(rewrite_back_task, task, problem)
+        if n <= args.legacy_max:
+            legacy_time = _time(legacy_rewrite_back_task, task, problem)
+            print(f'{len(task.operators):>10} {new_time:>17.3f}s {legacy_time:>9.3f}s {legacy_time / new_time:>7.1f}x')
+        else:
+            print(f'{len(task.operators):>10} {new_time:>17.3f}s {"-":>10} {"-":>8}  (legacy not run, above --legacy-max)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmarks the pyperplan engine on the problem families of benchmarks.problems and compares
+the results with a baseline.
+
+For every problem, the conversion of the domain and of the problem, the grounding and
+rewrite_back_task are timed, then the problem is solved with every (search, heuristic)
+configuration of EngineImpl.get_configuration_space, recording the time of every phase,
+the search counters and the peak memory. The searches that do not use an heuristic are run
+once, and sat only if minisat is on the path.
+Every run is done in its own process, forked from a server that only imported the planning
+libraries, so the peak memory is the one of that run, and in a temporary working directory, where
+the sat search writes its files.
+
+    python -m benchmarks.runner --output results.json
+    python -m benchmarks.runner --families gripper logistics --sizes 4 8 --baseline results.json --threshold 0.25
+    python -m benchmarks.runner --performance-model model.jsonl
+
+The results are written as JSON; with --baseline, the runs whose times or peak memory grew
+more than the threshold, or that no longer find a plan, are reported, and the exit code is 1.
+With --performance-model, the searches are recorded in that file, that trains the "auto" search.
+"""
+
+
+import argparse
+import importlib.metadata
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from benchmarks.problems import FAMILIES
+
+
+TIME_METRICS = ['convert_domain_time', 'convert_problem_time', 'ground_time', 'rewrite_back_time',
+                'conversion_time', 'grounding_time', 'heuristic_init_time', 'search_time', 'total_time']
+
+COUNT_METRICS = ['expanded_nodes', 'generated_nodes', 'ground_operators', 'ground_facts']
+
+SOLVED = ['SOLVED_SATISFICING', 'SOLVED_OPTIMALLY']
+
+# configuration name of the runs of the grounding pipeline, without a search
+GROUNDING = 'grounding'
+
+# (family, size, configuration)
+RunKey = Tuple[str, int, str]
+
+
+def configurations(searches: Optional[List[str]] = None, heuristics: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+    '''Returns the (search, heuristic) pairs of the configuration space of EngineImpl, restricted to the given searches
+    and heuristics; the searches that do not use an heuristic are paired with "blind" only.'''
+    from up_pyperplan.engine import EngineImpl
+    from up_pyperplan.portfolio import BLIND_SEARCHES
+    space = EngineImpl.get_configuration_space()
+    result = []
+    for search in space['search'].choices:
+        if (searches is not None and search not in searches) or (search == 'sat' and shutil.which('minisat') is None):
+            continue
+        for heuristic in space['heuristic'].choices:
+            if heuristics is not None and heuristic not in heuristics:
+                continue
+            if search in BLIND_SEARCHES and heuristic != 'blind':
+                continue
+            result.append((search, heuristic))
+    return result
+
+
+def _peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _run_grounding(family: str, size: int, seed: int) -> Dict[str, Any]:
+    '''Times the steps of the grounding pipeline, up to rewrite_back_task, on a problem.'''
+    from pyperplan.planner import _ground # type: ignore
+    from up_pyperplan.engine import EngineImpl
+    from up_pyperplan.grounder import rewrite_back_task
+    problem = FAMILIES[family](size, seed)
+    engine = EngineImpl()
+    engine.pyp_types = {}
+    start = time.perf_counter()
+    domain = engine._convert_domain(problem)
+    domain_end = time.perf_counter()
+    prob = engine._convert_problem(domain, problem)
+    problem_end = time.perf_counter()
+    task = _ground(prob)
+    ground_end = time.perf_counter()
+    rewrite_back_task(task, problem)
+    end = time.perf_counter()
+    return {'status': 'GROUNDED', 'convert_domain_time': domain_end - start, 'convert_problem_time': problem_end - domain_end,
+            'ground_time': ground_end - problem_end, 'rewrite_back_time': end - ground_end, 'total_time': end - start,
+            'ground_operators': len(task.operators), 'ground_facts': len(task.facts), 'peak_rss_bytes': _peak_rss()}
+
+
+def _run_search(family: str, size: int, seed: int, search: str, heuristic: str, timeout: float,
+                memory_limit: Optional[int], performance_model: Optional[str]) -> Dict[str, Any]:
+    '''Solves a problem with a configuration of the engine, returning the status, the plan length and the metrics.'''
+    from up_pyperplan.engine import EngineImpl
+    problem = FAMILIES[family](size, seed)
+    engine = EngineImpl(search=search, heuristic=heuristic, memory_limit=memory_limit, performance_model=performance_model)
+    with tempfile.TemporaryDirectory() as working_directory:
+        # the sat search writes the formula and the output of minisat in the working directory
+        os.chdir(working_directory)
+        start = time.perf_counter()
+        result = engine.solve(problem, timeout=timeout)
+        end = time.perf_counter()
+    if isinstance(result, list):
+        result = result[0]
+    record: Dict[str, Any] = {'status': result.status.name, 'total_time': end - start,
+                              'plan_length': len(result.plan.actions) if result.plan is not None else None}
+    for name in TIME_METRICS:
+        if name in result.metrics:
+            record[name] = float(result.metrics[name])
+    for name in COUNT_METRICS:
+        if name in result.metrics:
+            record[name] = int(result.metrics[name])
+    record['peak_rss_bytes'] = _peak_rss()
+    return record
+
+
+def _in_new_process(context, function, *args) -> Dict[str, Any]:
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        try:
+            return pool.apply(function, args)
+        except Exception as e:
+            return {'status': 'ERROR', 'error': f'{type(e).__name__}: {e}'}
+
+
+def _best(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    '''Merges the records of the repetitions of a run, keeping the minimum of every time and of the memory.'''
+    best = dict(records[0])
+    for record in records[1:]:
+        for name in TIME_METRICS + ['peak_rss_bytes']:
+            if name in record and name in best:
+                best[name] = min(best[name], record[name])
+    return best
+
+
+def environment() -> Dict[str, Any]:
+    '''Returns the versions of python and of the planning libraries, and the machine the benchmarks run on.'''
+    versions: Dict[str, Optional[str]] = {}
+    for package in ['unified-planning', 'pyperplan', 'up-pyperplan', 'ConfigSpace']:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine(),
+            'packages': versions, 'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def run(families: List[str], sizes: List[int], configs: List[Tuple[str, str]], timeout: float, seed: int = 0,
+        repeat: int = 1, memory_limit: Optional[int] = None, verbose: bool = True,
+        performance_model: Optional[str] = None) -> Dict[str, Any]:
+    '''Runs the benchmarks and returns the results, that can be written as JSON; the runs of the searches are
+    also recorded in the file of the performance model of the "auto" search, if given.'''
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['unified_planning.shortcuts', 'pyperplan.planner', 'up_pyperplan.engine', 'benchmarks.problems'])
+    results = []
+    for family in families:
+        for size in sizes:
+            jobs: List[Tuple[str, Any, tuple]] = [(GROUNDING, _run_grounding, (family, size, seed))]
+            jobs.extend((f'{s}/{h}', _run_search, (family, size, seed, s, h, timeout, memory_limit, performance_model))
+                        for s, h in configs)
+            for name, function, args in jobs:
+                record = _best([_in_new_process(context, function, *args) for _ in range(repeat)])
+                record.update({'family': family, 'size': size, 'configuration': name})
+                results.append(record)
+                if verbose:
+                    print(f'{family:>12} {size:>4} {name:>16} {record["status"]:>24} {record.get("total_time", float("nan")):>9.3f}s '
+                          f'{record.get("peak_rss_bytes", 0) / 2**20:>8.1f} MB', flush=True)
+    return {'environment': environment(), 'timeout': timeout, 'seed': seed, 'repeat': repeat, 'results': results}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_time: float = 0.01,
+            min_memory: int = 2**20) -> List[str]:
+    '''Returns the regressions of results with respect to baseline: the times and the peak memory that grew
+    more than threshold, a fraction of the baseline, and more than min_time seconds or min_memory bytes, and
+    the runs that found a plan in the baseline and no longer do.'''
+    def by_key(data: Dict[str, Any]) -> Dict[RunKey, Dict[str, Any]]:
+        return {(r['family'], r['size'], r['configuration']): r for r in data['results']}
+
+    old_records = by_key(baseline)
+    regressions = []
+    for key, new in sorted(by_key(results).items()):
+        old = old_records.get(key, None)
+        if old is None:
+            continue
+        run_name = '/'.join(str(k) for k in key)
+        if old['status'] in SOLVED and new['status'] not in SOLVED:
+            regressions.append(f'{run_name}: {old["status"]} -> {new["status"]}')
+            continue
+        for name, minimum in [(n, min_time) for n in TIME_METRICS] + [('peak_rss_bytes', min_memory)]:
+            if name in old and name in new and new[name] > old[name] * (1 + threshold) and new[name] - old[name] > minimum:
+                regressions.append(f'{run_name}: {name} {old[name]:.6g} -> {new[name]:.6g} (+{100 * (new[name] / old[name] - 1):.0f}%)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--families', nargs='+', choices=sorted(FAMILIES), default=sorted(FAMILIES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 6, 8])
+    parser.add_argument('--searches', nargs='+', help='only run these searches')
+    parser.add_argument('--heuristics', nargs='+', help='only run these heuristics')
+    parser.add_argument('--timeout', type=float, default=60.0, help='timeout of every run, in seconds')
+    parser.add_argument('--memory-limit', type=int, help='memory limit of every run, in MB')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help='runs of every configuration, the best times are kept')
+    parser.add_argument('--output', help='file where the results are written as JSON')
+    parser.add_argument('--performance-model', help='performance model file of the "auto" search where the runs are recorded')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative growth of a time or of the peak memory reported as a regression')
+    parser.add_argument('--min-time', type=float, default=0.01,
+                        help='growth, in seconds, below which a time is never reported as a regression')
+    args = parser.parse_args()
+    results = run(args.families, args.sizes, configurations(args.searches, args.heuristics), args.timeout,
+                  args.seed, args.repeat, args.memory_limit,
+                  performance_model=os.path.abspath(args.performance_model) if args.performance_model is not None else None)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_time)
+        for r in regressions:
+            print(f'REGRESSION {r}')
+        print(f'{len(regressions)} regressions with respect to {args.baseline}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -22,5 +22,6 @@ setup(name='up_pyperplan',
       packages=['up_pyperplan'],
       python_requires='>=3.7',
       install_requires=['pyperplan==2.1', 'ConfigSpace'],
+      extras_require={'vectorized': ['numpy']},
       license='APACHE'
      )
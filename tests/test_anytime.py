@@ -0,0 +1,78 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+import unified_planning as up
+from unified_planning.engines import PlanGenerationResultStatus
+from benchmarks.problems import gripper
+from up_pyperplan.engine import AnytimeEngineImpl, OptEngineImpl
+from tests import unwrap_result
+
+
+def _with_metric(problem):
+    problem.add_quality_metric(up.model.metrics.MinimizeSequentialPlanLength())
+    return problem
+
+
+class TestAnytime(unittest.TestCase):
+
+    def test_improving_plans(self):
+        problem = gripper(5)
+        results = list(AnytimeEngineImpl(heuristic="hadd", weights=[10, 5, 2, 1]).get_solutions(problem))
+        intermediate = results[:-1]
+        self.assertGreaterEqual(len(intermediate), 2)
+        self.assertTrue(all(r.status == PlanGenerationResultStatus.INTERMEDIATE for r in intermediate))
+        lengths = [len(r.plan.actions) for r in intermediate]
+        self.assertTrue(all(a > b for a, b in zip(lengths, lengths[1:])), lengths)
+        self.assertEqual(len(results[-1].plan.actions), lengths[-1])
+        for r in results:
+            validation = up.engines.SequentialPlanValidator().validate(problem, r.plan)
+            self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+
+    def test_optimal(self):
+        problem = _with_metric(gripper(4))
+        optimal = unwrap_result(OptEngineImpl().solve(problem))
+        for heuristic in ["lmcut", "hmax"]:
+            with self.subTest(heuristic=heuristic):
+                results = list(AnytimeEngineImpl(heuristic=heuristic).get_solutions(problem))
+                self.assertEqual(results[-1].status, PlanGenerationResultStatus.SOLVED_OPTIMALLY)
+                self.assertEqual(len(results[-1].plan.actions), len(optimal.plan.actions))
+
+    def test_exhausted(self):
+        # hff is not admissible, but once the bounded search space is exhausted the last plan is proven optimal
+        problem = _with_metric(gripper(4))
+        results = list(AnytimeEngineImpl(heuristic="hff").get_solutions(problem))
+        self.assertEqual(results[-1].status, PlanGenerationResultStatus.SOLVED_OPTIMALLY)
+
+    def test_satisficing(self):
+        # without a quality metric the plans are never optimal
+        results = list(AnytimeEngineImpl(heuristic="lmcut").get_solutions(gripper(4)))
+        self.assertEqual(results[-1].status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+        # the node limit is reached after the first plan, before its optimality is proven
+        results = list(AnytimeEngineImpl(heuristic="hff", weights=[10, 5, 2, 1], node_limit=600).get_solutions(_with_metric(gripper(5))))
+        self.assertEqual([r.status for r in results], [PlanGenerationResultStatus.INTERMEDIATE, PlanGenerationResultStatus.SOLVED_SATISFICING])
+        self.assertEqual(results[-1].metrics["limit_reached"], "node_limit")
+        self.assertEqual(len(results[-1].plan.actions), len(results[0].plan.actions))
+
+    def test_unsolvable(self):
+        problem = gripper(2)
+        problem.add_goal(problem.fluent("at")(problem.object("ball0"), problem.object("rooma")))
+        results = list(AnytimeEngineImpl().get_solutions(problem))
+        self.assertEqual([r.status for r in results], [PlanGenerationResultStatus.UNSOLVABLE_PROVEN])
+        self.assertIsNone(results[0].plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+import unified_planning as up
+from unified_planning.engines import PlanGenerationResultStatus
+from benchmarks.problems import blocksworld, gripper, logistics
+from up_pyperplan.autoconfig import AUTO_CONFIGURATIONS, FEATURE_NAMES, PerformanceModel
+from up_pyperplan.engine import EngineImpl
+from tests import unwrap_result
+
+
+FEATURES = [0.0] * len(FEATURE_NAMES)
+
+
+class TestPerformanceModel(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'model.jsonl')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _train(self, model):
+        '''Runs every configuration once, the later ones taking longer.'''
+        for i, (search, heuristic) in enumerate(AUTO_CONFIGURATIONS):
+            model.record(FEATURES, search, heuristic, 1.0 + i, True)
+
+    def test_configurations_that_never_ran_first(self):
+        model = PerformanceModel(exploration=0)
+        selected = []
+        for i in range(len(AUTO_CONFIGURATIONS)):
+            search, heuristic = model.select(FEATURES)
+            selected.append((search, heuristic))
+            model.record(FEATURES, search, heuristic, 10.0 - i, True)
+        self.assertEqual(selected, AUTO_CONFIGURATIONS)
+        self.assertEqual(model.select(FEATURES), AUTO_CONFIGURATIONS[-1])
+
+    def test_prediction(self):
+        model = PerformanceModel(exploration=0)
+        self._train(model)
+        self.assertEqual(model.select(FEATURES), AUTO_CONFIGURATIONS[0])
+        model.record(FEATURES, *AUTO_CONFIGURATIONS[1], 0.5, True)
+        model.record(FEATURES, *AUTO_CONFIGURATIONS[0], 0.5, False)
+        self.assertEqual(model.select(FEATURES), AUTO_CONFIGURATIONS[1])
+        self.assertIsNone(model.predict(FEATURES, "bfs", None))
+
+    def test_exploration(self):
+        model = PerformanceModel(exploration=1)
+        self._train(model)
+        selected = {model.select(FEATURES) for _ in range(200)}
+        self.assertEqual(selected, set(AUTO_CONFIGURATIONS[1:]))
+        with self.assertRaises(up.exceptions.UPUsageError):
+            PerformanceModel(exploration=1.5)
+
+    def test_shared_file(self):
+        model = PerformanceModel(self.path)
+        self._train(model)
+        self.assertEqual(len(PerformanceModel(self.path)), len(AUTO_CONFIGURATIONS))
+
+    def test_invalid_lines(self):
+        self._train(PerformanceModel(self.path))
+        with open(self.path, 'a') as f:
+            f.write('{"features": [1\n\nnot json\n{"search": "gbf"}\n[]\n')
+        model = PerformanceModel(self.path)
+        self.assertEqual(len(model), len(AUTO_CONFIGURATIONS))
+        with open(self.path) as f:
+            self.assertEqual([json.loads(line)["search"] for line in f], [s for s, _ in AUTO_CONFIGURATIONS])
+
+    def test_compaction(self):
+        self._train(PerformanceModel(self.path))
+        model = PerformanceModel(self.path, max_records=3)
+        self.assertEqual(len(model), 3)
+        with open(self.path) as f:
+            self.assertEqual([json.loads(line)["search"] for line in f], [s for s, _ in AUTO_CONFIGURATIONS[-3:]])
+        model.record(FEATURES, "gbf", "hff", 1.0, True)
+        self.assertEqual(len(model), 3)
+        self.assertEqual(len(PerformanceModel(self.path, max_records=10)), 4)
+
+    def test_absolute_path(self):
+        cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        try:
+            model = PerformanceModel('model.jsonl')
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(model.path, self.path)
+
+
+class TestAutoSearch(unittest.TestCase):
+
+    def test_solve(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.jsonl')
+            engine = EngineImpl(search="auto", performance_model=path)
+            for problem in [gripper(3), blocksworld(4), logistics(2)]:
+                with self.subTest(problem=problem.name):
+                    result = unwrap_result(engine.solve(problem))
+                    self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+                    self.assertIn(tuple(result.metrics["auto_configuration"].split('/')), AUTO_CONFIGURATIONS)
+                    validation = up.engines.SequentialPlanValidator().validate(problem, result.plan)
+                    self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+            self.assertEqual(len(PerformanceModel(path)), 3)
+
+    def test_engine_not_modified(self):
+        engine = EngineImpl(search="auto")
+        results = []
+
+        def solve():
+            results.append(unwrap_result(engine.solve(blocksworld(4))).metrics["auto_configuration"])
+        threads = [threading.Thread(target=solve) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(results), 3)
+        self.assertEqual(engine._search_name, "auto")
+        self.assertEqual(engine._heuristic_name, "hadd")
+
+    def test_optimality(self):
+        problem = gripper(2)
+        problem.add_quality_metric(up.model.metrics.MinimizeSequentialPlanLength())
+        model = PerformanceModel(exploration=0)
+        engine = EngineImpl(search="auto")
+        engine._performance_model = model
+        for search, heuristic in AUTO_CONFIGURATIONS:
+            model.record(FEATURES, search, heuristic, 1.0 if (search, heuristic) == ("astar", "lmcut") else 100.0, True)
+        result = unwrap_result(engine.solve(problem))
+        self.assertEqual(result.metrics["auto_configuration"], "astar/lmcut")
+        self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_OPTIMALLY)
+
+
+if __name__ == '__main__':
+    unittest.main()
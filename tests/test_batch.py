@@ -0,0 +1,65 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import unittest
+import unified_planning as up
+from unified_planning.engines import PlanGenerationResultStatus
+from unified_planning.shortcuts import Fluent, IntType
+from benchmarks.problems import blocksworld, gripper
+from up_pyperplan.engine import EngineImpl
+from tests import unwrap_result
+
+
+class TestSolveBatch(unittest.TestCase):
+
+    def test_same_plans(self):
+        problems = [gripper(3), blocksworld(4), gripper(5)]
+        results = dict((p.name, r) for p, r in EngineImpl().solve_batch(problems, max_workers=2))
+        self.assertEqual(sorted(results), sorted(p.name for p in problems))
+        for problem in problems:
+            with self.subTest(problem=problem.name):
+                result = results[problem.name]
+                self.assertEqual(str(result.plan), str(unwrap_result(EngineImpl().solve(problem)).plan))
+                self.assertEqual(result.engine_name, "Pyperplan")
+                # the plan refers to the actions of the problem given, not to a copy unpickled in the worker
+                self.assertIs(result.plan.actions[0].action, problem.action(result.plan.actions[0].action.name))
+
+    def test_timeout(self):
+        engine = EngineImpl(search="astar", heuristic="blind")
+        statuses = dict((p.name, r.status) for p, r in engine.solve_batch([gripper(12), gripper(2)], timeout=0.5, max_workers=1))
+        self.assertEqual(statuses, {"gripper12": PlanGenerationResultStatus.TIMEOUT,
+                                    "gripper2": PlanGenerationResultStatus.SOLVED_SATISFICING})
+
+    def test_memory_limit(self):
+        engine = EngineImpl(search="astar", heuristic="blind")
+        results = list(engine.solve_batch([gripper(12)], memory_limit=5, max_workers=1))
+        self.assertEqual(results[0][1].status, PlanGenerationResultStatus.MEMOUT)
+        results = list(engine.solve_batch([gripper(2)], memory_limit=100, max_workers=1))
+        self.assertEqual(results[0][1].status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+        with self.assertRaises(up.exceptions.UPUsageError):
+            list(engine.solve_batch([gripper(2)], memory_limit=0))
+
+    def test_errors(self):
+        problem = gripper(2)
+        problem.add_fluent(Fluent("fuel", IntType(0, 5)), default_initial_value=0)
+        results = dict((p.name, r) for p, r in EngineImpl().solve_batch([problem, gripper(3)], max_workers=1))
+        self.assertEqual(results["gripper2"].status, PlanGenerationResultStatus.INTERNAL_ERROR)
+        self.assertIn("error", results["gripper2"].metrics)
+        self.assertEqual(results["gripper3"].status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+from benchmarks.runner import compare
+
+
+def _results(*records):
+    return {'results': [dict(family='gripper', size=size, configuration=configuration, **metrics)
+                        for size, configuration, metrics in records]}
+
+
+class TestCompare(unittest.TestCase):
+
+    def setUp(self):
+        self.baseline = _results((4, 'gbf/hff', dict(status='SOLVED_SATISFICING', search_time=1.0, total_time=2.0, peak_rss_bytes=100 * 2**20)),
+                                 (6, 'gbf/hff', dict(status='SOLVED_SATISFICING', search_time=0.001, total_time=3.0)),
+                                 (8, 'astar/lmcut', dict(status='TIMEOUT', total_time=60.0)))
+
+    def test_no_regressions(self):
+        self.assertEqual(compare(self.baseline, self.baseline, 0.2), [])
+        # faster runs, growths below the threshold and runs not in the baseline are not regressions
+        results = _results((4, 'gbf/hff', dict(status='SOLVED_SATISFICING', search_time=0.5, total_time=2.3, peak_rss_bytes=110 * 2**20)),
+                           (6, 'gbf/hff', dict(status='SOLVED_SATISFICING', search_time=0.001, total_time=3.5)),
+                           (10, 'gbf/hff', dict(status='TIMEOUT', total_time=60.0)))
+        self.assertEqual(compare(results, self.baseline, 0.2), [])
+
+    def test_time_and_memory(self):
+        results = _results((4, 'gbf/hff', dict(status='SOLVED_SATISFICING', search_time=1.5, total_time=2.1, peak_rss_bytes=200 * 2**20)),
+                           (6, 'gbf/hff', dict(status='SOLVED_SATISFICING', search_time=0.005, total_time=3.0)))
+        self.assertEqual(compare(results, self.baseline, 0.2),
+                         ['gripper/4/gbf/hff: search_time 1 -> 1.5 (+50%)',
+                          'gripper/4/gbf/hff: peak_rss_bytes 1.04858e+08 -> 2.09715e+08 (+100%)'])
+        # the search time of size 6 grew 5 times, but by less than min_time seconds
+        self.assertEqual(len(compare(results, self.baseline, 0.2, min_time=0.001)), 3)
+        self.assertEqual(compare(results, self.baseline, 1.0), [])
+        self.assertEqual(compare(results, self.baseline, 0.2, min_memory=200 * 2**20), ['gripper/4/gbf/hff: search_time 1 -> 1.5 (+50%)'])
+
+    def test_no_longer_solved(self):
+        results = _results((4, 'gbf/hff', dict(status='TIMEOUT', search_time=60.0, total_time=60.0)),
+                           (8, 'astar/lmcut', dict(status='SOLVED_OPTIMALLY', total_time=50.0)))
+        # the times of a run that is no longer solved are not compared
+        self.assertEqual(compare(results, self.baseline, 0.2), ['gripper/4/gbf/hff: SOLVED_SATISFICING -> TIMEOUT'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import unittest
+import unified_planning as up
+from benchmarks.problems import blocksworld, gripper
+from up_pyperplan import planner
+from up_pyperplan.bitset import BitsetTask, decode_fluents
+from up_pyperplan.engine import EngineImpl
+from tests import unwrap_result
+
+
+def _ground(problem):
+    return planner.ground(EngineImpl()._convert(problem, None))
+
+
+class TestBitsetTask(unittest.TestCase):
+
+    def test_encode_decode(self):
+        task = _ground(gripper(3))
+        bitset_task = BitsetTask(task)
+        self.assertEqual(bitset_task.decode(bitset_task.initial_state), task.initial_state)
+        self.assertEqual(bitset_task.decode(bitset_task.goals), task.goals)
+        self.assertEqual(bitset_task.decode(0), frozenset())
+        self.assertEqual(bitset_task.decode(bitset_task.encode(task.facts)), task.facts)
+
+    def test_successors(self):
+        task = _ground(gripper(3))
+        bitset_task = BitsetTask(task)
+        state = task.initial_state
+        for _ in range(5):
+            expected = task.get_successor_states(state)
+            successors = bitset_task.get_successor_states(bitset_task.encode(state))
+            self.assertEqual([op for op, _ in successors], [op for op, _ in expected])
+            self.assertEqual([bitset_task.decode(s) for _, s in successors], [s for _, s in expected])
+            state = expected[-1][1]
+
+    def test_goal_reached(self):
+        task = _ground(gripper(2))
+        bitset_task = BitsetTask(task)
+        self.assertFalse(bitset_task.goal_reached(bitset_task.initial_state))
+        self.assertTrue(bitset_task.goal_reached(bitset_task.encode(task.goals)))
+        self.assertTrue(bitset_task.goal_reached(bitset_task.encode(task.facts)))
+
+    def test_decode_fluents(self):
+        task = _ground(gripper(2))
+        bitset_task = BitsetTask(task)
+        fluents = decode_fluents(bitset_task, [bitset_task.initial_state, bitset_task.goals])
+        self.assertEqual([frozenset(f) for f in fluents], [task.initial_state, task.goals])
+
+
+class TestBitsetSearch(unittest.TestCase):
+
+    def test_same_plans(self):
+        for search, heuristic in [("wastar", "hadd"), ("astar", "lmcut"), ("gbf", "hff"), ("bfs", "hadd"), ("ehs", "hff"),
+                                  ("astar", "landmark")]:
+            for problem in [gripper(4), blocksworld(4)]:
+                with self.subTest(search=search, heuristic=heuristic, problem=problem.name):
+                    frozenset_result = unwrap_result(EngineImpl(search=search, heuristic=heuristic).solve(problem))
+                    bitset_result = unwrap_result(EngineImpl(search=search, heuristic=heuristic,
+                                                              state_representation="bitset").solve(problem))
+                    self.assertEqual(bitset_result.status, frozenset_result.status)
+                    self.assertEqual(str(bitset_result.plan), str(frozenset_result.plan))
+
+    def test_unknown_representation(self):
+        with self.assertRaises(up.exceptions.UPUsageError):
+            EngineImpl(state_representation="bitarray")
+
+
+if __name__ == '__main__':
+    unittest.main()
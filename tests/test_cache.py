@@ -0,0 +1,97 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import unittest
+import unified_planning as up
+from unified_planning.engines import PlanGenerationResultStatus
+from benchmarks.problems import blocksworld, gripper
+from up_pyperplan.cache import GroundingCache, domain_key
+from up_pyperplan.engine import AnytimeEngineImpl, EngineImpl, OptEngineImpl
+from tests import unwrap_result
+
+
+class TestGroundingCache(unittest.TestCase):
+
+    def test_lru(self):
+        cache = GroundingCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats(), {'hits': 3, 'misses': 1, 'size': 2})
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_size(self):
+        with self.assertRaises(up.exceptions.UPUsageError):
+            GroundingCache(0)
+
+    def test_domain_key(self):
+        self.assertEqual(domain_key(gripper(3)), domain_key(gripper(5)))
+        self.assertNotEqual(domain_key(gripper(3)), domain_key(blocksworld(3)))
+
+
+class TestCachedSolve(unittest.TestCase):
+
+    def test_same_plans(self):
+        engine = EngineImpl(cache_size=4)
+        for i in range(4):
+            problem = gripper(4)
+            if i % 2:
+                # same domain, objects and static facts, other goals: the grounded operators are reused
+                problem.clear_goals()
+                problem.add_goal(problem.fluent("at_robby")(problem.object("roomb")))
+            with self.subTest(i=i):
+                expected = unwrap_result(EngineImpl().solve(problem))
+                cached = unwrap_result(engine.solve(problem))
+                self.assertEqual(str(cached.plan), str(expected.plan))
+        stats = engine.grounding_cache.stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['hits'], 6)
+        self.assertEqual(cached.metrics['cache_hits'], '6')
+
+    def test_other_objects(self):
+        engine = EngineImpl(cache_size=4)
+        for problem in [gripper(3), gripper(4), blocksworld(3), gripper(3)]:
+            with self.subTest(problem=problem.name):
+                expected = unwrap_result(EngineImpl().solve(problem))
+                self.assertEqual(str(unwrap_result(engine.solve(problem)).plan), str(expected.plan))
+
+    def test_interrupted(self):
+        # the counters of the cache are reported by the results without a plan too
+        engine = OptEngineImpl(cache_size=4, node_limit=50)
+        first, second = [unwrap_result(engine.solve(gripper(5))) for _ in range(2)]
+        for result in [first, second]:
+            self.assertEqual(result.status, PlanGenerationResultStatus.MEMOUT)
+            self.assertEqual(result.metrics['cache_misses'], first.metrics['cache_misses'])
+        self.assertEqual(first.metrics['cache_hits'], '0')
+        self.assertGreater(int(second.metrics['cache_hits']), 0)
+        results = list(AnytimeEngineImpl(cache_size=4, node_limit=50).get_solutions(gripper(4)))
+        self.assertEqual(results[-1].status, PlanGenerationResultStatus.MEMOUT)
+        self.assertIn('cache_misses', results[-1].metrics)
+
+    def test_no_cache(self):
+        engine = EngineImpl()
+        self.assertIsNone(engine.grounding_cache)
+        self.assertNotIn('cache_hits', unwrap_result(engine.solve(gripper(2))).metrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+from unified_planning.engines import PlanGenerationResultStatus
+from pyperplan.search.searchspace import make_child_node, make_root_node # type: ignore
+from benchmarks.problems import gripper
+from up_pyperplan import planner
+from up_pyperplan.bitset import BitsetTask
+from up_pyperplan.custom_heuristic import UPHeuristic
+from up_pyperplan.engine import EngineImpl
+from tests import unwrap_result
+
+
+class _Counter:
+    '''A heuristic, for single states or for lists of them, that records the states it is given.'''
+
+    def __init__(self, problem, batch: bool = False):
+        self._fluents = list(problem.initial_values)
+        self.batch = batch
+        self.calls = []
+
+    def key(self, state):
+        return frozenset(f for f in self._fluents if state.get_value(f).is_true())
+
+    def __call__(self, states):
+        if self.batch:
+            self.calls.append([self.key(s) for s in states])
+            return [0] * len(states)
+        self.calls.append([self.key(states)])
+        return 0
+
+    @property
+    def states(self):
+        return [s for call in self.calls for s in call]
+
+
+class TestUPHeuristic(unittest.TestCase):
+
+    def setUp(self):
+        self.problem = gripper(3)
+        self.task = planner.ground(EngineImpl()._convert(self.problem, None))
+
+    def _nodes(self, search_task):
+        '''Returns the root node and its children, with the children of the first one.'''
+        root = make_root_node(search_task.initial_state)
+        children = [make_child_node(root, op, s) for op, s in search_task.get_successor_states(root.state)]
+        grandchildren = [make_child_node(children[0], op, s) for op, s in search_task.get_successor_states(children[0].state)]
+        return [root] + children + grandchildren
+
+    def test_memoized(self):
+        for search_task in [self.task, BitsetTask(self.task)]:
+            with self.subTest(search_task=type(search_task).__name__):
+                function = _Counter(self.problem)
+                h = UPHeuristic(function, self.problem, self.task, search_task)
+                nodes = self._nodes(search_task)
+                for _ in range(3):
+                    for node in nodes:
+                        self.assertEqual(h(node), 0)
+                distinct = {node.state for node in nodes}
+                self.assertEqual(len(function.calls), len(distinct))
+                self.assertEqual(len(set(function.states)), len(distinct))
+                self.assertEqual(h.evaluations, len(distinct))
+
+    def test_batch(self):
+        function = _Counter(self.problem, batch=True)
+        h = UPHeuristic(function, self.problem, self.task, self.task, batch=True)
+        root, *others = self._nodes(self.task)
+        h(root)
+        self.assertEqual(len(function.calls), 1)
+        # the first child evaluated brings all its siblings in the same call
+        h(others[0])
+        siblings = {s for _op, s in self.task.get_successor_states(root.state)}
+        self.assertEqual(len(function.calls), 2)
+        self.assertEqual(len(function.calls[1]), len(siblings - {root.state}))
+        for node in others:
+            h(node)
+        distinct = {node.state for node in [root] + others}
+        self.assertEqual(len(function.states), len(set(function.states)))
+        self.assertEqual(len(set(function.states)), len(distinct))
+        self.assertLess(len(function.calls), len(distinct))
+
+
+class TestCustomHeuristicEngine(unittest.TestCase):
+
+    def test_every_state_once(self):
+        problem = gripper(3)
+        for batch in [False, True]:
+            with self.subTest(batch=batch):
+                function = _Counter(problem, batch)
+                result = unwrap_result(EngineImpl(search="gbf", heuristic="hff", batch_heuristic=batch).solve(problem, heuristic=function))
+                self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+                self.assertEqual(len(function.states), len(set(function.states)))
+                self.assertEqual(len(function.states), int(result.metrics["custom_heuristic_evaluations"]))
+                if batch:
+                    self.assertLess(len(function.calls), len(function.states))
+                else:
+                    self.assertEqual(len(function.calls), len(function.states))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import itertools
+import random
+import unittest
+import unified_planning as up
+from unified_planning.shortcuts import BoolType, Fluent, InstantaneousAction, Object, Problem, UserType
+from pyperplan.task import Operator, Task # type: ignore
+from benchmarks.problems import blocksworld, gripper
+from benchmarks.rewrite_back import make_task
+from up_pyperplan.engine import EngineImpl
+from up_pyperplan.grounder import lazy_rewrite_back_task, rewrite_back_task
+from tests.test_rewrite_back import _clashing_task
+from tests import unwrap_result
+
+
+def _random_task(rng):
+    '''Returns a random task, with the lifted problem, whose action and object names contain the separator.'''
+    Location = UserType("Location")
+    at = Fluent("at", BoolType(), l=Location)
+    object_names = rng.sample(['a', 'b', 'a_b', 'b_0', '0', '1', 'a_0', 'b_a', '0_0'], rng.randint(2, 6))
+    action_names = rng.sample(['m', 'm_a', 'm_a_b', 'n', 'm_0'], rng.randint(1, 3))
+    problem = Problem('random')
+    problem.add_fluent(at, default_initial_value=False)
+    objects = [Object(name, Location) for name in object_names]
+    problem.add_objects(objects)
+    operator_names = []
+    for name in action_names:
+        arity = rng.randint(0, 2)
+        action = InstantaneousAction(name, **{f'x{i}': Location for i in range(arity)})
+        action.add_effect(at(objects[0]), True)
+        problem.add_action(action)
+        operator_names.extend(f'({" ".join((name, ) + parameters)})' for parameters in itertools.product(object_names, repeat=arity))
+    rng.shuffle(operator_names)
+    goal = f'(at {object_names[0]})'
+    operators = [Operator(name, set(), {goal}, set()) for name in operator_names[:rng.randint(1, len(operator_names))]]
+    task = Task(problem.name, {f'(at {name})' for name in object_names}, set(), {goal}, operators)
+    return (task, problem)
+
+
+class TestLazyGrounding(unittest.TestCase):
+
+    def test_same_as_eager(self):
+        for task, problem in [make_task(200), _clashing_task()]:
+            with self.subTest(problem=problem.name):
+                eager_problem, eager_map = rewrite_back_task(task, problem)
+                lazy_problem, lazy_map = lazy_rewrite_back_task(task, problem)
+                self.assertEqual([a.name for a in lazy_problem.actions], [a.name for a in eager_problem.actions])
+                self.assertEqual(len(lazy_map), len(eager_map))
+                for action in eager_problem.actions:
+                    self.assertTrue(lazy_problem.has_action(action.name))
+                    self.assertEqual(lazy_problem.action(action.name), action)
+                    self.assertEqual(lazy_map[action], eager_map[action])
+                self.assertEqual(str(lazy_problem), str(eager_problem))
+
+    def test_random_clashes(self):
+        for seed in range(50):
+            task, problem = _random_task(random.Random(seed))
+            eager_problem, eager_map = rewrite_back_task(task, problem)
+            lazy_problem, lazy_map = lazy_rewrite_back_task(task, problem)
+            with self.subTest(seed=seed):
+                self.assertEqual([a.name for a in lazy_problem.actions], [a.name for a in eager_problem.actions])
+                for action in eager_problem.actions:
+                    self.assertEqual(lazy_problem.action(action.name), action)
+                    self.assertEqual(lazy_map[action], eager_map[action])
+
+    def test_unknown_names(self):
+        task, problem = _clashing_task()
+        lazy_problem, _ = lazy_rewrite_back_task(task, problem)
+        self.assertFalse(lazy_problem.has_action('nope'))
+        self.assertFalse(lazy_problem.has_action(lazy_problem.fluents[0].name))
+        with self.assertRaises(up.exceptions.UPValueError):
+            lazy_problem.action('nope')
+
+    def test_plan_lifted_back(self):
+        for problem in [gripper(4), blocksworld(4)]:
+            with self.subTest(problem=problem.name):
+                eager = EngineImpl().compile(problem, up.engines.CompilationKind.GROUNDING)
+                lazy = EngineImpl(lazy_grounding=True).compile(problem, up.engines.CompilationKind.GROUNDING)
+                self.assertEqual([a.name for a in lazy.problem.actions], [a.name for a in eager.problem.actions])
+                plan = unwrap_result(EngineImpl().solve(lazy.problem)).plan
+                lifted_plan = plan.replace_action_instances(lazy.map_back_action_instance)
+                validation = up.engines.SequentialPlanValidator().validate(problem, lifted_plan)
+                self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+
+
+if __name__ == '__main__':
+    unittest.main()
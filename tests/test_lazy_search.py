@@ -0,0 +1,105 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import importlib.util
+import unittest
+import unified_planning as up
+from unified_planning.engines import PlanGenerationResultStatus
+from benchmarks.problems import blocksworld, gripper, logistics
+from up_pyperplan.engine import EngineImpl
+from up_pyperplan.search import BucketOpenList
+from tests import unwrap_result
+
+
+class TestBucketOpenList(unittest.TestCase):
+
+    def test_order(self):
+        open_list = BucketOpenList()
+        for priority, item in [((2, 1), 'a'), ((1, 5), 'b'), ((1, 5), 'c'), ((1, 2), 'd'), ((2, 1), 'e')]:
+            open_list.push(priority, item)
+        self.assertEqual(len(open_list), 5)
+        self.assertEqual([open_list.pop() for _ in range(5)], ['d', 'b', 'c', 'a', 'e'])
+        self.assertEqual(len(open_list), 0)
+
+
+class TestLazySearch(unittest.TestCase):
+
+    def test_valid_plans(self):
+        for problem in [gripper(5), blocksworld(6), logistics(3)]:
+            for search in ["lazy_gbf", "lazy_wastar"]:
+                for kwargs in [dict(), dict(vectorized_heuristics=True)] if importlib.util.find_spec('numpy') else [dict()]:
+                    with self.subTest(problem=problem.name, search=search, **kwargs):
+                        result = unwrap_result(EngineImpl(search=search, heuristic="hff", **kwargs).solve(problem))
+                        self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+                        validation = up.engines.SequentialPlanValidator().validate(problem, result.plan)
+                        self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+
+    def test_deferred_evaluation(self):
+        problem = gripper(6)
+        lazy = unwrap_result(EngineImpl(search="lazy_gbf", heuristic="hff").solve(problem))
+        eager = unwrap_result(EngineImpl(search="gbf", heuristic="hff").solve(problem))
+        self.assertLess(int(lazy.metrics["evaluated_nodes"]), int(eager.metrics["evaluated_nodes"]))
+
+    def test_unsolvable(self):
+        problem = gripper(2)
+        problem.add_goal(problem.fluent("at")(problem.object("ball0"), problem.object("rooma")))
+        for search in ["lazy_gbf", "lazy_wastar"]:
+            with self.subTest(search=search):
+                result = unwrap_result(EngineImpl(search=search, heuristic="hff").solve(problem))
+                self.assertEqual(result.status, PlanGenerationResultStatus.UNSOLVABLE_PROVEN)
+
+    def test_without_preferred_operators(self):
+        # the other heuristics give no preferred operators, the deferred evaluation still runs
+        problem = blocksworld(5)
+        for lazy_search, eager_search, heuristic in [("lazy_gbf", "gbf", "lmcut"), ("lazy_wastar", "wastar", "hadd")]:
+            with self.subTest(search=lazy_search, heuristic=heuristic):
+                lazy = unwrap_result(EngineImpl(search=lazy_search, heuristic=heuristic).solve(problem))
+                eager = unwrap_result(EngineImpl(search=eager_search, heuristic=heuristic).solve(problem))
+                self.assertEqual(lazy.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+                validation = up.engines.SequentialPlanValidator().validate(problem, lazy.plan)
+                self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+                self.assertLess(int(lazy.metrics["evaluated_nodes"]), int(eager.metrics["evaluated_nodes"]))
+
+    def test_state_representations(self):
+        # the sets of facts and the bitmasks identify the same states, so the searches are the same
+        problem = blocksworld(5)
+        for search, heuristic in [("lazy_gbf", "hff"), ("lazy_wastar", "hadd"), ("lazy_gbf", "blind")]:
+            with self.subTest(search=search, heuristic=heuristic):
+                frozen, bitset = [unwrap_result(EngineImpl(search=search, heuristic=heuristic, state_representation=representation).solve(problem))
+                                  for representation in ["frozenset", "bitset"]]
+                self.assertEqual(str(frozen.plan), str(bitset.plan))
+                self.assertEqual(frozen.metrics["expanded_nodes"], bitset.metrics["expanded_nodes"])
+
+    def test_custom_heuristic(self):
+        problem = gripper(3)
+        result = unwrap_result(EngineImpl(search="lazy_gbf", heuristic="hff").solve(problem, heuristic=lambda state: 0))
+        self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+        self.assertGreater(int(result.metrics["custom_heuristic_evaluations"]), 0)
+
+    def test_timeout(self):
+        result = unwrap_result(EngineImpl(search="lazy_gbf", heuristic="hff").solve(logistics(20, 3), timeout=0.2))
+        self.assertEqual(result.status, PlanGenerationResultStatus.TIMEOUT)
+
+    def test_unsupported(self):
+        for search in ["lazy_gbf", "lazy_wastar"]:
+            with self.assertRaises(up.exceptions.UPUsageError):
+                EngineImpl(search=search, heuristic="landmark")
+            with self.assertRaises(up.exceptions.UPUsageError):
+                EngineImpl(search=search, heuristic="hff", spill_closed_list=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
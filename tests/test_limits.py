@@ -0,0 +1,132 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import functools
+import random
+import unittest
+from unittest import mock
+import unified_planning as up
+from unified_planning.engines import PlanGenerationResultStatus
+from benchmarks.problems import gripper
+import up_pyperplan.closed_list
+import up_pyperplan.search
+from up_pyperplan.closed_list import SpillingClosedList
+from up_pyperplan.engine import AnytimeEngineImpl, EngineImpl, OptEngineImpl
+from up_pyperplan.monitor import SearchMemout, SearchMonitor
+from tests import unwrap_result
+
+
+class TestSearchMonitor(unittest.TestCase):
+
+    def test_node_limit(self):
+        monitor = SearchMonitor(node_limit=10)
+        monitor.expand(6)
+        monitor.expand(6)
+        with self.assertRaises(SearchMemout):
+            monitor.expand(1)
+        self.assertEqual(monitor.counters["limit_reached"], "node_limit")
+        self.assertEqual(monitor.metrics()["generated_nodes"], "12")
+
+    def test_memory_checked_by_the_search(self):
+        monitor = SearchMonitor(memory_limit=1)
+        with self.assertRaises(SearchMemout):
+            monitor.expand(1)
+        self.assertEqual(monitor.counters["limit_reached"], "memory_limit")
+
+    def test_memory_pressure(self):
+        self.assertFalse(SearchMonitor().memory_pressure())
+        self.assertTrue(SearchMonitor(memory_limit=1).memory_pressure())
+        self.assertFalse(SearchMonitor(memory_limit=1 << 30).memory_pressure())
+
+
+class TestLimits(unittest.TestCase):
+
+    def test_node_limit(self):
+        result = unwrap_result(OptEngineImpl(node_limit=2000).solve(gripper(5)))
+        self.assertEqual(result.status, PlanGenerationResultStatus.MEMOUT)
+        self.assertEqual(result.metrics["limit_reached"], "node_limit")
+        self.assertLessEqual(int(result.metrics["generated_nodes"]) - 2000, 100)
+
+    def test_memory_limit(self):
+        result = unwrap_result(OptEngineImpl(memory_limit=1).solve(gripper(5)))
+        self.assertEqual(result.status, PlanGenerationResultStatus.MEMOUT)
+        self.assertEqual(result.metrics["limit_reached"], "memory_limit")
+
+    def test_within_limits(self):
+        result = unwrap_result(EngineImpl(node_limit=100000, memory_limit=1 << 20).solve(gripper(3)))
+        self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+        self.assertNotIn("limit_reached", result.metrics)
+
+    def test_anytime_node_limit(self):
+        results = list(AnytimeEngineImpl(node_limit=50).get_solutions(gripper(4)))
+        self.assertEqual(results[-1].status, PlanGenerationResultStatus.MEMOUT)
+        self.assertEqual(results[-1].metrics["limit_reached"], "node_limit")
+
+
+class TestSpillingClosedList(unittest.TestCase):
+
+    def test_entries(self):
+        rng = random.Random(0)
+        closed = SpillingClosedList(70, buffer_size=3)
+        expected = {}
+        try:
+            for i in range(2000):
+                state = rng.getrandbits(70)
+                expected[state] = (i % 50, rng.getrandbits(70), i)
+                closed.put(state, *expected[state])
+                if i == 10:
+                    closed.spill()
+            self.assertTrue(closed.spilled)
+            self.assertGreater(closed.spilled_entries, 0)
+            for state, entry in expected.items():
+                self.assertEqual(closed.get(state), entry)
+            self.assertIsNone(closed.get(rng.getrandbits(70)))
+        finally:
+            closed.close()
+
+    def test_same_plan_lengths(self):
+        problem = gripper(5)
+        for search, heuristic in [("astar", "lmcut"), ("wastar", "hff")]:
+            with self.subTest(search=search, heuristic=heuristic):
+                expected = unwrap_result(EngineImpl(search=search, heuristic=heuristic).solve(problem))
+                spilling = unwrap_result(EngineImpl(search=search, heuristic=heuristic, spill_closed_list=True).solve(problem))
+                self.assertEqual(len(spilling.plan.actions), len(expected.plan.actions))
+                validation = up.engines.SequentialPlanValidator().validate(problem, spilling.plan)
+                self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+                self.assertEqual(spilling.metrics["spilled_states"], "0")
+
+    def test_spilled_search(self):
+        problem = gripper(5)
+        expected = unwrap_result(EngineImpl(search="astar", heuristic="lmcut").solve(problem))
+        # the closed list is spilled at the first check, and flushed every 64 entries
+        with mock.patch.object(SearchMonitor, 'memory_pressure', lambda self, fraction=0.8: fraction < 1), \
+             mock.patch.object(up_pyperplan.closed_list, 'SpillingClosedList', functools.partial(SpillingClosedList, buffer_size=64)), \
+             mock.patch.object(up_pyperplan.search, 'spilling_weighted_astar',
+                               functools.partial(up_pyperplan.search.spilling_weighted_astar, check_interval=16)):
+            spilling = unwrap_result(EngineImpl(search="astar", heuristic="lmcut", spill_closed_list=True).solve(problem))
+        self.assertEqual(len(spilling.plan.actions), len(expected.plan.actions))
+        self.assertGreater(int(spilling.metrics["spilled_states"]), 0)
+        validation = up.engines.SequentialPlanValidator().validate(problem, spilling.plan)
+        self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+
+    def test_unsupported(self):
+        for search, heuristic in [("gbf", "hadd"), ("astar", "landmark")]:
+            with self.assertRaises(up.exceptions.UPUsageError):
+                EngineImpl(search=search, heuristic=heuristic, spill_closed_list=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
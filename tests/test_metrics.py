@@ -0,0 +1,105 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+from unittest import mock
+from unified_planning.engines import PlanGenerationResultStatus
+from benchmarks.problems import gripper
+from up_pyperplan.engine import EngineImpl
+from up_pyperplan.monitor import SearchMonitor
+from tests import unwrap_result
+
+
+class TestSearchMonitorMetrics(unittest.TestCase):
+
+    def test_counters(self):
+        monitor = SearchMonitor()
+        monitor.expand(3)
+        monitor.expand(0)
+        monitor.expand(2)
+        monitor.evaluate(4)
+        metrics = monitor.metrics()
+        self.assertEqual(metrics["expanded_nodes"], "3")
+        self.assertEqual(metrics["generated_nodes"], "5")
+        self.assertEqual(metrics["evaluated_nodes"], "4")
+        # the bound is the highest generated - expanded + 1 after an expansion: 3, 2, 3
+        self.assertEqual(metrics["peak_open_list_bound"], "3")
+
+    def test_process_peak_rss(self):
+        with mock.patch('up_pyperplan.monitor.peak_rss', return_value=1234):
+            self.assertEqual(SearchMonitor().metrics()["process_peak_rss_bytes"], "1234")
+        with mock.patch('up_pyperplan.monitor.peak_rss', return_value=None):
+            self.assertNotIn("process_peak_rss_bytes", SearchMonitor().metrics())
+
+    def test_progress(self):
+        events = []
+        monitor = SearchMonitor(progress_callback=events.append, progress_interval=0)
+        for _ in range(3):
+            monitor.expand(2)
+        self.assertEqual([e["expanded_nodes"] for e in events], ["1", "2", "3"])
+        self.assertTrue(all(float(e["elapsed_time"]) >= 0 for e in events))
+
+    def test_progress_interval(self):
+        events = []
+        with mock.patch('time.time', return_value=100.0):
+            monitor = SearchMonitor(progress_callback=events.append, progress_interval=1.0)
+            monitor.expand(1)
+        self.assertEqual(events, [])
+        with mock.patch('time.time', return_value=101.5):
+            monitor.expand(1)
+            monitor.expand(1)
+        # the third expansion comes less than progress_interval seconds after the event of the second one
+        self.assertEqual([e["expanded_nodes"] for e in events], ["2"])
+        self.assertEqual(events[0]["elapsed_time"], "1.5")
+
+
+class TestResultMetrics(unittest.TestCase):
+
+    def test_solved(self):
+        result = unwrap_result(EngineImpl(search="astar", heuristic="hadd").solve(gripper(3)))
+        self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+        metrics = result.metrics
+        for name in ["conversion_time", "grounding_time", "heuristic_init_time", "search_time", "engine_internal_time"]:
+            self.assertGreaterEqual(float(metrics[name]), 0)
+        expanded, generated = int(metrics["expanded_nodes"]), int(metrics["generated_nodes"])
+        self.assertGreater(expanded, 0)
+        self.assertGreaterEqual(generated, expanded)
+        self.assertGreater(int(metrics["evaluated_nodes"]), 0)
+        self.assertGreaterEqual(int(metrics["peak_open_list_bound"]), 1)
+        self.assertLessEqual(int(metrics["peak_open_list_bound"]), generated + 1)
+        self.assertGreater(int(metrics["ground_operators"]), 0)
+        self.assertGreater(int(metrics["ground_facts"]), 0)
+        self.assertGreater(int(metrics["process_peak_rss_bytes"]), 0)
+
+    def test_progress_callback(self):
+        events = []
+        engine = EngineImpl(search="astar", heuristic="blind", progress_callback=events.append, progress_interval=0)
+        result = unwrap_result(engine.solve(gripper(3)))
+        self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+        self.assertGreater(len(events), 0)
+        expanded = [int(e["expanded_nodes"]) for e in events]
+        self.assertEqual(expanded, sorted(expanded))
+        self.assertLessEqual(expanded[-1], int(result.metrics["expanded_nodes"]))
+        self.assertTrue(all("elapsed_time" in e and "grounding_time" in e for e in events))
+
+    def test_no_progress_callback(self):
+        events = []
+        engine = EngineImpl(search="astar", heuristic="blind", progress_callback=events.append, progress_interval=3600)
+        unwrap_result(engine.solve(gripper(3)))
+        self.assertEqual(events, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
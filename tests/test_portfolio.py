@@ -0,0 +1,101 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import multiprocessing
+import os
+import queue
+import unittest
+from unittest import mock
+import unified_planning as up
+from unified_planning.engines import PlanGenerationResultStatus
+from benchmarks.problems import gripper
+import up_pyperplan.portfolio
+from up_pyperplan import planner
+from up_pyperplan.engine import EngineImpl
+from tests import unwrap_result
+
+
+def _exit_worker(name, vectorized=False):
+    '''Kills the worker process, like the system does when it runs out of memory.'''
+    os._exit(3)
+
+
+class TestPortfolio(unittest.TestCase):
+
+    def test_solved(self):
+        problem = gripper(4)
+        for state_representation in ["frozenset", "bitset"]:
+            with self.subTest(state_representation=state_representation):
+                result = unwrap_result(EngineImpl(search="portfolio", state_representation=state_representation).solve(problem))
+                self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+                self.assertIn(result.metrics["portfolio_winner"], ["gbf/hff", "wastar/hadd", "ehs/hff", "astar/lmcut"])
+                validation = up.engines.SequentialPlanValidator().validate(problem, result.plan)
+                self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+
+    def test_optimal_winner(self):
+        problem = gripper(3)
+        problem.add_quality_metric(up.model.metrics.MinimizeSequentialPlanLength())
+        result = unwrap_result(EngineImpl(search="portfolio", portfolio=[("astar", "lmcut")]).solve(problem))
+        self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_OPTIMALLY)
+        self.assertEqual(result.metrics["portfolio_winner"], "astar/lmcut")
+
+    def test_timeout(self):
+        engine = EngineImpl(search="portfolio", portfolio=[("astar", "blind"), ("bfs", None)])
+        result = unwrap_result(engine.solve(gripper(14), timeout=1))
+        self.assertEqual(result.status, PlanGenerationResultStatus.TIMEOUT)
+
+    def test_unsolvable(self):
+        problem = gripper(2)
+        problem.add_goal(problem.fluent("at")(problem.object("ball0"), problem.object("rooma")))
+        result = unwrap_result(EngineImpl(search="portfolio", portfolio=[("ehs", "hff"), ("bfs", None)]).solve(problem))
+        self.assertEqual(result.status, PlanGenerationResultStatus.UNSOLVABLE_PROVEN)
+        result = unwrap_result(EngineImpl(search="portfolio", portfolio=[("ehs", "hff")]).solve(problem))
+        self.assertEqual(result.status, PlanGenerationResultStatus.UNSOLVABLE_INCOMPLETELY)
+
+    def test_worker_limits(self):
+        task = planner.ground(EngineImpl()._convert(gripper(6), None))
+        results: queue.Queue = queue.Queue()
+        up_pyperplan.portfolio._run_configuration(0, task, "astar", "blind", None, "frozenset", False, results, node_limit=50)
+        index, plan, _fluents, metrics = results.get_nowait()
+        self.assertEqual((index, plan), (0, None))
+        self.assertEqual(metrics["limit_reached"], "node_limit")
+        self.assertGreater(int(metrics["generated_nodes"]), 50)
+        up_pyperplan.portfolio._run_configuration(1, task, "astar", "blind", None, "frozenset", False, results, memory_limit=1)
+        self.assertEqual(results.get_nowait()[3]["limit_reached"], "memory_limit")
+
+    def test_limits(self):
+        engine = EngineImpl(search="portfolio", portfolio=[("astar", "blind"), ("bfs", None)], node_limit=50)
+        result = unwrap_result(engine.solve(gripper(6)))
+        self.assertEqual(result.status, PlanGenerationResultStatus.MEMOUT)
+        self.assertEqual(result.metrics["limit_reached"], "node_limit")
+        result = unwrap_result(EngineImpl(search="portfolio", portfolio=[("gbf", "hff")], node_limit=10 ** 6).solve(gripper(3)))
+        self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+
+    @unittest.skipIf(multiprocessing.get_start_method() != 'fork', 'the workers inherit the patch only when forked')
+    def test_dead_workers(self):
+        with mock.patch.object(up_pyperplan.portfolio, 'heuristic_class', _exit_worker):
+            result = unwrap_result(EngineImpl(search="portfolio", portfolio=[("gbf", "hff"), ("astar", "lmcut")]).solve(gripper(3)))
+        self.assertEqual(result.status, PlanGenerationResultStatus.INTERNAL_ERROR)
+        self.assertIn("exited with code 3", result.metrics["error"])
+
+    def test_unknown_configuration(self):
+        for portfolio in [[("nosearch", "hff")], [("gbf", "noheuristic")], [("gbf", None)]]:
+            with self.assertRaises(up.exceptions.UPUsageError):
+                EngineImpl(search="portfolio", portfolio=portfolio)
+
+
+if __name__ == '__main__':
+    unittest.main()
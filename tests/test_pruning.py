@@ -0,0 +1,90 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import unittest
+import unified_planning as up
+from pyperplan.task import Operator, Task # type: ignore
+from benchmarks.problems import blocksworld, gripper, logistics
+from up_pyperplan.engine import EngineImpl
+from up_pyperplan.pruning import prune
+from tests import unwrap_result
+
+
+def _task():
+    '''Returns a task with an unreachable operator, an operator that does not contribute to the goal
+    and a static fact in the preconditions.'''
+    operators = [Operator('(go a b)', {'(at a)', '(road a b)'}, {'(at b)'}, {'(at a)'}),
+                 Operator('(go b c)', {'(at b)', '(road b c)'}, {'(at c)'}, {'(at b)'}),
+                 Operator('(go d c)', {'(at d)'}, {'(at c)'}, {'(at d)'}),
+                 Operator('(paint a)', {'(at a)'}, {'(painted a)'}, set())]
+    facts = {'(at a)', '(at b)', '(at c)', '(at d)', '(road a b)', '(road b c)', '(painted a)'}
+    return Task('roads', facts, frozenset({'(at a)', '(road a b)', '(road b c)'}), frozenset({'(at c)'}), operators)
+
+
+class TestPrune(unittest.TestCase):
+
+    def test_operators(self):
+        task = _task()
+        pruned = prune(task)
+        self.assertEqual([op.name for op in pruned.operators], ['(go a b)', '(go b c)'])
+        self.assertEqual(pruned.operators[0].preconditions, {'(at a)'})
+        self.assertEqual(pruned.facts, {'(at a)', '(at b)', '(at c)'})
+        self.assertEqual(pruned.initial_state, frozenset({'(at a)'}))
+        self.assertEqual(pruned.goals, frozenset({'(at c)'}))
+
+    def test_task_not_modified(self):
+        task = _task()
+        operators = [(op.name, set(op.preconditions), set(op.add_effects), set(op.del_effects)) for op in task.operators]
+        prune(task)
+        self.assertEqual([(op.name, op.preconditions, op.add_effects, op.del_effects) for op in task.operators], operators)
+
+    def test_unreachable_goal(self):
+        task = _task()
+        task = Task(task.name, task.facts | {'(at e)'}, task.initial_state, frozenset({'(at e)'}), task.operators)
+        pruned = prune(task)
+        self.assertEqual(pruned.operators, [])
+        self.assertEqual(pruned.goals, frozenset({'(at e)'}))
+
+
+class TestPrunedSolve(unittest.TestCase):
+
+    def test_valid_plans(self):
+        for problem in [gripper(4), blocksworld(4), logistics(3)]:
+            for search, heuristic in [("astar", "lmcut"), ("gbf", "hff"), ("bfs", "hadd")]:
+                with self.subTest(problem=problem.name, search=search, heuristic=heuristic):
+                    expected = unwrap_result(EngineImpl(search=search, heuristic=heuristic).solve(problem))
+                    pruned = unwrap_result(EngineImpl(search=search, heuristic=heuristic, pruning=True).solve(problem))
+                    self.assertEqual(pruned.status, expected.status)
+                    if search != "gbf":
+                        self.assertEqual(len(pruned.plan.actions), len(expected.plan.actions))
+                    validation = up.engines.SequentialPlanValidator().validate(problem, pruned.plan)
+                    self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+                    self.assertIn('pruned_operators', pruned.metrics)
+                    self.assertIn('pruned_facts', pruned.metrics)
+
+    def test_compilation(self):
+        problem = logistics(3)
+        compiled = EngineImpl(pruning=True).compile(problem, up.engines.CompilationKind.GROUNDING)
+        unpruned = EngineImpl().compile(problem, up.engines.CompilationKind.GROUNDING)
+        self.assertLessEqual(len(compiled.problem.actions), len(unpruned.problem.actions))
+        plan = unwrap_result(EngineImpl().solve(compiled.problem)).plan
+        lifted_plan = plan.replace_action_instances(compiled.map_back_action_instance)
+        validation = up.engines.SequentialPlanValidator().validate(problem, lifted_plan)
+        self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import unittest
+from unittest import mock
+import unified_planning as up
+from unified_planning.shortcuts import BoolType, Fluent, InstantaneousAction, Object, Problem, UserType
+from pyperplan.task import Operator, Task # type: ignore
+from benchmarks.problems import gripper
+from benchmarks.rewrite_back import legacy_rewrite_back_task, make_task
+from up_pyperplan.engine import EngineImpl
+from up_pyperplan import planner
+from up_pyperplan.grounder import OperatorTable, _get_original_action_and_parameters_name, rewrite_back_task
+from tests import unwrap_result
+
+
+def _clashing_task():
+    '''Returns a task whose operator names, once changed to the UP notation, clash with each other and
+    with the names of the fluents and of the objects, together with the lifted problem.'''
+    Location = UserType("Location")
+    at = Fluent("at", BoolType(), l=Location)
+    clash = Fluent("m_a_b", BoolType())
+    m = InstantaneousAction("m", x=Location, y=Location)
+    x, y = m.parameters
+    m.add_precondition(at(x))
+    m.add_effect(at(y), True)
+    m_a = InstantaneousAction("m_a", x=Location)
+    m_a.add_effect(at(m_a.parameters[0]), True)
+    problem = Problem('clashes')
+    problem.add_fluent(at, default_initial_value=False)
+    problem.add_fluent(clash, default_initial_value=False)
+    problem.add_actions([m, m_a])
+    locations = [Object(name, Location) for name in ['a', 'b', 'a_b', 'b_0', '0']]
+    problem.add_objects(locations)
+    problem.set_initial_value(at(locations[0]), True)
+    problem.add_goal(at(locations[2]))
+    names = ['(m a b)', '(m_a b)', '(m a_b b)', '(m a b_0)', '(m_a b_0)', '(m a_b b_0)', '(m_a 0)', '(m a 0)']
+    operators = [Operator(name, {'(at a)'}, {'(at b)'}, set()) for name in names]
+    task = Task(problem.name, {'(at a)', '(at b)', '(at a_b)'}, {'(at a)'}, {'(at a_b)'}, operators)
+    return (task, problem)
+
+
+def _lifted(rewrite_back_map):
+    return [(action.name, original.name, [str(p) for p in parameters])
+            for action, (original, parameters) in rewrite_back_map.items()]
+
+
+class TestRewriteBack(unittest.TestCase):
+
+    def test_same_as_legacy(self):
+        for task, problem in [make_task(200), _clashing_task()]:
+            with self.subTest(problem=problem.name):
+                grounded_problem, rewrite_back_map = rewrite_back_task(task, problem)
+                legacy_problem, legacy_map = legacy_rewrite_back_task(task, problem)
+                self.assertEqual(str(grounded_problem), str(legacy_problem))
+                self.assertEqual(_lifted(rewrite_back_map), _lifted(legacy_map))
+
+    def test_fresh_names(self):
+        task, problem = _clashing_task()
+        grounded_problem, _ = rewrite_back_task(task, problem)
+        names = [a.name for a in grounded_problem.actions]
+        self.assertEqual(len(names), len(task.operators))
+        self.assertEqual(len(set(names)), len(names))
+        other_names = {f.name for f in grounded_problem.fluents} | {o.name for o in grounded_problem.all_objects}
+        self.assertFalse(set(names) & other_names)
+        for name in names:
+            self.assertTrue(grounded_problem.has_action(name))
+
+    def test_actions_added(self):
+        task, problem = make_task(50)
+        with mock.patch.object(up.model.Problem, 'add_actions') as add_actions:
+            grounded_problem, _ = rewrite_back_task(task, problem)
+        add_actions.assert_not_called()
+        # without the list of the actions that the problem stores, the actions are added one at a time
+        with mock.patch.object(up.model.Problem, 'actions', property(lambda self: tuple(self._actions))), \
+             mock.patch.object(up.model.Problem, 'add_actions', autospec=True, side_effect=up.model.Problem.add_actions) as add_actions:
+            checked_problem, _ = rewrite_back_task(task, problem)
+        self.assertEqual(add_actions.call_count, 1)
+        self.assertEqual(str(checked_problem), str(grounded_problem))
+        self.assertEqual(len(grounded_problem.actions), len(task.operators))
+
+    def test_plan_lifted_back(self):
+        problem = gripper(4)
+        engine = EngineImpl()
+        compiled = engine.compile(problem, up.engines.CompilationKind.GROUNDING)
+        plan = unwrap_result(EngineImpl().solve(compiled.problem)).plan
+        lifted_plan = plan.replace_action_instances(compiled.map_back_action_instance)
+        validation = up.engines.SequentialPlanValidator().validate(problem, lifted_plan)
+        self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+
+
+class TestOperatorTable(unittest.TestCase):
+
+    def test_plan_conversion(self):
+        problem = gripper(4)
+        task = planner.ground(EngineImpl()._convert(problem, None))
+        solution = planner.search(task, planner.search_function("gbf"), planner.heuristic_class("hff")(task))
+        table = OperatorTable(problem)
+        plan = up.plans.SequentialPlan([table.action_instance(op.name) for op in solution[0]])
+        validation = up.engines.SequentialPlanValidator().validate(problem, plan)
+        self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+        # the same conversion as the one of the engine
+        self.assertEqual(str(plan), str(unwrap_result(EngineImpl(search="gbf", heuristic="hff").solve(problem)).plan))
+
+    def test_every_operator(self):
+        problem = gripper(3)
+        task = planner.ground(EngineImpl()._convert(problem, None))
+        table = OperatorTable(problem)
+        for op in task.operators:
+            action, parameters = table[op.name]
+            action_name, parameters_names = _get_original_action_and_parameters_name(op.name)
+            self.assertIs(action, problem.action(action_name))
+            self.assertEqual([p.object().name for p in parameters], list(parameters_names))
+        self.assertEqual(sorted(table), sorted(op.name for op in task.operators))
+
+    def test_interned(self):
+        problem = gripper(2)
+        table = OperatorTable(problem)
+        self.assertEqual(len(table), 0)
+        name = "(move rooma roomb)"
+        entry = table[name]
+        self.assertIs(table[name], entry)
+        self.assertEqual(len(table), 1)
+        self.assertEqual(table.action_instance(name).action, problem.action("move"))
+        with self.assertRaises(KeyError):
+            table["(move rooma roomc)"]
+        with self.assertRaises(KeyError):
+            table["(fly rooma roomb)"]
+        self.assertEqual(list(table), [name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import unittest
+from unittest import mock
+import unified_planning as up
+from unified_planning.engines import PlanGenerationResultStatus
+from unified_planning.shortcuts import BoolType, Fluent
+from benchmarks.problems import blocksworld, gripper
+from up_pyperplan.engine import EngineImpl
+from up_pyperplan.session import PlanningSession
+from tests import unwrap_result
+
+
+def _connected_gripper(size):
+    '''Returns a gripper problem where the robot moves only between connected rooms, a static fluent.'''
+    problem = gripper(size)
+    Room = problem.user_type("Room")
+    connected = Fluent("connected", BoolType(), a=Room, b=Room)
+    problem.add_fluent(connected, default_initial_value=False)
+    move = problem.action("move")
+    move.add_precondition(connected(*move.parameters))
+    rooma, roomb = problem.object("rooma"), problem.object("roomb")
+    problem.set_initial_value(connected(rooma, roomb), True)
+    problem.set_initial_value(connected(roomb, rooma), True)
+    return problem
+
+
+class TestPlanningSession(unittest.TestCase):
+
+    def _check(self, session, result, status=PlanGenerationResultStatus.SOLVED_SATISFICING):
+        self.assertEqual(result.status, status)
+        validation = up.engines.SequentialPlanValidator().validate(session.problem, result.plan)
+        self.assertEqual(validation.status, up.engines.ValidationResultStatus.VALID)
+
+    def test_replan(self):
+        for kwargs in [dict(), dict(heuristic="landmark"), dict(search="astar", heuristic="lmcut"),
+                       dict(pruning=True, state_representation="bitset"), dict(search="portfolio"), dict(search="auto")]:
+            with self.subTest(**kwargs):
+                problem = _connected_gripper(4)
+                at, at_robby, connected = problem.fluent("at"), problem.fluent("at_robby"), problem.fluent("connected")
+                ball0, rooma, roomb = problem.object("ball0"), problem.object("rooma"), problem.object("roomb")
+                balls = [problem.object(f"ball{i}") for i in range(4)]
+                session = PlanningSession(EngineImpl(**kwargs), problem)
+                result = unwrap_result(session.replan())
+                self._check(session, result)
+                self.assertIn("grounding_time", result.metrics)
+                # only the initial values of fluents changed by the actions: the problem is not grounded again
+                result = unwrap_result(session.replan({at(ball0, rooma): False, at(ball0, roomb): True,
+                                                        at_robby(rooma): False, at_robby(roomb): True}))
+                self._check(session, result)
+                self.assertNotIn("grounding_time", result.metrics)
+                if kwargs.get("search") == "astar":
+                    fresh = unwrap_result(EngineImpl(**kwargs).solve(session.problem))
+                    self.assertEqual(len(result.plan.actions), len(fresh.plan.actions))
+                result = unwrap_result(session.replan(goals=[at(b, rooma) for b in balls]))
+                self._check(session, result)
+                self.assertEqual(len(session.problem.goals), 4)
+                # a static fluent changed: the problem is grounded again
+                result = unwrap_result(session.replan({connected(roomb, rooma): False}))
+                self.assertEqual(result.status, PlanGenerationResultStatus.UNSOLVABLE_PROVEN)
+                self.assertIn("grounding_time", result.metrics)
+                result = unwrap_result(session.replan({connected(roomb, rooma): True}))
+                self._check(session, result)
+
+    def test_heuristic_reused(self):
+        problem = gripper(4)
+        at_robby = problem.fluent("at_robby")
+        rooma, roomb = problem.object("rooma"), problem.object("roomb")
+        engine = EngineImpl(search="gbf", heuristic="hff")
+        session = PlanningSession(engine, problem)
+        with mock.patch.object(engine, '_build_heuristic', wraps=engine._build_heuristic) as build_heuristic:
+            session.replan()
+            session.replan({at_robby(rooma): False, at_robby(roomb): True})
+            self.assertEqual(build_heuristic.call_count, 1)
+            session.replan(goals=[at_robby(rooma)])
+            self.assertEqual(build_heuristic.call_count, 2)
+
+    def test_problem_not_modified(self):
+        problem = gripper(3)
+        at_robby = problem.fluent("at_robby")
+        rooma, roomb = problem.object("rooma"), problem.object("roomb")
+        goals = list(problem.goals)
+        session = PlanningSession(EngineImpl(), problem)
+        session.replan({at_robby(rooma): False, at_robby(roomb): True}, goals=[at_robby(rooma)])
+        self.assertTrue(problem.initial_value(at_robby(rooma)).bool_constant_value())
+        self.assertEqual(list(problem.goals), goals)
+        self.assertFalse(session.problem.initial_value(at_robby(rooma)).bool_constant_value())
+
+    def test_cached_domains(self):
+        # the sessions on different domains must not share the converted domain of the cache
+        engine = EngineImpl(cache_size=4)
+        for problem in [gripper(2), blocksworld(3), gripper(3), blocksworld(3)]:
+            with self.subTest(problem=problem.name):
+                session = PlanningSession(engine, problem)
+                self._check(session, unwrap_result(session.replan()))
+        self.assertEqual(unwrap_result(engine.solve(blocksworld(3))).status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+
+    def test_timeout(self):
+        session = PlanningSession(EngineImpl(search="astar", heuristic="blind"), gripper(12))
+        self.assertEqual(unwrap_result(session.replan(timeout=0.3)).status, PlanGenerationResultStatus.TIMEOUT)
+
+
+if __name__ == '__main__':
+    unittest.main()
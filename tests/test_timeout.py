@@ -0,0 +1,108 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from unified_planning.engines import PlanGenerationResultStatus
+from benchmarks.problems import gripper
+from up_pyperplan import planner
+from up_pyperplan.engine import EngineImpl
+from up_pyperplan.monitor import SearchMonitor, SearchTimeout
+from tests import unwrap_result
+
+
+def _unsolvable():
+    '''Returns a gripper problem whose goals ask for a ball in both rooms.'''
+    problem = gripper(2)
+    problem.add_goal(problem.fluent("at")(problem.object("ball0"), problem.object("rooma")))
+    return problem
+
+
+def _busy_ground(problem, **kwargs):
+    '''A grounding that never ends and has no cancellation point.'''
+    while True:
+        sum(range(1000))
+
+
+class TestTimeout(unittest.TestCase):
+
+    def test_search(self):
+        start = time.time()
+        result = unwrap_result(EngineImpl(search="astar", heuristic="blind").solve(gripper(12), timeout=0.5))
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(result.status, PlanGenerationResultStatus.TIMEOUT)
+        self.assertEqual(result.metrics["limit_reached"], "timeout")
+        self.assertIsNone(result.plan)
+
+    def test_grounding(self):
+        with mock.patch.object(planner, 'ground', _busy_ground):
+            start = time.time()
+            result = unwrap_result(EngineImpl().solve(gripper(3), timeout=0.3))
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(result.status, PlanGenerationResultStatus.TIMEOUT)
+
+    def test_threads(self):
+        with ThreadPoolExecutor(2) as executor:
+            futures = [executor.submit(EngineImpl(search="astar", heuristic="blind").solve, gripper(12), timeout=0.3)
+                       for _ in range(2)]
+            for future in futures:
+                self.assertEqual(unwrap_result(future.result()).status, PlanGenerationResultStatus.TIMEOUT)
+
+    def test_engine_reused(self):
+        engine = EngineImpl(search="astar", heuristic="blind")
+        self.assertEqual(unwrap_result(engine.solve(gripper(12), timeout=0.3)).status, PlanGenerationResultStatus.TIMEOUT)
+        result = unwrap_result(engine.solve(gripper(2), timeout=10))
+        self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+        # the watchdog of the finished run must not interrupt the code that follows it
+        time.sleep(0.2)
+
+    def test_single_exception(self):
+        monitor = SearchMonitor(timeout=0.2)
+        with monitor:
+            # the deadline is reached by the search before the watchdog wakes up
+            monitor.deadline = time.time()
+            with self.assertRaises(SearchTimeout):
+                monitor.check()
+            # the watchdog must not raise a second exception in the code that handles the first one
+            end = time.time() + 0.5
+            while time.time() < end:
+                sum(range(1000))
+        self.assertEqual(monitor.counters["limit_reached"], "timeout")
+
+
+class TestStatuses(unittest.TestCase):
+
+    def test_solved(self):
+        result = unwrap_result(EngineImpl().solve(gripper(3), timeout=10))
+        self.assertEqual(result.status, PlanGenerationResultStatus.SOLVED_SATISFICING)
+        self.assertNotIn("limit_reached", result.metrics)
+
+    def test_unsolvable_proven(self):
+        for search, heuristic in [("bfs", "hadd"), ("astar", "lmcut"), ("gbf", "hff"), ("wastar", "hadd")]:
+            with self.subTest(search=search, heuristic=heuristic):
+                result = unwrap_result(EngineImpl(search=search, heuristic=heuristic).solve(_unsolvable()))
+                self.assertEqual(result.status, PlanGenerationResultStatus.UNSOLVABLE_PROVEN)
+                self.assertIsNone(result.plan)
+
+    def test_unsolvable_incompletely(self):
+        result = unwrap_result(EngineImpl(search="ehs", heuristic="hff").solve(_unsolvable()))
+        self.assertEqual(result.status, PlanGenerationResultStatus.UNSOLVABLE_INCOMPLETELY)
+
+
+if __name__ == '__main__':
+    unittest.main()
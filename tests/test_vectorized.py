@@ -0,0 +1,107 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import importlib.util
+import random
+import unittest
+from unittest import mock
+import unified_planning as up
+from benchmarks.problems import blocksworld, gripper, logistics
+from up_pyperplan import planner
+from up_pyperplan.bitset import BitsetTask
+from up_pyperplan.engine import EngineImpl
+from up_pyperplan.portfolio import heuristic_class
+from tests import unwrap_result
+
+
+def _ground(problem):
+    return planner.ground(EngineImpl()._convert(problem, None))
+
+
+def _states(task, n, rng):
+    '''Returns n states reached by random walks from the initial state and n random sets of facts.'''
+    states = []
+    facts = sorted(task.facts)
+    for _ in range(n):
+        state = task.initial_state
+        for _ in range(rng.randint(0, 20)):
+            successors = task.get_successor_states(state)
+            if not successors:
+                break
+            state = rng.choice(successors)[1]
+        states.append(state)
+        states.append(frozenset(f for f in facts if rng.random() < 0.3))
+    return states
+
+
+@unittest.skipIf(importlib.util.find_spec('numpy') is None, 'numpy is not installed')
+class TestVectorizedHeuristics(unittest.TestCase):
+
+    def test_same_values(self):
+        from pyperplan.search.searchspace import make_root_node
+        from up_pyperplan.vectorized import VECTORIZED_HEURISTICS
+        rng = random.Random(0)
+        for problem in [gripper(3), blocksworld(4), logistics(3)]:
+            task = _ground(problem)
+            states = _states(task, 30, rng)
+            for name, vectorized_class in VECTORIZED_HEURISTICS.items():
+                with self.subTest(problem=problem.name, heuristic=name):
+                    expected = [planner.heuristic_class(name)(task)(make_root_node(s)) for s in states]
+                    vectorized = vectorized_class(task)
+                    self.assertEqual([vectorized(make_root_node(s)) for s in states], expected)
+                    self.assertEqual(vectorized.evaluate(states), expected)
+
+    def test_bitset_states(self):
+        from up_pyperplan.vectorized import VECTORIZED_HEURISTICS
+        task = _ground(gripper(3))
+        bitset_task = BitsetTask(task)
+        states = _states(task, 10, random.Random(1))
+        for name, vectorized_class in VECTORIZED_HEURISTICS.items():
+            vectorized = vectorized_class(task)
+            self.assertEqual(vectorized.evaluate([bitset_task.encode(s) for s in states]), vectorized.evaluate(states))
+
+    def test_same_plans(self):
+        for search, heuristic in [("wastar", "hadd"), ("gbf", "hff"), ("astar", "hmax"), ("ehs", "hff")]:
+            for state_representation in ["frozenset", "bitset"]:
+                with self.subTest(search=search, heuristic=heuristic, state_representation=state_representation):
+                    problem = gripper(4)
+                    expected = unwrap_result(EngineImpl(search=search, heuristic=heuristic,
+                                                         state_representation=state_representation).solve(problem))
+                    vectorized = unwrap_result(EngineImpl(search=search, heuristic=heuristic, vectorized_heuristics=True,
+                                                           state_representation=state_representation).solve(problem))
+                    self.assertEqual(vectorized.status, expected.status)
+                    self.assertEqual(str(vectorized.plan), str(expected.plan))
+
+
+class TestVectorizedOption(unittest.TestCase):
+
+    def test_numpy_required(self):
+        with mock.patch('importlib.util.find_spec', return_value=None):
+            with self.assertRaises(up.exceptions.UPUsageError):
+                EngineImpl(vectorized_heuristics=True)
+
+    @unittest.skipIf(importlib.util.find_spec('numpy') is None, 'numpy is not installed')
+    def test_selected_heuristics(self):
+        from up_pyperplan.vectorized import VECTORIZED_HEURISTICS
+        for name in ["hadd", "hmax"]:
+            self.assertIs(heuristic_class(name, True), VECTORIZED_HEURISTICS[name])
+        # the vectorized hff is slower than the pure one, the option keeps the pure one
+        self.assertIs(heuristic_class("hff", True), planner.heuristic_class("hff"))
+        self.assertIs(heuristic_class("lmcut", True), planner.heuristic_class("lmcut"))
+
+
+if __name__ == '__main__':
+    unittest.main()
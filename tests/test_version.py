@@ -0,0 +1,110 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import types
+import unittest
+from unittest import mock
+import up_pyperplan
+
+
+class _NotFound(Exception):
+    pass
+
+
+def _metadata(version):
+    '''Returns a module like importlib.metadata, where up_pyperplan has the given version, or is not installed if it is None.'''
+    module = types.ModuleType('metadata')
+    module.PackageNotFoundError = _NotFound # type: ignore
+
+    def distribution_version(name):
+        if version is None:
+            raise _NotFound(name)
+        return version
+    module.version = distribution_version # type: ignore
+    return module
+
+
+def _pkg_resources(version):
+    '''Returns a module like pkg_resources, where up_pyperplan has the given version, or is not installed if it is None.'''
+    module = types.ModuleType('pkg_resources')
+    module.DistributionNotFound = _NotFound # type: ignore
+
+    def get_distribution(name):
+        if version is None:
+            raise _NotFound(name)
+        return types.SimpleNamespace(version=version)
+    module.get_distribution = get_distribution # type: ignore
+    return module
+
+
+class TestLazyVersion(unittest.TestCase):
+
+    def setUp(self):
+        # the version computed by the other tests is forgotten, and restored at the end
+        saved = {name: vars(up_pyperplan)[name] for name in ('VERSION', '__version__') if name in vars(up_pyperplan)}
+        for name in saved:
+            delattr(up_pyperplan, name)
+        self.addCleanup(vars(up_pyperplan).update, saved)
+
+    def test_computed_once(self):
+        with mock.patch.object(up_pyperplan, '_git_version', return_value=((2, 0, 1), '2.0.1')) as git_version:
+            self.assertNotIn('__version__', vars(up_pyperplan))
+            self.assertEqual(up_pyperplan.__version__, '2.0.1')
+            self.assertEqual(up_pyperplan.VERSION, (2, 0, 1))
+            self.assertEqual(up_pyperplan.__version__, '2.0.1')
+        self.assertEqual(git_version.call_count, 1)
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(AttributeError):
+            up_pyperplan.no_such_attribute
+
+    def test_not_a_git_checkout(self):
+        with mock.patch('os.path.exists', return_value=False), \
+             mock.patch.object(up_pyperplan, '_distribution_version', return_value='1.2.3.dev4'):
+            self.assertEqual(up_pyperplan._git_version(), ((1, 2, 3, 'dev', 4), '1.2.3.dev4'))
+        with mock.patch('os.path.exists', return_value=False), \
+             mock.patch.object(up_pyperplan, '_distribution_version', return_value=None):
+            self.assertEqual(up_pyperplan._git_version(), (up_pyperplan.BASE_VERSION, '1.1.0'))
+
+
+class TestDistributionVersion(unittest.TestCase):
+
+    def test_importlib_metadata(self):
+        import importlib.metadata
+        with mock.patch('importlib.metadata.version', return_value='1.2.3'):
+            self.assertEqual(up_pyperplan._distribution_version(), '1.2.3')
+        with mock.patch('importlib.metadata.version', side_effect=importlib.metadata.PackageNotFoundError):
+            self.assertIsNone(up_pyperplan._distribution_version())
+
+    def test_backport(self):
+        # before Python 3.8 there is no importlib.metadata
+        with mock.patch.dict('sys.modules', {'importlib.metadata': None, 'importlib_metadata': _metadata('1.2.4')}):
+            self.assertEqual(up_pyperplan._distribution_version(), '1.2.4')
+
+    def test_pkg_resources(self):
+        with mock.patch.dict('sys.modules', {'importlib.metadata': None, 'importlib_metadata': None,
+                                             'pkg_resources': _pkg_resources('1.2.5')}):
+            self.assertEqual(up_pyperplan._distribution_version(), '1.2.5')
+        with mock.patch.dict('sys.modules', {'importlib.metadata': None, 'importlib_metadata': None,
+                                             'pkg_resources': _pkg_resources(None)}):
+            self.assertIsNone(up_pyperplan._distribution_version())
+
+    def test_no_metadata(self):
+        with mock.patch.dict('sys.modules', {'importlib.metadata': None, 'importlib_metadata': None, 'pkg_resources': None}):
+            self.assertIsNone(up_pyperplan._distribution_version())
+
+
+if __name__ == '__main__':
+    unittest.main()
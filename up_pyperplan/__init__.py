@@ -12,38 +12,91 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import subprocess
-import re
+BASE_VERSION = (1, 1, 0)
 
 
-VERSION = (1, 1, 0)
-__version__ = ".".join(str(x) for x in VERSION)
+def _distribution_version():
+    '''Returns the version string of the installed distribution, None if it is not installed. importlib.metadata
+    is only available from Python 3.8: before, the importlib_metadata backport or pkg_resources are used.'''
+    try:
+        import importlib.metadata as metadata
+    except ImportError:
+        try:
+            import importlib_metadata as metadata # type: ignore
+        except ImportError:
+            metadata = None # type: ignore
+    if metadata is not None:
+        try:
+            return metadata.version('up_pyperplan')
+        except metadata.PackageNotFoundError:
+            return None
+    try:
+        import pkg_resources # type: ignore
+    except ImportError:
+        return None
+    try:
+        return pkg_resources.get_distribution('up_pyperplan').version
+    except pkg_resources.DistributionNotFound:
+        return None
+
+
+def _installed_version():
+    '''Returns the VERSION and the __version__ of the installed distribution, None if it is not installed.'''
+    import re
+    version_string = _distribution_version()
+    if version_string is None:
+        return None
+    version = tuple(int(x) if x.isdigit() else x for x in re.findall(r'\d+|[a-z]+', version_string))
+    return (version, version_string)
 
-try:
-    git_version = subprocess.check_output(["git", "describe", "--tags",
-                                           "--dirty=-wip"],
-                                          stderr=subprocess.STDOUT)
-    output = git_version.strip().decode('ascii')
-    data = output.split("-")
-    tag = data[0]
-    match = re.match(r'^v(\d+)\.(\d)+\.(\d)$', tag)
-    if match is not None:
-        MAJOR, MINOR, REL = tuple(int(x) for x in match.groups())
 
+def _git_version():
+    '''Returns the VERSION and the __version__ of the package, refined with the output of git describe when
+    the package is in a git checkout, and read from the installed distribution otherwise.'''
+    import os
+    import re
+    import subprocess
+    version = BASE_VERSION
+    version_string = ".".join(str(x) for x in BASE_VERSION)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if not os.path.exists(os.path.join(root, '.git')):
+        installed = _installed_version()
+        return installed if installed is not None else (version, version_string)
     try:
-        COMMITS = int(data[1])
-    except ValueError:
-        COMMITS = 0
-
-    if data[-1] == 'wip':
-        if COMMITS == 0:
-            VERSION = (MAJOR, MINOR, REL, 'post', 1) #type: ignore
-            __version__ = f'{MAJOR}.{MINOR}.{REL}.post1'
+        git_version = subprocess.check_output(["git", "describe", "--tags",
+                                               "--dirty=-wip"],
+                                              stderr=subprocess.STDOUT, cwd=root, timeout=5)
+        output = git_version.strip().decode('ascii')
+        data = output.split("-")
+        tag = data[0]
+        match = re.match(r'^v(\d+)\.(\d)+\.(\d)$', tag)
+        if match is not None:
+            MAJOR, MINOR, REL = tuple(int(x) for x in match.groups())
+
+        try:
+            COMMITS = int(data[1])
+        except ValueError:
+            COMMITS = 0
+
+        if data[-1] == 'wip':
+            if COMMITS == 0:
+                version = (MAJOR, MINOR, REL, 'post', 1) #type: ignore
+                version_string = f'{MAJOR}.{MINOR}.{REL}.post1'
+            else:
+                version = (MAJOR, MINOR, REL, COMMITS, 'post', 1) #type: ignore
+                version_string = f'{MAJOR}.{MINOR}.{REL}.{COMMITS}.post1'
         else:
-            VERSION = (MAJOR, MINOR, REL, COMMITS, 'post', 1) #type: ignore
-            __version__ = f'{MAJOR}.{MINOR}.{REL}.{COMMITS}.post1'
-    else:
-        VERSION = (MAJOR, MINOR, REL, COMMITS, 'dev', 1) #type: ignore
-        __version__ = f'{MAJOR}.{MINOR}.{REL}.{COMMITS}.dev1'
-except Exception as ex:
-    pass
+            version = (MAJOR, MINOR, REL, COMMITS, 'dev', 1) #type: ignore
+            version_string = f'{MAJOR}.{MINOR}.{REL}.{COMMITS}.dev1'
+    except Exception as ex:
+        pass
+    return (version, version_string)
+
+
+def __getattr__(name: str):
+    # git is only run when the version is first needed, not when the package is imported
+    if name in ('VERSION', '__version__'):
+        global VERSION, __version__
+        VERSION, __version__ = _git_version()
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
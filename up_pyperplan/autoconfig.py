@@ -0,0 +1,177 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from contextlib import contextmanager
+from typing import IO, Any, Dict, List, Optional, Tuple
+import json
+import math
+import os
+import random
+import threading
+import unified_planning as up
+import pyperplan # type: ignore
+
+
+# configurations the "auto" search chooses from, the ones the model knows nothing about are tried first, in this order
+AUTO_CONFIGURATIONS: List[Tuple[str, str]] = [("gbf", "hff"), ("wastar", "hadd"), ("wastar", "hff"), ("gbf", "hadd"),
+                                             ("astar", "lmcut"), ("astar", "hmax"), ("lazy_gbf", "hff")]
+
+FEATURE_NAMES = ["operators", "facts", "goals", "initial_facts", "precondition_size", "add_size", "delete_size",
+                 "open_goals_fraction"]
+
+# the runs that did not complete count as this many times their time, like in the PAR10 score
+UNCOMPLETED_PENALTY = 10
+
+RECORD_KEYS = ["features", "search", "heuristic", "time", "completed"]
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # type: ignore
+
+
+def task_features(task: 'pyperplan.task.Task') -> List[float]:
+    '''Returns the features of a grounded task, see FEATURE_NAMES: the sizes are on a logarithmic scale.'''
+    operators = task.operators
+    n = max(len(operators), 1)
+    precondition_size = sum(len(op.preconditions) for op in operators) / n
+    add_size = sum(len(op.add_effects) for op in operators) / n
+    delete_size = sum(len(op.del_effects) for op in operators) / n
+    open_goals = len(task.goals - task.initial_state) / max(len(task.goals), 1)
+    return [math.log1p(len(operators)), math.log1p(len(task.facts)), math.log1p(len(task.goals)),
+            math.log1p(len(task.initial_state)), math.log1p(precondition_size), math.log1p(add_size),
+            math.log1p(delete_size), open_goals]
+
+
+@contextmanager
+def _locked(f: IO[str]):
+    '''Holds an exclusive lock on the open file f, where fcntl is available, flushing it before the lock is released.'''
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield f
+    finally:
+        f.flush()
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _parse_record(line: str) -> Optional[Dict[str, Any]]:
+    '''Returns the run stored in a line of the file of a performance model, None if the line is not a valid run.'''
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or any(key not in record for key in RECORD_KEYS):
+        return None
+    if not isinstance(record["features"], list) or not isinstance(record["time"], (int, float)):
+        return None
+    return record
+
+
+class PerformanceModel:
+    """
+    k-nearest-neighbours model of the runtime of every (search, heuristic) configuration as a
+    function of the features of the grounded task.
+
+    The prediction for a configuration is the mean of the logarithms of the times of its k runs
+    on the tasks nearest in the feature space, weighted by the inverse of their distance; the runs
+    that did not complete count as UNCOMPLETED_PENALTY times their time.
+    The configurations that never ran are tried first; otherwise, with probability exploration, a
+    random configuration other than the best one is chosen, so the model keeps learning.
+    If path is given, the runs are read from that file, one JSON object per line, and every new
+    run is appended to it, so engines in other processes can share the same model; the file is
+    locked while it is written. Only the last max_records runs are kept: when the model is loaded,
+    the file is rewritten without the older runs and the lines that are not valid runs.
+    """
+
+    def __init__(self, path: Optional[str] = None, k: int = 5, max_records: int = 10000, exploration: float = 0.05):
+        if k < 1 or max_records < 1:
+            raise up.exceptions.UPUsageError('The number of neighbours and of records of the performance model must be positive!')
+        if not 0 <= exploration <= 1:
+            raise up.exceptions.UPUsageError('The exploration probability of the performance model must be between 0 and 1!')
+        # the engines of solve_batch and of the benchmarks may run in another working directory
+        self._path = os.path.abspath(path) if path is not None else None
+        self._k = k
+        self._max_records = max_records
+        self._exploration = exploration
+        self._random = random.Random()
+        self._records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        if self._path is not None and os.path.exists(self._path):
+            self._load()
+
+    def _load(self):
+        '''Reads the runs from the file, compacting it if it holds invalid lines or more than max_records runs.'''
+        assert self._path is not None
+        with open(self._path, 'r+') as f, _locked(f):
+            lines = [line.strip() for line in f]
+            lines = [line for line in lines if line]
+            records = [r for r in map(_parse_record, lines) if r is not None]
+            self._records = records[-self._max_records:]
+            if len(self._records) < len(lines):
+                f.seek(0)
+                f.truncate()
+                f.writelines(json.dumps(r) + '\n' for r in self._records)
+
+    @property
+    def path(self) -> Optional[str]:
+        return self._path
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def record(self, features: List[float], search: str, heuristic: Optional[str], time: float, completed: bool):
+        '''Adds the run of the configuration on a task with the given features, that took time seconds.'''
+        entry = {"features": list(features), "search": search, "heuristic": heuristic, "time": time, "completed": completed}
+        with self._lock:
+            self._records.append(entry)
+            del self._records[:-self._max_records]
+            if self._path is not None:
+                with open(self._path, 'a') as f, _locked(f):
+                    f.write(json.dumps(entry) + '\n')
+
+    def predict(self, features: List[float], search: str, heuristic: Optional[str]) -> Optional[float]:
+        '''Returns the predicted logarithm of the time of the configuration, None if it never ran.'''
+        neighbours: List[Tuple[float, float]] = []
+        with self._lock:
+            for r in self._records:
+                if r["search"] != search or r["heuristic"] != heuristic:
+                    continue
+                distance = math.sqrt(sum((a - b) ** 2 for a, b in zip(features, r["features"])))
+                time = max(r["time"], 1e-6) * (1 if r["completed"] else UNCOMPLETED_PENALTY)
+                neighbours.append((distance, math.log(time)))
+        if not neighbours:
+            return None
+        neighbours.sort()
+        weights = [(1 / (d + 1e-3), t) for d, t in neighbours[:self._k]]
+        return sum(w * t for w, t in weights) / sum(w for w, _ in weights)
+
+    def select(self, features: List[float],
+               configurations: List[Tuple[str, str]] = AUTO_CONFIGURATIONS) -> Tuple[str, str]:
+        '''Returns the first configuration that never ran, if any, otherwise the one with the lowest predicted time
+        or, with probability exploration, a random one among the others.'''
+        best: Optional[Tuple[float, int]] = None
+        for i, (search, heuristic) in enumerate(configurations):
+            prediction = self.predict(features, search, heuristic)
+            if prediction is None:
+                return configurations[i]
+            if best is None or (prediction, i) < best:
+                best = (prediction, i)
+        assert best is not None
+        if len(configurations) > 1 and self._random.random() < self._exploration:
+            others = [c for i, c in enumerate(configurations) if i != best[1]]
+            return self._random.choice(others)
+        return configurations[best[1]]
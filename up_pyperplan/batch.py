@@ -0,0 +1,128 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+import multiprocessing
+import unified_planning as up
+from unified_planning.exceptions import UPUnsupportedProblemTypeError
+from unified_planning.engines import PlanGenerationResultStatus
+
+
+# (status name, plan as a list of (action name, object names), metrics)
+WorkerResult = Tuple[str, Optional[List[Tuple[str, Tuple[str, ...]]]], Dict[str, str]]
+
+# The engine of the worker process, created once by _init_worker and reused for every problem
+_worker_engine: Any = None
+
+
+def _address_space() -> int:
+    '''Returns the size of the virtual address space of the process in bytes, 0 where it is not available.'''
+    try:
+        import os
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _init_worker(engine_class: Type, engine_kwargs: Dict[str, Any], memory_limit: Optional[int]):
+    '''Initializes a worker process: creates its engine and limits its address space to memory_limit MB
+    more than it uses at that point, after importing the planning libraries.'''
+    global _worker_engine
+    _worker_engine = engine_class(**engine_kwargs)
+    if memory_limit is not None:
+        import resource
+        limit = _address_space() + memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _solve_in_worker(problem: 'up.model.Problem', timeout: Optional[float]) -> WorkerResult:
+    '''Solves the problem with the engine of the worker. The plan is returned by names, so it can be
+    mapped back to the objects of the problem in the parent process.'''
+    try:
+        result = _worker_engine.solve(problem, timeout=timeout)
+    except MemoryError:
+        return (PlanGenerationResultStatus.MEMOUT.name, None, {})
+    except UPUnsupportedProblemTypeError:
+        return (PlanGenerationResultStatus.UNSUPPORTED_PROBLEM.name, None, {})
+    except Exception as e:
+        return (PlanGenerationResultStatus.INTERNAL_ERROR.name, None, {'error': f'{type(e).__name__}: {e}'})
+    if isinstance(result, list):
+        result = result[0]
+    plan = None
+    if result.plan is not None:
+        plan = [(a.action.name, tuple(p.object().name for p in a.actual_parameters)) for a in result.plan.actions]
+    return (result.status.name, plan, result.metrics)
+
+
+def _to_result(engine_name: str, problem: 'up.model.Problem', worker_result: WorkerResult) -> 'up.engines.PlanGenerationResult':
+    status_name, plan, metrics = worker_result
+    up_plan = None
+    if plan is not None:
+        expr_manager = problem.environment.expression_manager
+        up_plan = up.plans.SequentialPlan([up.plans.ActionInstance(problem.action(a_name),
+                                                                   tuple(expr_manager.ObjectExp(problem.object(o)) for o in o_names))
+                                           for a_name, o_names in plan])
+    return up.engines.PlanGenerationResult(PlanGenerationResultStatus[status_name], up_plan, engine_name, metrics=metrics)
+
+
+def solve_batch(engine_name: str, engine_class: Type, engine_kwargs: Dict[str, Any],
+                problems: Iterable['up.model.Problem'], timeout: Optional[float] = None,
+                memory_limit: Optional[int] = None, max_workers: Optional[int] = None,
+                mp_context: Optional[Any] = None) -> Iterator[Tuple['up.model.Problem', 'up.engines.PlanGenerationResult']]:
+    '''Solves the given problems in a pool of worker processes, each one with its own
+    engine_class(**engine_kwargs), and yields the (problem, result) pairs as soon as they are
+    solved, so not in the order of the problems.
+
+    The problems are consumed lazily, keeping at most two per worker in flight.
+    timeout is given to each single solve call, while memory_limit (in MB) limits the address space
+    every worker can add to the one it uses once its engine is created; a problem exceeding it results
+    in a MEMOUT. The unsupported problems are reported with an UNSUPPORTED_PROBLEM, and the problems
+    whose solve raised any other exception, or left when a worker dies, with an INTERNAL_ERROR.'''
+    if memory_limit is not None and memory_limit <= 0:
+        raise up.exceptions.UPUsageError('The memory limit of the workers must be positive!')
+    if mp_context is None:
+        mp_context = multiprocessing.get_context()
+    if max_workers is None:
+        max_workers = multiprocessing.cpu_count()
+    pending: Dict[Future, 'up.model.Problem'] = {}
+    problems_iter = iter(problems)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(engine_class, engine_kwargs, memory_limit)) as executor:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < 2 * max_workers:
+                problem = next(problems_iter, None)
+                if problem is None:
+                    exhausted = True
+                    continue
+                try:
+                    pending[executor.submit(_solve_in_worker, problem, timeout)] = problem
+                except BrokenProcessPool:
+                    yield (problem, up.engines.PlanGenerationResult(PlanGenerationResultStatus.INTERNAL_ERROR, None, engine_name))
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                problem = pending.pop(future)
+                try:
+                    result = _to_result(engine_name, problem, future.result())
+                except Exception as e:
+                    # BrokenProcessPool when a worker died, or the errors pickling the problem or the result
+                    result = up.engines.PlanGenerationResult(PlanGenerationResultStatus.INTERNAL_ERROR, None, engine_name,
+                                                             metrics={'error': f'{type(e).__name__}: {e}'})
+                yield (problem, result)
@@ -0,0 +1,147 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import pyperplan # type: ignore
+
+if TYPE_CHECKING:
+    # pyperplan.search imports every search module of pyperplan
+    from pyperplan.search.searchspace import SearchNode # type: ignore
+
+
+class BitsetTask:
+    """
+    Compact representation of a grounded pyperplan Task.
+
+    Every fact gets an integer id, and states are python ints where the bit i is set if
+    the fact with id i is true. The preconditions, add and delete effects of the operators
+    are precomputed as masks, so applicability and successor generation are a handful of
+    integer operations instead of operations on sets of strings.
+    The successors are generated in the order of task.operators with the original Operator
+    objects, so the searches find the same plans they find on the original task.
+    """
+
+    def __init__(self, task: 'pyperplan.task.Task'):
+        self.name = task.name
+        self.task = task
+        self.operators = task.operators
+        self.fact_names: List[str] = sorted(task.facts)
+        self.fact_ids: Dict[str, int] = {f: i for i, f in enumerate(self.fact_names)}
+        self.facts = task.facts
+        self.initial_state = self.encode(task.initial_state)
+        self.goals = self.encode(task.goals)
+        self._operators_masks: List[Tuple[int, int, int, 'pyperplan.task.Operator']] = [
+            (self.encode(op.preconditions), self.encode(op.add_effects), self.encode(op.del_effects), op)
+            for op in task.operators]
+
+    def encode(self, facts: Iterable[str]) -> int:
+        '''Returns the bitmask of the given facts.'''
+        mask = 0
+        for f in facts:
+            mask |= 1 << self.fact_ids[f]
+        return mask
+
+    def decode(self, state: int) -> FrozenSet[str]:
+        '''Returns the set of fact names of the given bitmask.'''
+        facts = []
+        while state:
+            lowest = state & -state
+            facts.append(self.fact_names[lowest.bit_length() - 1])
+            state ^= lowest
+        return frozenset(facts)
+
+    def goal_reached(self, state: int) -> bool:
+        return state & self.goals == self.goals
+
+    def get_successor_states(self, state: int) -> List[Tuple['pyperplan.task.Operator', int]]:
+        return [(op, (state & ~del_mask) | add_mask) for pre_mask, add_mask, del_mask, op in self._operators_masks
+                if state & pre_mask == pre_mask]
+
+    def __repr__(self):
+        return f'<BitsetTask {self.name}, vars: {len(self.fact_names)}, operators: {len(self.operators)}>'
+
+
+class DecodingHeuristic:
+    """
+    Wraps a pyperplan heuristic, built on the original task, so that it can evaluate the
+    nodes of a search on the BitsetTask.
+
+    The heuristic is given the frozenset of facts it would see on the original task, rebuilt
+    by applying the operators of the path from the parent node. Rebuilding it in the same way
+    keeps the iteration order of the facts, which some heuristics, like lmcut, depend on
+    to break ties, so the heuristic values are exactly the same.
+    The sets of the last expanded nodes are cached, since all the successors of an
+    expansion share the parent.
+    """
+
+    def __init__(self, heuristic, task: BitsetTask, cache_size: int = 4096):
+        self._heuristic = heuristic
+        self._task = task
+        self._cache_size = cache_size
+        # id of the node -> (node, frozenset of facts)
+        self._parents: 'OrderedDict[int, Tuple[SearchNode, FrozenSet[str]]]' = OrderedDict()
+
+    def _frozen_state(self, node: 'SearchNode', cache: bool) -> FrozenSet[str]:
+        path = []
+        ancestor: Optional['SearchNode'] = node
+        state: Optional[FrozenSet[str]] = None
+        while ancestor is not None:
+            entry = self._parents.get(id(ancestor), None)
+            if entry is not None and entry[0] is ancestor:
+                self._parents.move_to_end(id(ancestor))
+                state = entry[1]
+                break
+            path.append(ancestor)
+            ancestor = ancestor.parent
+        for n in reversed(path):
+            if n.parent is not None:
+                state = (state - n.action.del_effects) | n.action.add_effects
+            elif n.state == self._task.initial_state:
+                state = self._task.task.initial_state
+            else: # root node of a state reached during the search, the original path is unknown
+                state = self._task.decode(n.state)
+        assert state is not None
+        if cache:
+            self._parents[id(node)] = (node, state)
+            if len(self._parents) > self._cache_size:
+                self._parents.popitem(last=False)
+        return state
+
+    def _evaluate(self, function, node: 'SearchNode'):
+        encoded = node.state
+        if node.parent is not None:
+            parent_state = self._frozen_state(node.parent, True)
+            node.state = (parent_state - node.action.del_effects) | node.action.add_effects
+        else:
+            node.state = self._frozen_state(node, False)
+        try:
+            return function(node)
+        finally:
+            node.state = encoded
+
+    def __call__(self, node: 'SearchNode'):
+        return self._evaluate(self._heuristic, node)
+
+    def calc_h_with_plan(self, node: 'SearchNode'):
+        return self._evaluate(self._heuristic.calc_h_with_plan, node)
+
+    def __getattr__(self, name: str):
+        return getattr(self._heuristic, name)
+
+
+def decode_fluents(task: BitsetTask, fluents: Iterable) -> list:
+    '''Maps back to sets of fact names the states, returned by a search on task, in fluents.'''
+    return [task.decode(f) if isinstance(f, int) else f for f in fluents]
@@ -0,0 +1,121 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+import threading
+import unified_planning as up
+import pyperplan # type: ignore
+from pyperplan.task import Operator, Task # type: ignore
+from up_pyperplan.planner import ground as _ground
+
+
+class GroundingCache:
+    """
+    LRU cache, keyed by the content of the problems, of the converted pyperplan domains
+    and of the grounded operators.
+
+    Two kind of entries are stored:
+     - ('domain', domain_key) -> the converted Domain, the types map and the static predicates;
+     - ('task', domain_key, objects, static initial facts) -> the grounded operators.
+    The grounded operators only depend on the domain, on the objects and on the static part of
+    the initial state, so problems that differ only in the rest of the initial state or in the
+    goals share them.
+    """
+
+    def __init__(self, max_size: int = 16):
+        if max_size < 1:
+            raise up.exceptions.UPUsageError('The size of the grounding cache must be positive!')
+        self._max_size = max_size
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        '''Returns the entry stored for key, or None, updating the hit/miss counters.'''
+        with self._lock:
+            value = self._entries.get(key, None)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        '''Stores value for key, evicting the least recently used entries over the size limit.'''
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def domain_key(problem: 'up.model.Problem') -> Hashable:
+    '''Returns a key that identifies the parts of the problem that are converted to the pyperplan domain.'''
+    types = tuple((t.name, t.father.name if t.father is not None else None) for t in problem.user_types) # type: ignore
+    fluents = tuple(str(f) for f in problem.fluents)
+    actions = tuple(str(a) for a in problem.actions)
+    return (problem.has_type('object'), types, fluents, actions)
+
+
+def ground_operators(problem: 'pyperplan.pddl.pddl.Problem') -> Tuple[List[Operator], FrozenSet[str]]:
+    '''Returns all the operators of the given pyperplan problem, before the relevance analysis, and their facts.'''
+    from pyperplan import grounding # type: ignore
+    full_task = _ground(problem, remove_statics_from_initial_state=False, remove_irrelevant_operators=False)
+    return (full_task.operators, grounding._collect_facts(full_task.operators))
+
+
+def relevant_task(name: str, operators: List[Operator], operators_facts: FrozenSet[str],
+                  init: FrozenSet[str], goals: FrozenSet[str]) -> 'pyperplan.task.Task':
+    '''Returns the task with the given initial state and goals, and the given operators after the relevance analysis.'''
+    from pyperplan import grounding # type: ignore
+    facts = operators_facts | goals
+    # the relevance analysis changes the effects of the operators, so it works on copies
+    relevant = grounding._relevance_analysis([Operator(op.name, op.preconditions, op.add_effects, op.del_effects) for op in operators], goals)
+    return Task(name, facts, init & facts, goals, relevant)
+
+
+def ground(problem: 'pyperplan.pddl.pddl.Problem', statics: List[str], cache: GroundingCache, key: Hashable) -> 'pyperplan.task.Task':
+    '''Grounds the given pyperplan problem like pyperplan.planner._ground, reusing the
+    operators of the cache when the domain, the objects and the static facts did not change.'''
+    from pyperplan import grounding # type: ignore
+    static_init = frozenset(grounding._get_fact(atom) for atom in problem.initial_state if atom.name in statics)
+    objects = tuple((name, t.name) for name, t in problem.objects.items())
+    task_key = ('task', key, objects, static_init)
+    entry: Optional[Tuple[List[Operator], FrozenSet[str]]] = cache.get(task_key)
+    if entry is None:
+        entry = ground_operators(problem)
+        cache.put(task_key, entry)
+    operators, operators_facts = entry
+    init = grounding._get_partial_state(problem.initial_state)
+    goals = grounding._get_partial_state(problem.goal)
+    return relevant_task(problem.name, operators, operators_facts, init, goals)
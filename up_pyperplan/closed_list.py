@@ -0,0 +1,135 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Dict, Optional, Tuple
+import mmap
+import struct
+import tempfile
+
+
+# (g, parent state, index of the operator that reached the state from the parent)
+ClosedEntry = Tuple[int, int, int]
+
+NO_OPERATOR = 0xFFFFFFFF
+
+
+class SpillingClosedList:
+    """
+    Closed list of a search on a BitsetTask: maps every state, an integer bitmask, to the
+    best g found for it, the parent state and the index of the operator that reached it.
+
+    The entries live in a dict until spill is called. From then on, every buffer_size new
+    entries the dict is flushed to an open addressing hash table in a memory-mapped
+    temporary file, with the states stored as fixed size little endian encodings, so the
+    kernel can write them back to the disk instead of keeping them in anonymous memory.
+    """
+
+    def __init__(self, n_facts: int, buffer_size: int = 1 << 16, directory: Optional[str] = None):
+        self._key_size = max(1, (n_facts + 7) // 8)
+        # used flag, state, g, parent state, operator
+        self._record = struct.Struct(f'<B{self._key_size}sI{self._key_size}sI')
+        self._buffer: Dict[int, ClosedEntry] = {}
+        self._buffer_size = buffer_size
+        self._directory = directory
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._capacity = 0
+        self._stored = 0
+
+    @property
+    def spilled(self) -> bool:
+        return self._map is not None
+
+    @property
+    def spilled_entries(self) -> int:
+        '''The number of entries stored in the file.'''
+        return self._stored
+
+    def _encode(self, state: int) -> bytes:
+        return state.to_bytes(self._key_size, 'little')
+
+    def _slot(self, key: bytes) -> int:
+        return hash(key) % self._capacity
+
+    def _find(self, key: bytes) -> Tuple[int, bool]:
+        '''Returns the offset of the record of key, or of the free record where it goes, and if it is used.'''
+        assert self._map is not None
+        slot = self._slot(key)
+        while True:
+            offset = slot * self._record.size
+            used, stored_key, _g, _parent, _op = self._record.unpack_from(self._map, offset)
+            if not used or stored_key == key:
+                return (offset, bool(used))
+            slot = (slot + 1) % self._capacity
+
+    def _allocate(self, capacity: int):
+        '''Replaces the hash table with an empty one of the given capacity, rehashing the entries.'''
+        old_map, old_file, old_capacity = self._map, self._file, self._capacity
+        self._file = tempfile.TemporaryFile(dir=self._directory)
+        self._file.truncate(capacity * self._record.size)
+        self._map = mmap.mmap(self._file.fileno(), capacity * self._record.size)
+        self._capacity = capacity
+        self._stored = 0
+        if old_map is not None:
+            for slot in range(old_capacity):
+                used, key, g, parent, op = self._record.unpack_from(old_map, slot * self._record.size)
+                if used:
+                    offset, _ = self._find(key)
+                    self._record.pack_into(self._map, offset, 1, key, g, parent, op)
+                    self._stored += 1
+            old_map.close()
+            old_file.close() # type: ignore
+
+    def spill(self):
+        '''Moves the entries to the file, and keeps at most buffer_size entries in memory from now on.'''
+        if self._map is None:
+            self._allocate(max(1024, 4 * len(self._buffer)))
+        self.flush()
+
+    def flush(self):
+        '''Writes the entries kept in memory to the file.'''
+        assert self._map is not None
+        if 2 * (self._stored + len(self._buffer)) > self._capacity:
+            self._allocate(max(2 * self._capacity, 4 * (self._stored + len(self._buffer))))
+        for state, (g, parent, op) in self._buffer.items():
+            key = self._encode(state)
+            offset, used = self._find(key)
+            self._record.pack_into(self._map, offset, 1, key, g, self._encode(parent), op)
+            if not used:
+                self._stored += 1
+        self._buffer.clear()
+
+    def get(self, state: int) -> Optional[ClosedEntry]:
+        entry = self._buffer.get(state, None)
+        if entry is not None or self._map is None:
+            return entry
+        offset, used = self._find(self._encode(state))
+        if not used:
+            return None
+        _used, _key, g, parent, op = self._record.unpack_from(self._map, offset)
+        return (g, int.from_bytes(parent, 'little'), op)
+
+    def put(self, state: int, g: int, parent: int, operator: int):
+        self._buffer[state] = (g, parent, operator)
+        if self._map is not None and len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def close(self):
+        '''Releases the file, that is deleted.'''
+        if self._map is not None:
+            self._map.close()
+            self._file.close() # type: ignore
+            self._map = None
+        self._buffer.clear()
@@ -0,0 +1,99 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+import unified_planning as up
+import pyperplan # type: ignore
+from up_pyperplan.bitset import BitsetTask
+from up_pyperplan.grounder import _get_original_action_and_parameters_name
+
+if TYPE_CHECKING:
+    # pyperplan.search imports every search module of pyperplan
+    from pyperplan.search.searchspace import SearchNode # type: ignore
+
+
+class UPHeuristic:
+    """
+    Pyperplan heuristic that evaluates the nodes with a unified_planning heuristic, a function
+    from a State of the original problem to its heuristic value, or None for the dead ends.
+
+    The states of the search, sets of facts or bitmasks of a BitsetTask, are converted to
+    UPStates that are children of the initial state of the problem and only store the facts
+    that differ from it, so the facts that the grounding removed, like the static ones, keep
+    their initial values. Every state is evaluated once: the values are memoized by state.
+
+    When batch is set, function is given a list of states and returns the list of their
+    values; the first time a successor of a node is evaluated, all the successors of that
+    node not evaluated yet are converted and given to function together.
+    """
+
+    def __init__(self, function: Callable[..., Any], problem: 'up.model.Problem',
+                 task: 'pyperplan.task.Task', search_task: Any, batch: bool = False):
+        self._function = function
+        self._batch = batch
+        self._search_task = search_task
+        self.accepts_bitset_states = isinstance(search_task, BitsetTask)
+        em = problem.environment.expression_manager
+        self._true, self._false = em.TRUE(), em.FALSE()
+        self._initial = up.model.UPState(problem.explicit_initial_values, problem)
+        objects = {o.name: em.ObjectExp(o) for o in problem.all_objects}
+        self._fluents: Dict[str, 'up.model.FNode'] = {}
+        for fact in task.facts:
+            fluent_name, object_names = _get_original_action_and_parameters_name(fact)
+            self._fluents[fact] = problem.fluent(fluent_name)(*(objects[n] for n in object_names))
+        initial_facts = frozenset(f for f, exp in self._fluents.items() if self._initial.get_value(exp).is_true())
+        self._initial_facts: Any = search_task.encode(initial_facts) if self.accepts_bitset_states else initial_facts
+        self._values: Dict[Any, float] = {}
+        self.evaluations = 0
+
+    def to_state(self, state: Any) -> 'up.model.UPState':
+        '''Returns the UPState of the given state of the search.'''
+        changed = state ^ self._initial_facts
+        if self.accepts_bitset_states:
+            return self._initial.make_child({self._fluents[f]: self._true if state & (1 << self._search_task.fact_ids[f]) else self._false
+                                             for f in self._search_task.decode(changed)})
+        return self._initial.make_child({self._fluents[f]: self._true if f in state else self._false for f in changed})
+
+    def _evaluate(self, states: List[Any]):
+        '''Evaluates the given states, that are not memoized yet, and memoizes their values.'''
+        self.evaluations += len(states)
+        if self._batch:
+            values = self._function([self.to_state(s) for s in states])
+        else:
+            values = [self._function(self.to_state(s)) for s in states]
+        for state, h in zip(states, values):
+            self._values[state] = float('inf') if h is None else h
+
+    def _pending_successors(self, state: Any) -> Iterable[Any]:
+        '''Returns the successors of state that are not memoized yet, each one once.'''
+        pending: Dict[Any, None] = {}
+        for _op, succ_state in self._search_task.get_successor_states(state):
+            if succ_state not in self._values:
+                pending[succ_state] = None
+        return pending
+
+    def __call__(self, node: 'SearchNode') -> float:
+        h = self._values.get(node.state, None)
+        if h is None:
+            if self._batch and node.parent is not None:
+                self._evaluate(list(self._pending_successors(node.parent.state)))
+            if node.state not in self._values:
+                self._evaluate([node.state])
+            h = self._values[node.state]
+        return h
+
+    def calc_h_with_plan(self, node: 'SearchNode') -> Tuple[float, Optional[list]]:
+        '''There is no relaxed plan, so the searches using the preferred operators keep all of them.'''
+        return (self(node), None)
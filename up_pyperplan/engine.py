@@ -14,8 +14,8 @@
 
 
 from functools import partial
-from ConfigSpace import ConfigurationSpace
-from typing import IO, Callable, List, Dict, Optional, Set, Tuple, Union, cast
+from typing import IO, TYPE_CHECKING, Any, Callable, Hashable, Iterable, Iterator, List, Dict, Optional, Set, Tuple, Union, cast
+import importlib.util
 import time
 import warnings
 import unified_planning as up
@@ -26,15 +26,23 @@ from unified_planning.exceptions import UPUnsupportedProblemTypeError, UPUsageEr
 from unified_planning.engines import PlanGenerationResultStatus, CompilerResult, Credits
 from unified_planning.engines.mixins.compiler import CompilationKind
 from unified_planning.model import FNode, ProblemKind, Type as UPType
-from up_pyperplan.grounder import rewrite_back_task
+import pyperplan # type: ignore
+from up_pyperplan.grounder import OperatorTable, lazy_rewrite_back_task, rewrite_back_task
+from up_pyperplan.bitset import BitsetTask, decode_fluents
+from up_pyperplan.cache import GroundingCache, domain_key, ground as cached_ground
+from up_pyperplan.monitor import SearchMemout, SearchMonitor, MonitoredHeuristic, MonitoredTask, SearchTimeout
+from up_pyperplan import planner
+from up_pyperplan.portfolio import BLIND_SEARCHES, COMPLETE_SEARCHES, DEFAULT_PORTFOLIO, STATE_REPRESENTATIONS, PortfolioWorkerError, compact_task, heuristic_class, run_portfolio
 
 from pyperplan.pddl.pddl import Action as PyperplanAction # type: ignore
 from pyperplan.pddl.pddl import Type as PyperplanType # type: ignore
 from pyperplan.pddl.pddl import Problem as PyperplanProblem # type: ignore
 from pyperplan.pddl.pddl import Predicate, Effect, Domain # type: ignore
 
+if TYPE_CHECKING:
+    from ConfigSpace import ConfigurationSpace
+    from up_pyperplan.autoconfig import PerformanceModel
 
-from pyperplan.planner import _ground, _search, SEARCHES, HEURISTICS # type: ignore
 # TODO CAMBIOS AQUÍ
 credits = Credits('pyperplan',
                   'Albert-Ludwigs-Universität Freiburg (Yusra Alkhazraji, Matthias Frorath, Markus Grützner, Malte Helmert, Thomas Liebetraut, Robert Mattmüller, Manuela Ortlieb, Jendrik Seipp, Tobias Springenberg, Philip Stahl, Jan Wülfing)',
@@ -45,6 +53,21 @@ credits = Credits('pyperplan',
                   'Pyperplan is a lightweight STRIPS planner written in Python.\nPlease note that Pyperplan deliberately prefers clean code over fast code. It is designed to be used as a teaching or prototyping tool. If you use it for paper experiments, please state clearly that Pyperplan does not offer state-of-the-art performance.\nIt was developed during the planning practical course at Albert-Ludwigs-Universität Freiburg during the winter term 2010/2011 and is published under the terms of the GNU General Public License 3 (GPLv3).\nPyperplan supports the following PDDL fragment: STRIPS without action costs.'
                 )
 
+
+# weights of the searches that can be run with a closed list spilled to the disk, the same of pyperplan
+SPILLING_SEARCH_WEIGHTS = {"astar": 1, "wastar": 5}
+
+# weights of the searches with deferred evaluation of the heuristic, None for the greedy one
+LAZY_SEARCH_WEIGHTS = {"lazy_gbf": None, "lazy_wastar": 5}
+
+
+def _is_optimal(search: str, heuristic: Optional[str]) -> bool:
+    '''Returns True if the given configuration always finds an optimal plan.'''
+    if search in BLIND_SEARCHES:
+        return True
+    return search == "astar" and heuristic in ["hmax", "blind", "lmcut"]
+
+
 class EngineImpl(
         unified_planning.engines.Engine,
         unified_planning.engines.mixins.OneshotPlannerMixin,
@@ -55,29 +78,69 @@ class EngineImpl(
 
     def __init__(self, search: str = "wastar", heuristic: Optional[str] = "hadd", lgg: Optional[dict] = {}, translations: Optional[dict] = {},
                  probabilities: Optional[dict] = {}, restrictions: Optional[dict] = {}, types: Optional[dict] = {},
-                 plog_backw: Optional[dict] = {}):
+                 plog_backw: Optional[dict] = {}, cache_size: int = 0,
+                 portfolio: Optional[List[Tuple[str, Optional[str]]]] = None, state_representation: str = "frozenset",
+                 vectorized_heuristics: bool = False, lazy_grounding: bool = False,
+                 pruning: bool = False, progress_callback: Optional[Callable[[Dict[str, str]], None]] = None,
+                 progress_interval: float = 1.0, memory_limit: Optional[int] = None, node_limit: Optional[int] = None,
+                 spill_closed_list: bool = False, batch_heuristic: bool = False, performance_model: Optional[str] = None):
         unified_planning.engines.Engine.__init__(self)
         up.engines.mixins.OneshotPlannerMixin.__init__(self)
         up.engines.mixins.CompilerMixin.__init__(self)
-        if search not in SEARCHES:
+        if not planner.is_search(search) and search not in ["portfolio", "auto"] and search not in LAZY_SEARCH_WEIGHTS:
             raise up.exceptions.UPUsageError(f'{search} not supported!')
-        if heuristic not in HEURISTICS:
+        if not planner.is_heuristic(heuristic):
             raise up.exceptions.UPUsageError(f'{heuristic} not supported!')
-        self._search = SEARCHES[search]
-        self._heuristic = HEURISTICS[heuristic]
+        self._portfolio: Optional[List[Tuple[str, Optional[str]]]] = None
+        if search == "portfolio":
+            self._portfolio = list(portfolio) if portfolio is not None else DEFAULT_PORTFOLIO
+            for p_search, p_heuristic in self._portfolio:
+                if not planner.is_search(p_search):
+                    raise up.exceptions.UPUsageError(f'{p_search} not supported!')
+                if not planner.is_heuristic(p_heuristic) and (p_heuristic is not None or p_search not in BLIND_SEARCHES):
+                    raise up.exceptions.UPUsageError(f'{p_heuristic} not supported!')
+        if state_representation not in STATE_REPRESENTATIONS:
+            raise up.exceptions.UPUsageError(f'{state_representation} state representation not supported!')
+        self._state_representation = state_representation
+        self._search_name = search
+        self._heuristic_name = heuristic
+        if vectorized_heuristics and importlib.util.find_spec('numpy') is None:
+            raise up.exceptions.UPUsageError('The vectorized heuristics require numpy, which is not installed!')
+        self._vectorized_heuristics = vectorized_heuristics
         self._lgg = lgg
         self._translations = translations
         self._probabilities = probabilities
         self._restrictions = restrictions
         self._plog_backw = plog_backw
         self._types = types
-        if search in ["bfs", "ids", "sat"]:
-            self._heuristic = None
-            self._optimal = True
-        elif search == "astar" and heuristic in ["hmax", "blind", "lmcut"]:
-            self._optimal = True
-        else:
-            self._optimal = False
+        self._cache: Optional[GroundingCache] = GroundingCache(cache_size) if cache_size > 0 else None
+        self._lazy_grounding = lazy_grounding
+        self._pruning = pruning
+        self._progress_callback = progress_callback
+        self._progress_interval = progress_interval
+        self._memory_limit = memory_limit
+        self._node_limit = node_limit
+        if spill_closed_list and (search not in SPILLING_SEARCH_WEIGHTS or heuristic == "landmark"):
+            raise up.exceptions.UPUsageError(f'spill_closed_list not supported with {search} and {heuristic}!')
+        self._spill_closed_list = spill_closed_list
+        if search in LAZY_SEARCH_WEIGHTS and heuristic == "landmark":
+            raise up.exceptions.UPUsageError(f'{search} not supported with {heuristic}!')
+        self._batch_heuristic = batch_heuristic
+        # with the "auto" search, the search and the heuristic are chosen by the model before every search
+        self._auto = search == "auto"
+        self._performance_model: Optional['PerformanceModel'] = None
+        if performance_model is not None or self._auto:
+            from up_pyperplan.autoconfig import PerformanceModel
+            self._performance_model = PerformanceModel(performance_model)
+        # used to create the same engine in the worker processes of solve_batch
+        self._init_kwargs = dict(search=search, heuristic=heuristic, lgg=lgg, translations=translations,
+                                 probabilities=probabilities, restrictions=restrictions, types=types,
+                                 plog_backw=plog_backw, cache_size=cache_size, portfolio=portfolio,
+                                 state_representation=state_representation, vectorized_heuristics=vectorized_heuristics,
+                                 lazy_grounding=lazy_grounding, pruning=pruning, memory_limit=memory_limit,
+                                 node_limit=node_limit, spill_closed_list=spill_closed_list, batch_heuristic=batch_heuristic,
+                                 performance_model=performance_model)
+        # the callback is not given to the engines of the worker processes of solve_batch
 
     @property
     def name(self) -> str:
@@ -116,18 +179,24 @@ class EngineImpl(
         return credits
 
     @staticmethod
-    def get_configuration_space() -> ConfigurationSpace:
-        return ConfigurationSpace(space={"search": ["wastar", "astar", "gbf", "bfs", "ehs", "ids", "sat"],
+    def get_configuration_space() -> 'ConfigurationSpace':
+        from ConfigSpace import ConfigurationSpace
+        return ConfigurationSpace(space={"search": ["wastar", "astar", "gbf", "bfs", "ehs", "ids", "sat", "lazy_gbf", "lazy_wastar"],
                                          "heuristic": ["hadd", "hmax", "hsa", "hff", "blind", "lmcut", "landmark"]})
 
     def _compile(self, problem: 'up.model.AbstractProblem',
                  compilation_kind: 'up.engines.CompilationKind') -> CompilerResult:
         assert isinstance(problem, up.model.Problem)
-        self.pyp_types: Dict[str, PyperplanType] = {}
-        dom = self._convert_domain(problem)
-        prob = self._convert_problem(dom, problem)
-        task = _ground(prob)
-        grounded_problem, rewrite_back_map = rewrite_back_task(task, problem)
+        key = domain_key(problem) if self._cache is not None else None
+        prob = self._convert(problem, key)
+        task = self._ground_problem(prob, key)
+        if self._pruning:
+            from up_pyperplan.pruning import prune
+            task = prune(task)
+        if self._lazy_grounding:
+            grounded_problem, rewrite_back_map = lazy_rewrite_back_task(task, problem)
+        else:
+            grounded_problem, rewrite_back_map = rewrite_back_task(task, problem)
         return CompilerResult(grounded_problem, partial(up.engines.compilers.utils.lift_action_instance, map=rewrite_back_map), self.name, [])
 
     def _solve(self, problem: 'up.model.AbstractProblem',
@@ -138,55 +207,264 @@ class EngineImpl(
         The planner used to retrieve the plan is "pyperplan" therefore only flat_typing
         is supported.'''
         assert isinstance(problem, up.model.Problem)
-        if heuristic is not None:
-            warnings.warn('Pyperplan does not support custom heuristic.', UserWarning)
-        if timeout is not None:
-            warnings.warn('Pyperplan does not support timeout.', UserWarning)
+        if heuristic is not None and (self._portfolio is not None or self._search_name in BLIND_SEARCHES or self.satisfies(up.engines.OptimalityGuarantee.SOLVED_OPTIMALLY)):
+            warnings.warn(f'{self.name} does not support custom heuristic with the {self._search_name} search.', UserWarning)
+            heuristic = None
         if output_stream is not None:
             warnings.warn('Pyperplan does not support output stream.', UserWarning)
-        self.pyp_types = {}
-        dom = self._convert_domain(problem)
-        prob = self._convert_problem(dom, problem)
+        monitor = self._monitor(timeout)
+        try:
+            with monitor:
+                with monitor.phase('conversion'):
+                    key = domain_key(problem) if self._cache is not None else None
+                    prob = self._convert(problem, key)
+                    operators = OperatorTable(problem)
+                start = time.time()
+                task = self._monitored_ground(prob, key, monitor)
+                solution, unsolvable_proven, winner, optimal = self._search_grounded(problem, task, monitor, self._build_heuristic, heuristic)
+        except SearchTimeout:
+            return self._interrupted_result(PlanGenerationResultStatus.TIMEOUT, monitor)
+        except (SearchMemout, MemoryError):
+            # a MemoryError is not raised by the monitor
+            monitor.counters.setdefault("limit_reached", "memory_limit")
+            return self._interrupted_result(PlanGenerationResultStatus.MEMOUT, monitor)
+        except PortfolioWorkerError as e:
+            monitor.counters["error"] = str(e)
+            return self._interrupted_result(PlanGenerationResultStatus.INTERNAL_ERROR, monitor)
+        # the admissibility of a custom heuristic is not known
+        return self._plan_result(problem, operators, solution, unsolvable_proven, winner, monitor, time.time() - start,
+                                 optimal and heuristic is None)
+
+    def _monitor(self, timeout: Optional[float]) -> SearchMonitor:
+        '''Returns the SearchMonitor of a run with the given timeout and the limits of the engine.'''
+        return SearchMonitor(timeout, self._progress_callback, self._progress_interval,
+                             self._memory_limit, self._node_limit)
+
+    def _search_grounded(self, problem: 'up.model.Problem', task: 'pyperplan.task.Task', monitor: SearchMonitor,
+                         build_heuristic: Callable[['pyperplan.task.Task', str, Optional[str]], Any],
+                         heuristic: Optional[Callable[["up.model.state.ROState"], Optional[float]]] = None) -> Tuple[Optional[Tuple[List[str], List[Any]]], bool, int, bool]:
+        '''Searches the grounded task with the configured search, or portfolio, and the heuristic
+        returned by build_heuristic for the search and the heuristic name, or the custom heuristic if given.
+
+        Returns the solution, as the names of the operators and the fluents, or None, a flag that tells
+        if the task is proven unsolvable, the index of the winner configuration of the portfolio and a flag
+        that tells if the configuration that ran always finds an optimal plan.'''
+        if self._portfolio is not None:
+            with monitor.phase('search'):
+                portfolio_solution, unsolvable_proven = run_portfolio(task, self._portfolio, monitor,
+                                                                      self._state_representation, self._vectorized_heuristics)
+            if portfolio_solution is None:
+                return (None, unsolvable_proven, -1, False)
+            plan, fluents, winner_metrics, winner = portfolio_solution
+            monitor.expanded = int(winner_metrics['expanded_nodes'])
+            monitor.generated = int(winner_metrics['generated_nodes'])
+            monitor.evaluated = int(winner_metrics['evaluated_nodes'])
+            monitor.peak_open = int(winner_metrics['peak_open_list_bound'])
+            return ((plan, fluents), unsolvable_proven, winner, _is_optimal(*self._portfolio[winner]))
+        features = None
+        if self._performance_model is not None:
+            from up_pyperplan.autoconfig import task_features
+            features = task_features(task)
+        # the configuration chosen by the "auto" search is only used by this call, the engine can be shared
+        search: str = self._search_name
+        heuristic_name: Optional[str] = self._heuristic_name
+        if self._auto:
+            assert self._performance_model is not None and features is not None
+            search, heuristic_name = self._performance_model.select(features)
+            monitor.counters["auto_configuration"] = f'{search}/{heuristic_name}'
+        # the runs with a custom heuristic do not tell the performance of the configured one
+        record = features is not None and heuristic is None
         start = time.time()
-        task = _ground(prob)
-        if self._heuristic is None:
-            h = None
-        elif self._lgg == {}:
-            h = self._heuristic(task)
-        elif self._probabilities == {} and self._plog_backw == {}:
-            h = self._heuristic(task, self._lgg, self._translations)
-        elif self._plog_backw == {}:
-            h = self._heuristic(task, self._lgg, self._probabilities, self._restrictions, self._types)
-        else:
-             h = self._heuristic(task, self._lgg, self._plog_backw, self._types)
-        solution = _search(task, self._search, h)
-        solving_time = time.time() - start
+        try:
+            solution = self._search_configured(problem, task, monitor, build_heuristic, heuristic, search, heuristic_name)
+        except (SearchTimeout, SearchMemout, MemoryError):
+            if record:
+                self._record_run(features, search, heuristic_name, time.time() - start, False)
+            raise
+        unsolvable_proven = search in COMPLETE_SEARCHES
+        if record:
+            self._record_run(features, search, heuristic_name, time.time() - start, solution is not None or unsolvable_proven)
+        return (solution, unsolvable_proven, -1, _is_optimal(search, heuristic_name))
+
+    def _search_configured(self, problem: 'up.model.Problem', task: 'pyperplan.task.Task', monitor: SearchMonitor,
+                           build_heuristic: Callable[['pyperplan.task.Task', str, Optional[str]], Any],
+                           heuristic: Optional[Callable[["up.model.state.ROState"], Optional[float]]],
+                           search: str, heuristic_name: Optional[str]) -> Optional[Tuple[List[str], List[Any]]]:
+        '''Searches the grounded task with the given search and heuristic, see _search_grounded.'''
+        with monitor.phase('heuristic_init'):
+            h = build_heuristic(task, search, heuristic_name) if heuristic is None else None
+        with monitor.phase('search'):
+            if self._spill_closed_list:
+                # the closed list is spilled to the disk with the states encoded as fixed size bitmasks
+                search_task = BitsetTask(task)
+            elif search in LAZY_SEARCH_WEIGHTS:
+                # the lazy searches decode the bitmasks themselves for the heuristics that do not accept them
+                search_task = BitsetTask(task) if self._state_representation == "bitset" else task
+            else:
+                search_task, h = compact_task(task, h, search, self._state_representation)
+            if heuristic is not None:
+                from up_pyperplan.custom_heuristic import UPHeuristic
+                custom_h = UPHeuristic(heuristic, problem, task, search_task, self._batch_heuristic)
+                h = custom_h
+            try:
+                if self._spill_closed_list:
+                    solution = self._spilling_search(search_task, MonitoredHeuristic(h, monitor), monitor)
+                elif search in LAZY_SEARCH_WEIGHTS:
+                    from up_pyperplan.search import lazy_best_first_search
+                    solution = lazy_best_first_search(MonitoredTask(search_task, monitor), MonitoredHeuristic(h, monitor),
+                                                      LAZY_SEARCH_WEIGHTS[search],
+                                                      # only the relaxed plans of hff give the preferred operators
+                                                      preferred_operators=heuristic is None and heuristic_name == "hff",
+                                                      reopen=LAZY_SEARCH_WEIGHTS[search] is not None)
+                else:
+                    if h is not None:
+                        h = MonitoredHeuristic(h, monitor)
+                    solution = planner.search(MonitoredTask(search_task, monitor), planner.search_function(search), h)
+            finally:
+                if heuristic is not None:
+                    monitor.counters["custom_heuristic_evaluations"] = custom_h.evaluations
+        if solution is None:
+            return None
+        fluents = list(solution[1])
+        if isinstance(search_task, BitsetTask):
+            fluents = decode_fluents(search_task, fluents)
+        return ([op.name for op in solution[0]], fluents)
+
+    def _record_run(self, features: Optional[List[float]], search: str, heuristic_name: Optional[str],
+                    run_time: float, completed: bool):
+        '''Adds the run of the given search and heuristic, that took run_time seconds, to the performance model.'''
+        assert self._performance_model is not None and features is not None
+        self._performance_model.record(features, search, heuristic_name, run_time, completed)
+
+    def _result_metrics(self, monitor: SearchMonitor, internal_time: float) -> Dict[str, str]:
+        '''Returns the metrics of a result: those of the monitor, the internal time and the counters of the grounding cache.'''
+        metrics = monitor.metrics()
+        metrics["engine_internal_time"] = str(internal_time)
+        if self._cache is not None:
+            metrics["cache_hits"] = str(self._cache.hits)
+            metrics["cache_misses"] = str(self._cache.misses)
+        return metrics
+
+    def _interrupted_result(self, status: PlanGenerationResultStatus, monitor: SearchMonitor) -> 'up.engines.results.PlanGenerationResult':
+        '''Returns the result, without a plan, of a run stopped by the timeout, by the limits of the monitor or by an error.'''
+        metrics = self._result_metrics(monitor, time.time() - monitor.start)
+        return up.engines.PlanGenerationResult(status, None, self.name, metrics=metrics)
+
+    def _plan_result(self, problem: 'up.model.Problem', operators: OperatorTable, solution: Optional[Tuple[List[str], List[Any]]],
+                     unsolvable_proven: bool, winner: int, monitor: SearchMonitor, solving_time: float, optimal: bool) -> Any:
+        '''Returns the result of a completed run, as a list with the fluents along the plan when a plan was found.'''
+        metrics = self._result_metrics(monitor, solving_time)
         actions: List[up.plans.ActionInstance] = []
         fluents = []
         if solution is None:
-            if self._search in ["bfs", "ids", "astar", "wastar", "gbf"]:
+            if unsolvable_proven:
                 status = PlanGenerationResultStatus.UNSOLVABLE_PROVEN
             else:
                 status = PlanGenerationResultStatus.UNSOLVABLE_INCOMPLETELY
-            return up.engines.PlanGenerationResult(status, None, self.name, metrics={"engine_internal_time": str(solving_time)})
+            return up.engines.PlanGenerationResult(status, None, self.name, metrics=metrics)
         for action_string in solution[0]:
-            actions.append(self._convert_string_to_action_instance(action_string.name, problem))
+            actions.append(operators.action_instance(action_string))
         for fluent_string in solution[1]:
             fluents.append(fluent_string)
-        if self._optimal and len(problem.quality_metrics) > 0:
+        if self._portfolio is not None:
+            metrics["portfolio_winner"] = "/".join(str(x) for x in self._portfolio[winner])
+        if optimal and len(problem.quality_metrics) > 0:
             status = PlanGenerationResultStatus.SOLVED_OPTIMALLY
         else:
             status = PlanGenerationResultStatus.SOLVED_SATISFICING
         return [up.engines.PlanGenerationResult(status, up.plans.SequentialPlan(actions),
-                                               self.name, metrics={"engine_internal_time": str(solving_time)}), fluents]
+                                               self.name, metrics=metrics), fluents]
+
+    def solve_batch(self, problems: Iterable['up.model.Problem'], timeout: Optional[float] = None,
+                    memory_limit: Optional[int] = None, max_workers: Optional[int] = None,
+                    mp_context: Optional[Any] = None) -> Iterator[Tuple['up.model.Problem', 'up.engines.PlanGenerationResult']]:
+        '''Solves the given problems in a ProcessPoolExecutor of max_workers processes (by default one per CPU)
+        and yields the (problem, PlanGenerationResult) pairs as soon as each problem is solved.
 
-    def _convert_string_to_action_instance(self, string: str, problem: 'up.model.Problem') -> 'up.plans.ActionInstance':
-        assert string[0] == "(" and string[-1] == ")"
-        list_str = string[1:-1].split(" ")
-        action = problem.action(list_str[0])
-        expr_manager = problem.environment.expression_manager
-        param = tuple(expr_manager.ObjectExp(problem.object(o_name)) for o_name in list_str[1:])
-        return up.plans.ActionInstance(action, param)
+        Every worker imports pyperplan and unified_planning and creates an engine with the same
+        configuration of this one only once, then it solves many problems.
+        timeout is the timeout of every single problem, memory_limit is the maximum memory
+        (in MB) of every worker; the problems exceeding it are reported with a MEMOUT.'''
+        from up_pyperplan.batch import solve_batch
+        return solve_batch(self.name, type(self), self._init_kwargs, problems, timeout=timeout,
+                           memory_limit=memory_limit, max_workers=max_workers, mp_context=mp_context)
+
+    @property
+    def grounding_cache(self) -> Optional[GroundingCache]:
+        '''The cache of converted domains and grounded operators, None if the engine was created with cache_size 0.'''
+        return self._cache
+
+    def _convert(self, problem: 'up.model.Problem', key: Optional[Hashable]) -> PyperplanProblem:
+        '''Converts the problem to pyperplan, reusing the converted domain stored in the cache under key;
+        the cache is not used when key is None.'''
+        cache = self._cache if key is not None else None
+        entry = cache.get(('domain', key)) if cache is not None else None
+        if entry is None:
+            self.pyp_types = {}
+            dom = self._convert_domain(problem)
+            if cache is not None:
+                from pyperplan import grounding # type: ignore
+                self._statics = grounding._get_statics(dom.predicates.values(), dom.actions.values())
+                cache.put(('domain', key), (dom, dict(self.pyp_types), self._has_object_type, self._statics))
+        else:
+            dom, pyp_types, self._has_object_type, self._statics = entry
+            self.pyp_types = dict(pyp_types)
+        return self._convert_problem(dom, problem)
+
+    def _ground_problem(self, prob: PyperplanProblem, key: Optional[Hashable]) -> 'pyperplan.task.Task':
+        '''Grounds the converted problem, reusing the operators stored in the cache when possible.'''
+        if self._cache is None:
+            return planner.ground(prob)
+        return cached_ground(prob, self._statics, self._cache, key)
+
+    def _monitored_ground(self, prob: PyperplanProblem, key: Optional[Hashable], monitor: SearchMonitor) -> 'pyperplan.task.Task':
+        '''Grounds, and prunes if configured, the converted problem, recording the phases and the size of the task in the monitor.'''
+        with monitor.phase('grounding'):
+            task = self._ground_problem(prob, key)
+        return self._monitored_prune(task, monitor)
+
+    def _monitored_prune(self, task: 'pyperplan.task.Task', monitor: SearchMonitor) -> 'pyperplan.task.Task':
+        '''Prunes the grounded task if configured, recording the phase and the size of the task in the monitor.'''
+        if self._pruning:
+            from up_pyperplan.pruning import prune
+            with monitor.phase('pruning'):
+                pruned_task = prune(task)
+            monitor.counters["pruned_operators"] = len(task.operators) - len(pruned_task.operators)
+            monitor.counters["pruned_facts"] = len(task.facts) - len(pruned_task.facts)
+            task = pruned_task
+        monitor.counters["ground_operators"] = len(task.operators)
+        monitor.counters["ground_facts"] = len(task.facts)
+        return task
+
+    def _spilling_search(self, task: BitsetTask, heuristic, monitor: SearchMonitor) -> Optional[Tuple[List['pyperplan.task.Operator'], List[Any]]]:
+        '''Searches task with a closed list that is spilled to the disk when the memory used reaches 80% of the memory limit.'''
+        from up_pyperplan.closed_list import SpillingClosedList
+        from up_pyperplan.search import spilling_weighted_astar
+        closed = SpillingClosedList(len(task.fact_names))
+        try:
+            solution = spilling_weighted_astar(MonitoredTask(task, monitor), heuristic, SPILLING_SEARCH_WEIGHTS[self._search_name],
+                                               closed, monitor.memory_pressure)
+        finally:
+            monitor.counters["spilled_states"] = closed.spilled_entries
+            closed.close()
+        if solution is None:
+            return None
+        return (solution[0], decode_fluents(task, solution[1]))
+
+    def _build_heuristic(self, task: 'pyperplan.task.Task', search: str, heuristic_name: Optional[str]):
+        '''Returns the pyperplan heuristic heuristic_name, used by search, for the given grounded task.'''
+        if search in BLIND_SEARCHES:
+            return None
+        # the numpy implementations do not accept the additional parameters of the lgg heuristics
+        heuristic = heuristic_class(heuristic_name, self._vectorized_heuristics and self._lgg == {})
+        if self._lgg == {}:
+            return heuristic(task)
+        elif self._probabilities == {} and self._plog_backw == {}:
+            return heuristic(task, self._lgg, self._translations)
+        elif self._plog_backw == {}:
+            return heuristic(task, self._lgg, self._probabilities, self._restrictions, self._types)
+        else:
+            return heuristic(task, self._lgg, self._plog_backw, self._types)
 
     def _convert_problem(self, domain: Domain, problem: 'unified_planning.model.Problem') -> PyperplanProblem:
         objects: Dict[str, PyperplanType] = {o.name: self._convert_type(o.type) for o in problem.all_objects}
@@ -305,12 +583,16 @@ class EngineImpl(
 
 
 class OptEngineImpl(EngineImpl):
-    def __init__(self, search: str = "astar", heuristic: Optional[str] = "lmcut"):
+    def __init__(self, search: str = "astar", heuristic: Optional[str] = "lmcut", cache_size: int = 0,
+                 memory_limit: Optional[int] = None, node_limit: Optional[int] = None, spill_closed_list: bool = False):
         if search not in ["astar", "bfs", "ids"]:
             raise up.exceptions.UPUsageError(f'{search} not supported!')
         if heuristic not in ["hmax", "blind", "lmcut"]:
             raise up.exceptions.UPUsageError(f'{heuristic} not supported!')
-        EngineImpl.__init__(self, search, heuristic)
+        EngineImpl.__init__(self, search, heuristic, cache_size=cache_size, memory_limit=memory_limit,
+                            node_limit=node_limit, spill_closed_list=spill_closed_list)
+        self._init_kwargs = dict(search=search, heuristic=heuristic, cache_size=cache_size, memory_limit=memory_limit,
+                                 node_limit=node_limit, spill_closed_list=spill_closed_list)
 
     @property
     def name(self) -> str:
@@ -321,6 +603,98 @@ class OptEngineImpl(EngineImpl):
         return True
 
     @staticmethod
-    def get_configuration_space() -> ConfigurationSpace:
+    def get_configuration_space() -> 'ConfigurationSpace':
+        from ConfigSpace import ConfigurationSpace
         return ConfigurationSpace(space={"search": ["astar", "bfs", "ids"],
                                          "heuristic": ["hmax", "blind", "lmcut"]})
+
+
+class AnytimeEngineImpl(EngineImpl, unified_planning.engines.mixins.AnytimePlannerMixin):
+    """
+    Anytime version of the up-pyperplan Engine: restarting weighted A* with decreasing weights,
+    bounded by the length of the best plan found so far. The problem is grounded and the
+    heuristic is built once, and the heuristic values are shared by all the iterations.
+    """
+
+    def __init__(self, heuristic: Optional[str] = "hff", weights: Optional[List[float]] = None,
+                 state_representation: str = "frozenset", cache_size: int = 0, pruning: bool = False,
+                 progress_callback: Optional[Callable[[Dict[str, str]], None]] = None, progress_interval: float = 1.0,
+                 memory_limit: Optional[int] = None, node_limit: Optional[int] = None):
+        EngineImpl.__init__(self, "wastar", heuristic, cache_size=cache_size, state_representation=state_representation,
+                            pruning=pruning, progress_callback=progress_callback, progress_interval=progress_interval,
+                            memory_limit=memory_limit, node_limit=node_limit)
+        up.engines.mixins.AnytimePlannerMixin.__init__(self)
+        from up_pyperplan.search import DEFAULT_WEIGHTS
+        self._weights = list(weights) if weights is not None else DEFAULT_WEIGHTS
+        if len(self._weights) == 0 or any(w < 1 for w in self._weights):
+            raise up.exceptions.UPUsageError('the weights must be at least 1!')
+        self._admissible = heuristic in ["hmax", "blind", "lmcut"]
+        # the landmark heuristic computes the value of a node from the one of its parent
+        self._reuse_h_values = heuristic != "landmark"
+        self._init_kwargs = dict(heuristic=heuristic, weights=weights, state_representation=state_representation,
+                                 cache_size=cache_size, pruning=pruning, progress_interval=progress_interval,
+                                 memory_limit=memory_limit, node_limit=node_limit)
+
+    @property
+    def name(self) -> str:
+        return "PyperplanAnytime"
+
+    @staticmethod
+    def ensures(anytime_guarantee: up.engines.AnytimeGuarantee) -> bool:
+        return anytime_guarantee == up.engines.AnytimeGuarantee.INCREASING_QUALITY
+
+    def _get_solutions(self, problem: 'up.model.AbstractProblem', timeout: Optional[float] = None,
+                       output_stream: Optional[IO[str]] = None) -> Iterator['up.engines.results.PlanGenerationResult']:
+        '''Yields an INTERMEDIATE result for every shorter plan found, then a final result with the best plan:
+        SOLVED_OPTIMALLY when its optimality is proven, SOLVED_SATISFICING when the timeout or the memory limit is reached first.'''
+        assert isinstance(problem, up.model.Problem)
+        if output_stream is not None:
+            warnings.warn('Pyperplan does not support output stream.', UserWarning)
+        monitor = self._monitor(timeout)
+
+        def result(status: PlanGenerationResultStatus, plan: Optional[List[str]]) -> 'up.engines.results.PlanGenerationResult':
+            metrics = self._result_metrics(monitor, time.time() - monitor.start)
+            up_plan = None
+            if plan is not None:
+                up_plan = up.plans.SequentialPlan([operators.action_instance(a) for a in plan])
+            return up.engines.PlanGenerationResult(status, up_plan, self.name, metrics=metrics)
+
+        best: Optional[List[str]] = None
+        proven = False
+        try:
+            # the watchdog of the monitor is armed only while the engine runs, never while the caller
+            # handles a result
+            with monitor:
+                with monitor.phase('conversion'):
+                    key = domain_key(problem) if self._cache is not None else None
+                    prob = self._convert(problem, key)
+                    operators = OperatorTable(problem)
+                task = self._monitored_ground(prob, key, monitor)
+                with monitor.phase('heuristic_init'):
+                    h = self._build_heuristic(task, "wastar", self._heuristic_name)
+                search_task, h = compact_task(task, h, "wastar", self._state_representation)
+                from up_pyperplan.search import restarting_weighted_astar
+                improvements = restarting_weighted_astar(MonitoredTask(search_task, monitor), MonitoredHeuristic(h, monitor),
+                                                         self._weights, self._admissible, self._reuse_h_values)
+            while not proven:
+                with monitor:
+                    with monitor.phase('search'):
+                        plan, proven = next(improvements)
+                if plan is not None:
+                    best = [op.name for op in plan]
+                    if not proven:
+                        yield result(PlanGenerationResultStatus.INTERMEDIATE, best)
+        except (SearchTimeout, SearchMemout, MemoryError) as e:
+            if isinstance(e, MemoryError):
+                monitor.counters.setdefault("limit_reached", "memory_limit")
+            if best is None:
+                yield result(PlanGenerationResultStatus.TIMEOUT if isinstance(e, SearchTimeout) else PlanGenerationResultStatus.MEMOUT, None)
+            else:
+                yield result(PlanGenerationResultStatus.SOLVED_SATISFICING, best)
+            return
+        if best is None:
+            yield result(PlanGenerationResultStatus.UNSOLVABLE_PROVEN, None)
+        elif len(problem.quality_metrics) > 0:
+            yield result(PlanGenerationResultStatus.SOLVED_OPTIMALLY, best)
+        else:
+            yield result(PlanGenerationResultStatus.SOLVED_SATISFICING, best)
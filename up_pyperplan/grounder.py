@@ -13,7 +13,8 @@
 # limitations under the License.
 
 
-from typing import Dict, List, Tuple
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 import unified_planning as up
 import pyperplan # type: ignore
 
@@ -24,13 +25,14 @@ def _change_notation(name: str) -> str:
     '''
     return("_".join(name[1:len(name)-1].split(" ")))
 
-def _get_fresh_name(new_problem: 'up.model.Problem', name: str) -> str:
-    '''This method gets always a fresh name for the problem'''
+def _get_fresh_name(names: Set[str], name: str) -> str:
+    '''This method gets always a fresh name, given the set of the names already used, and adds it to the set.'''
     new_name = name
     count = 0
-    while(new_problem.has_name(new_name)):
+    while(new_name in names):
         new_name = f'{name}_{str(count)}'
         count += 1
+    names.add(new_name)
     return new_name
 
 def _get_original_action_and_parameters_name(name: str) -> Tuple[str, List[str]]:
@@ -39,39 +41,304 @@ def _get_original_action_and_parameters_name(name: str) -> Tuple[str, List[str]]
     names = name[1:len(name)-1].split(" ")
     return (names[0], names[1:])
 
-def rewrite_back_task(task: 'pyperplan.task.Task', original_problem: 'up.model.Problem') -> Tuple['up.model.Problem', Dict['up.model.Action', Tuple['up.model.Action', List['up.model.FNode']]]]:
+class OperatorTable(Mapping):
+    """
+    Interned map from the names of the operators of a grounded task, in lisp notation, to the
+    tuple (original action, parameters).
+
+    The actions and the objects of the original problem are indexed once, when the table is
+    created; every operator name is parsed the first time it is looked up only, so converting
+    plans, and lifting back ground actions, are dict lookups, and all the instances of the
+    same operator share the tuple of parameters.
+    """
+
+    def __init__(self, original_problem: 'up.model.Problem'):
+        em = original_problem.environment.expression_manager
+        self.actions: Dict[str, 'up.model.Action'] = {a.name: a for a in original_problem.actions}
+        self.object_exps: Dict[str, 'up.model.FNode'] = {o.name: em.ObjectExp(o) for o in original_problem.all_objects}
+        self._entries: Dict[str, Tuple['up.model.Action', Tuple['up.model.FNode', ...]]] = {}
+
+    def __getitem__(self, operator_name: str) -> Tuple['up.model.Action', Tuple['up.model.FNode', ...]]:
+        entry = self._entries.get(operator_name, None)
+        if entry is None:
+            action_name, parameters_names = _get_original_action_and_parameters_name(operator_name)
+            try:
+                entry = (self.actions[action_name], tuple(self.object_exps[n] for n in parameters_names))
+            except KeyError:
+                raise KeyError(operator_name)
+            self._entries[operator_name] = entry
+        return entry
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def action_instance(self, operator_name: str) -> 'up.plans.ActionInstance':
+        '''Returns the ActionInstance of the original problem that corresponds to the operator called operator_name.'''
+        action, parameters = self[operator_name]
+        return up.plans.ActionInstance(action, parameters)
+
+
+class _GroundingContext:
+    """
+    Lookup tables, built once, to create the actions of the grounded problem from the operators of the task.
+    Every lookup goes through a dict, so the cost of grounding is linear in the number of operators.
+    """
+
+    def __init__(self, task: 'pyperplan.task.Task', original_problem: 'up.model.Problem'):
+        env = original_problem.environment
+        self.env = env
+        self.operators = OperatorTable(original_problem)
+        self.objects: Dict[str, 'up.model.Object'] = {o.name: o for o in original_problem.all_objects}
+        self.object_exps = self.operators.object_exps
+        self.fluents: Dict[str, 'up.model.Fluent'] = {f.name: f for f in original_problem.fluents}
+        self.actions = self.operators.actions
+        self.true_exp, self.false_exp = env.expression_manager.TRUE(), env.expression_manager.FALSE()
+        #map from names in the task domain to fluents of the grounded problem
+        self.vars_to_fluent_map: Dict[str, 'up.model.FNode'] = {}
+        for fact in task.facts:
+            fluent_name, object_names = _get_original_action_and_parameters_name(fact)
+            self.vars_to_fluent_map[fact] = self.fluents[fluent_name](*(self.object_exps[n] for n in object_names))
+
+    def fill(self, grounded_problem: 'up.model.Problem', task: 'pyperplan.task.Task', original_problem: 'up.model.Problem'):
+        '''Adds to the grounded_problem the fluents, objects, initial values and goals of the task.'''
+        for f in original_problem.fluents:
+            grounded_problem.add_fluent(f, default_initial_value=False)
+        grounded_problem.add_objects(original_problem.all_objects)
+        for init in task.initial_state:
+            grounded_problem.set_initial_value(self.vars_to_fluent_map[init], True)
+        for goal in task.goals:
+            grounded_problem.add_goal(self.vars_to_fluent_map[goal])
+
+    def used_names(self, grounded_problem: 'up.model.Problem') -> Set[str]:
+        '''Returns the names of the fluents, objects and types of the grounded_problem.'''
+        names: Set[str] = set(self.fluents)
+        names.update(self.objects)
+        names.update(t.name for t in grounded_problem.user_types) # type: ignore
+        return names
+
+    def action(self, name: str, operator: 'pyperplan.task.Operator') -> 'up.model.InstantaneousAction':
+        '''Returns the grounded action called name that corresponds to the given operator.'''
+        new_action = up.model.InstantaneousAction(name, _env=self.env)
+        for prec in operator.preconditions:
+            new_action.add_precondition(self.vars_to_fluent_map[prec])
+        for fluent_to_add in operator.add_effects:
+            new_action.add_effect(self.vars_to_fluent_map[fluent_to_add], self.true_exp)
+        for fluent_to_del in operator.del_effects:
+            new_action.add_effect(self.vars_to_fluent_map[fluent_to_del], self.false_exp)
+        return new_action
+
+    def lift(self, operator_name: str) -> Tuple['up.model.Action', Tuple['up.model.FNode', ...]]:
+        '''Returns the original action and the parameters of the operator called operator_name.'''
+        return self.operators[operator_name]
+
+
+def rewrite_back_task(task: 'pyperplan.task.Task', original_problem: 'up.model.Problem') -> Tuple['up.model.Problem', Dict['up.model.Action', Tuple['up.model.Action', Tuple['up.model.FNode', ...]]]]:
     #parse facts etc, init and goals. All are set of strings, so we need a way to parse fluents from objects.
     #facts are all the fluents applied to all the objects, in lisp notation, therefore a fluent "at" that takes a robot
     # and a location, with r1, r2, l1, l2 is represented as 4 facts called "(at r1 l1) (at r1 l2) (at r2 l1) (at r2 l2)"
     # those 4 facts are put on the vars_to_fluent_map in the beginning and then are used in the action's creation.
+    context = _GroundingContext(task, original_problem)
     grounded_problem = up.model.Problem(task.name, original_problem.environment)
-    rewrite_back_map: Dict['up.model.Action', Tuple['up.model.Action', List['up.model.FNode']]] = {}
-    #map from names in the task domain to fluents of the grounded problem
-    vars_to_fluent_map: Dict[str, 'up.model.FNode'] = {}
-    for f in original_problem.fluents:
-        grounded_problem.add_fluent(f, default_initial_value=False)
-    grounded_problem.add_objects(original_problem.all_objects)
-    for fact in task.facts:
-        fluent_name, object_names = _get_original_action_and_parameters_name(fact)
-        objects = [original_problem.object(n) for n in object_names]
-        fluent = original_problem.fluent(fluent_name)
-        vars_to_fluent_map[fact] = fluent(*objects)
-    for init in task.initial_state:
-        grounded_problem.set_initial_value(vars_to_fluent_map[init], True)
-    for goal in task.goals:
-        grounded_problem.add_goal(vars_to_fluent_map[goal])
+    rewrite_back_map: Dict['up.model.Action', Tuple['up.model.Action', Tuple['up.model.FNode', ...]]] = {}
+    context.fill(grounded_problem, task, original_problem)
+    used_names = context.used_names(grounded_problem)
+    new_actions: List['up.model.InstantaneousAction'] = []
     for operator in task.operators:
-        new_action = up.model.InstantaneousAction(_get_fresh_name(grounded_problem, _change_notation(operator.name)))
-        original_action_name, parameters_names = _get_original_action_and_parameters_name(operator.name)
-        for prec in operator.preconditions:
-            new_action.add_precondition(vars_to_fluent_map[prec])
-        for fluent_to_add in operator.add_effects:
-            new_action.add_effect(vars_to_fluent_map[fluent_to_add], True)
-        for fluent_to_del in operator.del_effects:
-            new_action.add_effect(vars_to_fluent_map[fluent_to_del], False)
-        grounded_problem.add_action(new_action)
-        parameters: List['up.model.Object'] = []
-        for parameter_name in parameters_names:
-            parameters.append(original_problem.object(parameter_name))
-        rewrite_back_map[new_action] = (original_problem.action(original_action_name), original_problem.environment.expression_manager.auto_promote(parameters))
+        new_action = context.action(_get_fresh_name(used_names, _change_notation(operator.name)), operator)
+        new_actions.append(new_action)
+        rewrite_back_map[new_action] = context.lift(operator.name)
+    _extend_actions(grounded_problem, new_actions)
     return (grounded_problem, rewrite_back_map)
+
+
+def _extend_actions(problem: 'up.model.Problem', actions: List['up.model.InstantaneousAction']):
+    '''Adds the given actions, that have fresh names and no parameters, to problem.
+
+    Problem.add_action checks the name of every action against all the actions added before, so
+    adding them one at a time is quadratic in their number. When the list returned by
+    Problem.actions is the one the problem stores, it is extended directly, skipping the checks;
+    with the versions of unified_planning that store the actions differently, add_actions is used.'''
+    stored = problem.actions
+    if isinstance(stored, list) and stored is getattr(problem, '_actions', None):
+        stored.extend(actions)
+    else:
+        problem.add_actions(actions)
+
+
+class _LazyActions(Sequence):
+    """Sequence of the actions of a LazyGroundedProblem, each one created when accessed."""
+
+    def __init__(self, problem: 'LazyGroundedProblem'):
+        self._problem = problem
+
+    def __len__(self) -> int:
+        return len(self._problem._operators)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._problem._ground_action(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('action index out of range')
+        return self._problem._ground_action(index)
+
+    def __iter__(self) -> Iterator['up.model.InstantaneousAction']:
+        for i in range(len(self)):
+            yield self._problem._ground_action(i)
+
+
+class LazyGroundedProblem(up.model.Problem):
+    """
+    Grounded problem that keeps the operators of the pyperplan task and creates the
+    corresponding InstantaneousAction only when it is accessed, without storing it, so
+    the memory needed does not grow with the UP representation of every ground action.
+
+    The actions can be iterated, indexed, and retrieved by name; a name is mapped back to
+    its operator by parsing it against the names of the original actions and objects.
+    New actions can not be added.
+    """
+
+    def __init__(self, task: 'pyperplan.task.Task', original_problem: 'up.model.Problem'):
+        up.model.Problem.__init__(self, task.name, original_problem.environment)
+        self._context = _GroundingContext(task, original_problem)
+        # the names of ground actions can clash only if some name of the original actions or objects contains
+        # the separator, otherwise every name has a single parsing
+        self._ambiguous = any('_' in n for n in self._context.actions) or any('_' in n for n in self._context.objects)
+        # index of the operator -> name, and back, for the few operators that did not get their plain name
+        self._renamed: Dict[int, str] = {}
+        self._renamed_back: Dict[str, int] = {}
+        # the problem has no actions until it is filled
+        self._operators: List['pyperplan.task.Operator'] = []
+        self._operator_index: Dict[str, int] = {}
+        self._reserved_names: Set[str] = set()
+        self._context.fill(self, task, original_problem)
+        self._operators = task.operators
+        self._operator_index = {op.name: i for i, op in enumerate(task.operators)}
+        self._reserved_names = self._context.used_names(self)
+        # the names are given in the order of the operators, like rewrite_back_task does, so an operator
+        # is renamed if its name is taken by the operators before it
+        for i, op in enumerate(self._operators):
+            name = _change_notation(op.name)
+            if self._taken(name, i):
+                new_name = self._fresh_name(name, i)
+                self._renamed[i] = new_name
+                self._renamed_back[new_name] = i
+        self._actions = _LazyActions(self) # type: ignore
+
+    def _parse(self, name: str) -> Iterator[str]:
+        '''Yields the names, in lisp notation, of the operators whose action name is the given one.'''
+        for action_name, action in self._context.actions.items():
+            arity = len(action.parameters)
+            if arity == 0:
+                if name == action_name:
+                    yield f'({action_name})'
+            elif name.startswith(action_name + '_'):
+                for parameters in self._split_objects(name[len(action_name) + 1:], arity):
+                    yield f'({" ".join([action_name] + parameters)})'
+
+    def _split_objects(self, name: str, arity: int) -> Iterator[List[str]]:
+        if arity == 1:
+            if name in self._context.objects:
+                yield [name]
+            return
+        separator = name.find('_')
+        while separator != -1:
+            head = name[:separator]
+            if head in self._context.objects:
+                for tail in self._split_objects(name[separator + 1:], arity - 1):
+                    yield [head] + tail
+            if not self._ambiguous:
+                return
+            separator = name.find('_', separator + 1)
+
+    def _plain_owner(self, name: str) -> Optional[int]:
+        '''Returns the index of the first operator whose name in the grounded notation is name.'''
+        owner = None
+        for operator_name in self._parse(name):
+            i = self._operator_index.get(operator_name, None)
+            if i is not None and (owner is None or i < owner):
+                owner = i
+            if not self._ambiguous:
+                break
+        return owner
+
+    def _taken(self, name: str, index: int) -> bool:
+        '''Returns True if name is used by the grounded problem before the action of the operator at index is named.'''
+        if name in self._reserved_names or name in self._renamed_back:
+            return True
+        owner = self._plain_owner(name)
+        return owner is not None and owner < index
+
+    def _fresh_name(self, name: str, index: int) -> str:
+        count = 0
+        new_name = f'{name}_{str(count)}'
+        while(self._taken(new_name, index)):
+            count += 1
+            new_name = f'{name}_{str(count)}'
+        return new_name
+
+    def _index_of(self, name: str) -> Optional[int]:
+        '''Returns the index of the operator of the action called name, None if there is no such action.'''
+        if name in self._renamed_back:
+            return self._renamed_back[name]
+        if name in self._reserved_names:
+            return None
+        i = self._plain_owner(name)
+        if i is None or i in self._renamed:
+            return None
+        return i
+
+    def _ground_action(self, index: int) -> 'up.model.InstantaneousAction':
+        operator = self._operators[index]
+        name = self._renamed.get(index, None)
+        if name is None:
+            name = _change_notation(operator.name)
+        return self._context.action(name, operator)
+
+    def action(self, name: str) -> 'up.model.Action':
+        i = self._index_of(name)
+        if i is None:
+            raise up.exceptions.UPValueError(f'Action of name: {name} is not defined!')
+        return self._ground_action(i)
+
+    def has_action(self, name: str) -> bool:
+        return self._index_of(name) is not None
+
+    def add_action(self, action: 'up.model.Action'):
+        raise up.exceptions.UPUsageError('actions can not be added to a LazyGroundedProblem')
+
+    def lift(self, name: str) -> Tuple['up.model.Action', Tuple['up.model.FNode', ...]]:
+        '''Returns the original action and the parameters of the ground action called name.'''
+        i = self._index_of(name)
+        if i is None:
+            raise KeyError(name)
+        return self._context.lift(self._operators[i].name)
+
+
+class LazyRewriteBackMap(Mapping):
+    """
+    Map from the actions of a LazyGroundedProblem to the tuple (original action, parameters),
+    computed from the name of the action when it is looked up instead of being stored.
+    """
+
+    def __init__(self, problem: LazyGroundedProblem):
+        self._problem = problem
+
+    def __getitem__(self, action: 'up.model.Action') -> Tuple['up.model.Action', Tuple['up.model.FNode', ...]]:
+        return self._problem.lift(action.name)
+
+    def __iter__(self) -> Iterator['up.model.Action']:
+        return iter(self._problem.actions)
+
+    def __len__(self) -> int:
+        return len(self._problem._operators)
+
+
+def lazy_rewrite_back_task(task: 'pyperplan.task.Task', original_problem: 'up.model.Problem') -> Tuple[LazyGroundedProblem, LazyRewriteBackMap]:
+    '''Like rewrite_back_task, but the actions of the grounded problem and the entries of the map are created when accessed.'''
+    grounded_problem = LazyGroundedProblem(task, original_problem)
+    return (grounded_problem, LazyRewriteBackMap(grounded_problem))
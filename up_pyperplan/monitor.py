@@ -0,0 +1,292 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Union
+import ctypes
+import sys
+import threading
+import time
+import pyperplan # type: ignore
+
+
+class SearchTimeout(Exception):
+    '''Raised inside the planning thread when the deadline of a SearchMonitor is reached.'''
+
+
+class SearchMemout(Exception):
+    '''Raised inside the planning thread when the memory or node limit of a SearchMonitor is reached.'''
+
+
+def peak_rss() -> Optional[int]:
+    '''Returns the peak resident set size of the process in bytes since it started, not the one of the
+    current run, None where it is not available.'''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def current_rss() -> Optional[int]:
+    '''Returns the anonymous resident memory of the process in bytes, the memory that can not be
+    given back to the disk. Falls back to the whole resident set, and to its peak, where it is not available.'''
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import os
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+class SearchMonitor:
+    """
+    Keeps track of the deadline, the memory budget and the counters of a single planning run.
+
+    The deadline is enforced in two ways:
+     - cooperatively, every time the search expands a node through a MonitoredTask;
+     - with a watchdog thread, running while the monitor is used as a context manager,
+       that raises SearchTimeout asynchronously in the planning thread. This covers
+       the code that has no cancellation points, like the pyperplan grounding.
+    Both work from any thread, not only from the main one.
+
+    The memory_limit, in MB, is enforced in the same way on the anonymous resident memory of the
+    process, that the watchdog samples every MEMORY_CHECK_INTERVAL seconds and the search every
+    MEMORY_CHECK_EXPANSIONS expansions, raising SearchMemout; the node_limit is checked on the
+    generated nodes at every expansion, raising SearchMemout too. The limit that stopped the run,
+    "timeout", "memory_limit" or "node_limit", is reported in the limit_reached metric.
+
+    If a progress_callback is given, it is called from the planning thread, at most every
+    progress_interval seconds while nodes are expanded, with the current metrics.
+    """
+
+    def __init__(self, timeout: Optional[float] = None,
+                 progress_callback: Optional[Callable[[Dict[str, str]], None]] = None,
+                 progress_interval: float = 1.0, memory_limit: Optional[int] = None,
+                 node_limit: Optional[int] = None):
+        self.start = time.time()
+        self.deadline: Optional[float] = None if timeout is None else self.start + timeout
+        self.expanded = 0
+        self.generated = 0
+        self.evaluated = 0
+        # upper bound of the size of the open list: every generated node is assumed to be inserted
+        self.peak_open = 0
+        self.phase_times: Dict[str, float] = {}
+        # additional metrics of the run, like the sizes of the task
+        self.counters: Dict[str, Union[int, str]] = {}
+        self._progress_callback = progress_callback
+        self._progress_interval = progress_interval
+        self._last_progress = self.start
+        self.memory_limit: Optional[int] = None if memory_limit is None else memory_limit * 1024 * 1024
+        self.node_limit = node_limit
+        self._thread_id: Optional[int] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._fired = False
+
+    MEMORY_CHECK_INTERVAL = 0.1
+    MEMORY_CHECK_EXPANSIONS = 256
+
+    def check(self):
+        '''Raises SearchTimeout if the deadline is reached, SearchMemout if the node limit is reached.'''
+        if self.deadline is not None and time.time() >= self.deadline:
+            self._limit_reached("timeout")
+            raise SearchTimeout()
+        if self.node_limit is not None and self.generated > self.node_limit:
+            self._limit_reached("node_limit")
+            raise SearchMemout()
+
+    def _limit_reached(self, reason: str):
+        '''Records the limit that stopped the run, unless another one was reached first. From then on
+        the watchdog does not raise its own exception, that could escape the handler of this one.'''
+        with self._lock:
+            if not self._fired:
+                self._fired = True
+                self.counters["limit_reached"] = reason
+
+    def memory_pressure(self, fraction: float = 0.8) -> bool:
+        '''Returns True if the memory used is at least the given fraction of the memory limit.'''
+        if self.memory_limit is None:
+            return False
+        rss = current_rss()
+        return rss is not None and rss >= fraction * self.memory_limit
+
+    def expand(self, successors: int):
+        '''Records the expansion of a node with the given number of successors.'''
+        self.check()
+        if self.memory_limit is not None and self.expanded % self.MEMORY_CHECK_EXPANSIONS == 0 and self.memory_pressure(1.0):
+            self._limit_reached("memory_limit")
+            raise SearchMemout()
+        self.expanded += 1
+        self.generated += successors
+        self.peak_open = max(self.peak_open, self.generated - self.expanded + 1)
+        if self._progress_callback is not None:
+            self.progress()
+
+    def evaluate(self, nodes: int = 1):
+        '''Records the heuristic evaluation of the given number of nodes.'''
+        self.evaluated += nodes
+
+    def progress(self):
+        '''Calls the progress callback with the current metrics, if progress_interval seconds passed since the last call.'''
+        now = time.time()
+        if self._progress_callback is not None and now - self._last_progress >= self._progress_interval:
+            self._last_progress = now
+            metrics = self.metrics()
+            metrics['elapsed_time'] = str(now - self.start)
+            self._progress_callback(metrics)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        '''Measures the time spent in the phase called name, also when it is interrupted.'''
+        self.check()
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.phase_times[name] = self.phase_times.get(name, 0) + time.time() - start
+
+    def metrics(self) -> Dict[str, str]:
+        '''Returns the counters in the format of the PlanGenerationResult metrics.'''
+        metrics = {f'{name}_time': str(t) for name, t in self.phase_times.items()}
+        metrics['expanded_nodes'] = str(self.expanded)
+        metrics['generated_nodes'] = str(self.generated)
+        metrics['evaluated_nodes'] = str(self.evaluated)
+        metrics['peak_open_list_bound'] = str(self.peak_open)
+        for name, value in self.counters.items():
+            metrics[name] = str(value)
+        # ru_maxrss is the peak of the whole process, also before this run, not only of this run
+        peak = peak_rss()
+        if peak is not None:
+            metrics['process_peak_rss_bytes'] = str(peak)
+        return metrics
+
+    def _start_watchdog(self):
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        try:
+            self._watchdog.start()
+        except (RuntimeError, MemoryError):
+            # the thread can not be created when the address space of the process is exhausted
+            self._watchdog = None
+            self._limit_reached("memory_limit")
+            raise SearchMemout()
+
+    def _stop_watchdog(self):
+        assert self._watchdog is not None
+        self._stop.set()
+        self._watchdog.join()
+        self._watchdog = None
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        '''Stops the watchdog thread while the block runs, for instance to fork the process with no
+        thread of the monitor running; the deadline is only checked again when the block ends.'''
+        if self._watchdog is None:
+            yield
+            return
+        self._stop_watchdog()
+        try:
+            yield
+        finally:
+            self._start_watchdog()
+
+    def __enter__(self) -> 'SearchMonitor':
+        if self.deadline is not None or self.memory_limit is not None:
+            self._thread_id = threading.get_ident()
+            self._fired = False
+            self._start_watchdog()
+        return self
+
+    def __exit__(self, *args):
+        if self._watchdog is not None:
+            self._stop_watchdog()
+            with self._lock:
+                self._thread_id = None
+                if self._fired:
+                    # the exception might not have been delivered yet; it must not escape the monitored code
+                    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(threading.get_ident()), None)
+
+    def _watch(self):
+        while True:
+            wait = None if self.deadline is None else max(0.0, self.deadline - time.time())
+            if self.memory_limit is not None:
+                wait = self.MEMORY_CHECK_INTERVAL if wait is None else min(wait, self.MEMORY_CHECK_INTERVAL)
+            if self._stop.wait(wait):
+                return
+            if self.deadline is not None and time.time() >= self.deadline:
+                self._interrupt(SearchTimeout, "timeout")
+                return
+            if self.memory_pressure(1.0):
+                self._interrupt(SearchMemout, "memory_limit")
+                return
+
+    def _interrupt(self, exception: type, reason: str):
+        with self._lock:
+            # a limit already reached cooperatively raised its exception in the planning thread
+            if self._thread_id is not None and not self._fired:
+                self._fired = True
+                self.counters["limit_reached"] = reason
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self._thread_id),
+                                                           ctypes.py_object(exception))
+
+
+class MonitoredTask:
+    """
+    Wraps a pyperplan Task reporting every node expansion to a SearchMonitor.
+    All the pyperplan searches generate successors through get_successor_states,
+    so this is where the cooperative cancellation point is placed.
+    """
+
+    def __init__(self, task: 'pyperplan.task.Task', monitor: SearchMonitor):
+        self._task = task
+        self._monitor = monitor
+
+    def get_successor_states(self, state):
+        successors = self._task.get_successor_states(state)
+        self._monitor.expand(len(successors))
+        return successors
+
+    def __getattr__(self, name: str):
+        return getattr(self._task, name)
+
+
+class MonitoredHeuristic:
+    """Wraps a pyperplan heuristic reporting every evaluation to a SearchMonitor."""
+
+    def __init__(self, heuristic, monitor: SearchMonitor):
+        self._heuristic = heuristic
+        self._monitor = monitor
+
+    def __call__(self, node):
+        self._monitor.evaluate()
+        return self._heuristic(node)
+
+    def calc_h_with_plan(self, node):
+        self._monitor.evaluate()
+        return self._heuristic.calc_h_with_plan(node)
+
+    def __getattr__(self, name: str):
+        return getattr(self._heuristic, name)
@@ -0,0 +1,59 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Access to pyperplan.planner, that imports every search and heuristic module of pyperplan when
+it is imported, deferred to the first time a search, an heuristic or the grounding is used.
+"""
+
+
+from typing import Any, Callable, Optional
+import pyperplan # type: ignore
+
+
+# names of the searches and heuristics that pyperplan.planner always provides, known without importing it
+SEARCH_NAMES = ["astar", "wastar", "gbf", "bfs", "ehs", "ids", "sat"]
+HEURISTIC_NAMES = ["hadd", "hmax", "hsa", "hff", "blind", "lmcut", "landmark"]
+
+
+def _planner():
+    import pyperplan.planner # type: ignore
+    return pyperplan.planner
+
+
+def is_search(name: Optional[str]) -> bool:
+    '''Returns True if name is the name of a search of pyperplan, importing pyperplan.planner only for the unknown names.'''
+    return name in SEARCH_NAMES or (name is not None and name in _planner().SEARCHES)
+
+
+def is_heuristic(name: Optional[str]) -> bool:
+    '''Returns True if name is the name of an heuristic of pyperplan, importing pyperplan.planner only for the unknown names.'''
+    return name in HEURISTIC_NAMES or (name is not None and name in _planner().HEURISTICS)
+
+
+def search_function(name: str) -> Callable:
+    return _planner().SEARCHES[name]
+
+
+def heuristic_class(name: str) -> Any:
+    return _planner().HEURISTICS[name]
+
+
+def ground(problem: 'pyperplan.pddl.pddl.Problem', **kwargs) -> 'pyperplan.task.Task':
+    '''pyperplan.planner._ground'''
+    return _planner()._ground(problem, **kwargs)
+
+
+def search(task, search: Callable, heuristic):
+    '''pyperplan.planner._search'''
+    return _planner()._search(task, search, heuristic)
@@ -0,0 +1,162 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+import time
+import pyperplan # type: ignore
+from up_pyperplan import planner
+from up_pyperplan.bitset import BitsetTask, DecodingHeuristic, decode_fluents
+from up_pyperplan.monitor import SearchMemout, SearchMonitor, MonitoredHeuristic, MonitoredTask, SearchTimeout
+
+
+DEFAULT_PORTFOLIO: List[Tuple[str, Optional[str]]] = [("gbf", "hff"), ("wastar", "hadd"), ("ehs", "hff"), ("astar", "lmcut")]
+
+# searches that do not use an heuristic
+BLIND_SEARCHES = ["bfs", "ids", "sat"]
+
+# searches that explore the whole reachable state space before failing
+COMPLETE_SEARCHES = ["astar", "wastar", "gbf", "bfs", "ids", "lazy_gbf", "lazy_wastar"]
+
+# "bitset" stores the states as integer bitmasks, see up_pyperplan.bitset
+STATE_REPRESENTATIONS = ["frozenset", "bitset"]
+
+# (plan as operator names, fluents, metrics of the configuration that found it, index of the configuration)
+PortfolioSolution = Tuple[List[str], List[Any], Dict[str, str], int]
+
+
+class PortfolioWorkerError(Exception):
+    '''Raised when a worker of the portfolio died without a result, and no other one found a plan.'''
+
+
+# heuristics with a numpy implementation in up_pyperplan.vectorized used by the vectorized_heuristics option;
+# hFFVectorizedHeuristic extracts the relaxed plan of one state at a time, and is slower than the pure hff
+VECTORIZED_HEURISTIC_NAMES = ["hadd", "hmax"]
+
+
+def heuristic_class(name: str, vectorized: bool = False):
+    '''Returns the class of the heuristic called name, the numpy implementation if vectorized is set and there is one.'''
+    if vectorized and name in VECTORIZED_HEURISTIC_NAMES:
+        from up_pyperplan.vectorized import VECTORIZED_HEURISTICS
+        return VECTORIZED_HEURISTICS[name]
+    return planner.heuristic_class(name)
+
+
+def compact_task(task: 'pyperplan.task.Task', heuristic, search: str, state_representation: str) -> Tuple[Any, Any]:
+    '''Returns the task and the heuristic to give to the search for the given state representation.
+    The sat search encodes the facts by name, so it always works on the original task.'''
+    if state_representation != "bitset" or search == "sat":
+        return (task, heuristic)
+    bitset_task = BitsetTask(task)
+    if heuristic is None or getattr(heuristic, 'accepts_bitset_states', False):
+        return (bitset_task, heuristic)
+    return (bitset_task, DecodingHeuristic(heuristic, bitset_task))
+
+
+def _run_configuration(index: int, task: 'pyperplan.task.Task', search: str, heuristic: Optional[str],
+                       timeout: Optional[float], state_representation: str, vectorized: bool,
+                       results: 'multiprocessing.Queue', memory_limit: Optional[int] = None,
+                       node_limit: Optional[int] = None):
+    '''Body of a portfolio worker: solves task with a single configuration, within the memory limit (in MB)
+    of the process and the node limit, and puts in results the tuple (index, plan as operator names or None,
+    fluents, metrics); when a limit is reached the plan is None and the metrics report it in limit_reached.'''
+    monitor = SearchMonitor(timeout, memory_limit=memory_limit, node_limit=node_limit)
+    try:
+        with monitor:
+            with monitor.phase('heuristic_init'):
+                h = heuristic_class(heuristic, vectorized)(task) if heuristic is not None and search not in BLIND_SEARCHES else None
+            with monitor.phase('search'):
+                search_task, h = compact_task(task, h, search, state_representation)
+                if h is not None:
+                    h = MonitoredHeuristic(h, monitor)
+                solution = planner.search(MonitoredTask(search_task, monitor), planner.search_function(search), h)
+    except SearchTimeout:
+        return
+    except (SearchMemout, MemoryError):
+        monitor.counters.setdefault("limit_reached", "memory_limit")
+        results.put((index, None, [], monitor.metrics()))
+        return
+    if solution is None:
+        results.put((index, None, [], monitor.metrics()))
+    else:
+        fluents = list(solution[1])
+        if isinstance(search_task, BitsetTask):
+            fluents = decode_fluents(search_task, fluents)
+        results.put((index, [op.name for op in solution[0]], fluents, monitor.metrics()))
+
+
+def run_portfolio(task: 'pyperplan.task.Task', configurations: List[Tuple[str, Optional[str]]],
+                  monitor: SearchMonitor, state_representation: str = "frozenset",
+                  vectorized: bool = False) -> Tuple[Optional[PortfolioSolution], bool]:
+    '''Races the given (search, heuristic) configurations on the grounded task, each one in its
+    own process, and returns the first solution found, killing the other processes.
+
+    The task is grounded only once: the workers inherit it when the processes are forked and
+    receive a pickled copy otherwise. The watchdog thread of the monitor is paused while the
+    workers are started, so that no lock it holds can be inherited taken by a forked worker.
+    Every worker has the memory limit and the node limit of the monitor.
+    Returns the solution, or None, and a flag that tells if a complete search proved that the
+    task is unsolvable; raises SearchTimeout when the deadline of the monitor is reached,
+    SearchMemout when every worker reached the memory or the node limit, and
+    PortfolioWorkerError when a worker died, for instance killed by the system, and no plan was found.'''
+    import multiprocessing
+    import queue
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    timeout = None if monitor.deadline is None else max(0.0, monitor.deadline - time.time())
+    memory_limit = None if monitor.memory_limit is None else monitor.memory_limit // (1024 * 1024)
+    workers = [context.Process(target=_run_configuration, args=(i, task, s, h, timeout, state_representation, vectorized, results,
+                                                                memory_limit, monitor.node_limit), daemon=True)
+               for i, (s, h) in enumerate(configurations)]
+    try:
+        with monitor.paused():
+            for w in workers:
+                w.start()
+        reported: Set[int] = set()
+        # the limit reached by every worker that stopped because of one
+        limits: Dict[int, str] = {}
+        while len(reported) < len(workers):
+            monitor.check()
+            monitor.progress()
+            try:
+                index, plan, fluents, metrics = results.get(timeout=0.05)
+            except queue.Empty:
+                if not any(w.is_alive() for w in workers) and results.empty():
+                    break
+                continue
+            reported.add(index)
+            if plan is not None:
+                return ((plan, fluents, metrics, index), False)
+            if "limit_reached" in metrics:
+                limits[index] = metrics["limit_reached"]
+                continue
+            if configurations[index][0] in COMPLETE_SEARCHES:
+                return (None, True)
+        monitor.check()
+        # a worker that reported its result might not have exited yet
+        for i, ((s, h), w) in enumerate(zip(configurations, workers)):
+            if i not in reported and w.exitcode != 0:
+                raise PortfolioWorkerError(f'The portfolio configuration {s}/{h} exited with code {w.exitcode}')
+        if len(limits) == len(workers):
+            monitor.counters["limit_reached"] = "memory_limit" if "memory_limit" in limits.values() else "node_limit"
+            raise SearchMemout()
+        return (None, False)
+    finally:
+        for w in workers:
+            if w.is_alive():
+                w.terminate()
+        for w in workers:
+            if w.pid is not None:
+                w.join()
+        results.close()
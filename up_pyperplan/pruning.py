@@ -0,0 +1,94 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import deque
+from typing import Dict, List, Set, Tuple
+import pyperplan # type: ignore
+from pyperplan.task import Operator, Task # type: ignore
+
+
+def _reachable(task: 'pyperplan.task.Task') -> Tuple[Set[str], List[bool]]:
+    '''Relaxed forward reachability from the initial state: returns the reachable facts and,
+    for every operator, if it is applicable in some reachable relaxed state.'''
+    missing = [len(op.preconditions) for op in task.operators]
+    precondition_of: Dict[str, List[int]] = {}
+    for i, op in enumerate(task.operators):
+        for f in op.preconditions:
+            precondition_of.setdefault(f, []).append(i)
+    reached = [False] * len(task.operators)
+    facts: Set[str] = set(task.initial_state)
+    queue = deque(facts)
+    queue.extend(i for i, m in enumerate(missing) if m == 0)
+    while queue:
+        item = queue.popleft()
+        if isinstance(item, int):
+            reached[item] = True
+            for f in task.operators[item].add_effects:
+                if f not in facts:
+                    facts.add(f)
+                    queue.append(f)
+            continue
+        for i in precondition_of.get(item, []):
+            missing[i] -= 1
+            if missing[i] == 0:
+                queue.append(i)
+    return (facts, reached)
+
+
+def _relevant(task: 'pyperplan.task.Task', candidates: List[bool]) -> Tuple[Set[str], List[bool]]:
+    '''Backward relevance from the goals, over the candidate operators only: returns the relevant
+    facts and, for every operator, if it adds a relevant fact.'''
+    achievers: Dict[str, List[int]] = {}
+    for i, op in enumerate(task.operators):
+        if candidates[i]:
+            for f in op.add_effects:
+                achievers.setdefault(f, []).append(i)
+    relevant = [False] * len(task.operators)
+    facts: Set[str] = set(task.goals)
+    queue = deque(facts)
+    while queue:
+        for i in achievers.get(queue.popleft(), []):
+            if not relevant[i]:
+                relevant[i] = True
+                for f in task.operators[i].preconditions:
+                    if f not in facts:
+                        facts.add(f)
+                        queue.append(f)
+    return (facts, relevant)
+
+
+def prune(task: 'pyperplan.task.Task') -> 'pyperplan.task.Task':
+    '''Returns a copy of the grounded task without the operators that are not reachable from the
+    initial state in the delete relaxation or that do not contribute to the goals, without the effects
+    on the facts that do not matter for the goals, and without the static facts, that are true in the
+    initial state and that no operator left changes, in the preconditions, initial state and goals.
+
+    The operators of the task are not modified, and the order of the operators left is kept.'''
+    reachable_facts, reachable = _reachable(task)
+    relevant_facts, relevant = _relevant(task, reachable)
+    facts = reachable_facts & relevant_facts
+    changed: Set[str] = set()
+    kept: List['pyperplan.task.Operator'] = []
+    for i, op in enumerate(task.operators):
+        if reachable[i] and relevant[i]:
+            kept.append(op)
+            changed.update(op.add_effects & facts)
+            changed.update(op.del_effects & facts)
+    statics = facts - changed
+    facts = (facts - statics) | (set(task.goals) - statics)
+    operators = [Operator(op.name, op.preconditions - statics, op.add_effects & facts, op.del_effects & facts) for op in kept]
+    initial_state = frozenset(f for f in task.initial_state if f in facts)
+    goals = frozenset(f for f in task.goals if f not in statics)
+    return Task(task.name, facts, initial_state, goals, operators)
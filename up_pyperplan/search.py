@@ -0,0 +1,299 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+import heapq
+import pyperplan # type: ignore
+from up_pyperplan.closed_list import NO_OPERATOR, SpillingClosedList
+
+
+DEFAULT_WEIGHTS = [5, 3, 2, 1.5, 1]
+
+
+def bounded_weighted_astar(task, heuristic, weight: float, bound: float, admissible: bool,
+                           h_values: Optional[Dict[Any, float]]) -> Tuple[Optional[List['pyperplan.task.Operator']], bool]:
+    '''Weighted A* that only looks for plans shorter than bound.
+
+    The nodes that can not lead to such a plan are pruned: the ones whose g, plus the heuristic value when the
+    heuristic is admissible, or plus one when they are not goal states, reaches the bound. Cheaper paths to the
+    states already seen are reopened, so when the open list is exhausted no plan shorter than bound exists.
+    The heuristic values are stored in h_values, by state, to be reused by the next calls, unless it is None.
+
+    Returns the first plan found, or None, and a flag that tells if the search space was exhausted.'''
+    from pyperplan.search import searchspace # type: ignore
+    def evaluate(node) -> float:
+        if h_values is None:
+            return heuristic(node)
+        h = h_values.get(node.state, None)
+        if h is None:
+            h = heuristic(node)
+            h_values[node.state] = h
+        return h
+
+    def lower_bound(node, h: float) -> float:
+        if admissible:
+            return node.g + h
+        return node.g if task.goal_reached(node.state) else node.g + 1
+
+    open: List[Tuple[float, float, int, Any]] = []
+    state_cost = {task.initial_state: 0}
+    node_tiebreaker = 0
+    root = searchspace.make_root_node(task.initial_state)
+    h = evaluate(root)
+    if h == float('inf') or lower_bound(root, h) >= bound:
+        return (None, True)
+    heapq.heappush(open, (weight * h, h, node_tiebreaker, root))
+    while open:
+        _f, _h, _tie, pop_node = heapq.heappop(open)
+        pop_state = pop_node.state
+        if state_cost[pop_state] != pop_node.g:
+            continue
+        if task.goal_reached(pop_state):
+            return (pop_node.extract_solution(), False)
+        for op, succ_state in task.get_successor_states(pop_state):
+            if pop_node.g + 1 >= state_cost.get(succ_state, float('inf')):
+                continue
+            succ_node = searchspace.make_child_node(pop_node, op, succ_state)
+            h = evaluate(succ_node)
+            if h == float('inf') or lower_bound(succ_node, h) >= bound:
+                continue
+            node_tiebreaker += 1
+            heapq.heappush(open, (succ_node.g + weight * h, h, node_tiebreaker, succ_node))
+            state_cost[succ_state] = succ_node.g
+    return (None, True)
+
+
+def restarting_weighted_astar(task, heuristic, weights: Sequence[float] = DEFAULT_WEIGHTS,
+                              admissible: bool = False, reuse_h_values: bool = True) -> Iterator[Tuple[Optional[List['pyperplan.task.Operator']], bool]]:
+    '''Anytime search: runs weighted A* with the given decreasing weights, each run restarted from the initial
+    state and bounded by the length of the best plan found so far, repeating the last weight until the bound
+    can not be improved. The heuristic values are computed once and shared by all the runs, unless
+    reuse_h_values is False, as needed by the heuristics that depend on the path, like the landmark one.
+
+    Yields the tuple (plan, proven) every time a shorter plan is found, and a last tuple (None, True) when the
+    search space is exhausted, proving that the last plan yielded is optimal, or that there is no plan. With an
+    admissible heuristic a plan found with weight 1 is optimal, so it is yielded with proven set.'''
+    h_values: Optional[Dict[Any, float]] = {} if reuse_h_values else None
+    bound = float('inf')
+    i = 0
+    while True:
+        weight = weights[min(i, len(weights) - 1)]
+        plan, exhausted = bounded_weighted_astar(task, heuristic, weight, bound, admissible, h_values)
+        if exhausted:
+            yield (None, True)
+            return
+        assert plan is not None
+        bound = len(plan)
+        if admissible and weight <= 1:
+            yield (plan, True)
+            return
+        yield (plan, False)
+        i += 1
+
+
+def spilling_weighted_astar(task, heuristic, weight: float, closed: SpillingClosedList,
+                            memory_pressure: Callable[[], bool],
+                            check_interval: int = 1024) -> Optional[Tuple[List['pyperplan.task.Operator'], List[int]]]:
+    '''Weighted A* on a BitsetTask that keeps in the closed list, instead of in search nodes, the parent
+    of every state, so the closed list can be spilled to the disk when memory_pressure, checked every
+    check_interval expansions, returns True. The open list only contains tuples of integers.
+
+    The heuristic is given nodes with the state as a bitmask if it has the accepts_bitset_states
+    attribute, and then with a parent node holding the expanded state only, and as a set of facts
+    without a parent otherwise.
+    Returns the plan and the states along it, or None if there is no plan.'''
+    from pyperplan.search import searchspace # type: ignore
+    bitset_states = getattr(heuristic, 'accepts_bitset_states', False)
+    operators = task.operators
+    operator_index = {id(op): i for i, op in enumerate(operators)}
+
+    def evaluate(state: int, parent, action, g: int) -> float:
+        if bitset_states:
+            return heuristic(searchspace.SearchNode(state, parent, action, g))
+        return heuristic(searchspace.SearchNode(task.decode(state), None, action, g))
+
+    def extract_solution(state: int) -> Tuple[List['pyperplan.task.Operator'], List[int]]:
+        plan = []
+        states = [state]
+        entry = closed.get(state)
+        while entry is not None and entry[2] != NO_OPERATOR:
+            plan.append(operators[entry[2]])
+            state = entry[1]
+            states.append(state)
+            entry = closed.get(state)
+        plan.reverse()
+        states.reverse()
+        return (plan, states)
+
+    initial_state = task.initial_state
+    h = evaluate(initial_state, None, None, 0)
+    if h == float('inf'):
+        return None
+    closed.put(initial_state, 0, initial_state, NO_OPERATOR)
+    open: List[Tuple[float, float, int, int, int]] = [(weight * h, h, 0, 0, initial_state)]
+    node_tiebreaker = 0
+    expansions = 0
+    while open:
+        _f, _h, _tie, g, state = heapq.heappop(open)
+        entry = closed.get(state)
+        if entry is None or entry[0] != g:
+            continue
+        if task.goal_reached(state):
+            return extract_solution(state)
+        expansions += 1
+        if expansions % check_interval == 0 and not closed.spilled and memory_pressure():
+            closed.spill()
+        parent = searchspace.SearchNode(state, None, None, g) if bitset_states else None
+        for op, succ_state in task.get_successor_states(state):
+            succ_entry = closed.get(succ_state)
+            if succ_entry is not None and g + 1 >= succ_entry[0]:
+                continue
+            h = evaluate(succ_state, parent, op, g + 1)
+            if h == float('inf'):
+                continue
+            node_tiebreaker += 1
+            heapq.heappush(open, (g + 1 + weight * h, h, node_tiebreaker, g + 1, succ_state))
+            closed.put(succ_state, g + 1, state, operator_index[id(op)])
+    return None
+
+
+class BucketOpenList:
+    """
+    Open list with a FIFO bucket for every priority. Only the distinct priorities are kept in a
+    heap, so with the small integer heuristic values of pyperplan pushing and popping an entry
+    costs about as much as a deque operation.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Any, Deque[Any]] = {}
+        self._priorities: List[Any] = []
+        self._size = 0
+
+    def push(self, priority, item):
+        bucket = self._buckets.get(priority, None)
+        if bucket is None:
+            bucket = self._buckets[priority] = deque()
+            heapq.heappush(self._priorities, priority)
+        bucket.append(item)
+        self._size += 1
+
+    def pop(self) -> Any:
+        '''Removes and returns the oldest item with the lowest priority.'''
+        priority = self._priorities[0]
+        bucket = self._buckets[priority]
+        item = bucket.popleft()
+        if not bucket:
+            heapq.heappop(self._priorities)
+            del self._buckets[priority]
+        self._size -= 1
+        return item
+
+    def __len__(self) -> int:
+        return self._size
+
+
+# priority added to the preferred open list every time the best heuristic value improves
+PREFERRED_BOOST = 1000
+
+
+def lazy_best_first_search(task, heuristic, weight: Optional[float] = None, preferred_operators: bool = False,
+                           reopen: bool = False) -> Optional[Tuple[List['pyperplan.task.Operator'], List[Any]]]:
+    '''Best-first search on a Task or a BitsetTask with deferred evaluation: the successors of a node are inserted
+    in the open list with the heuristic value of the node, and are evaluated only when they are popped.
+
+    The open lists are BucketOpenLists: greedy, ordered by h and then by g, without weight, and ordered by
+    g + weight * h and then by h with it. The states are identified by their set of facts or their bitmask:
+    every state is evaluated and expanded only once, unless reopen is set and it is reached again with a lower g.
+    With preferred_operators, the heuristic must have calc_h_with_plan returning the names of the operators
+    of a relaxed plan, like hff: the successors through them are also inserted in a second open list, and
+    the two lists are popped alternately, the preferred one PREFERRED_BOOST more times every time the
+    best heuristic value improves.
+
+    On a BitsetTask the heuristic is given nodes with the state as a bitmask if it has the accepts_bitset_states
+    attribute, and as a set of facts otherwise; the nodes with the state of the task have a parent node
+    holding the expanded state only.
+    Returns the plan and the states along it, or None if there is no plan.'''
+    from pyperplan.search import searchspace # type: ignore
+    decode = getattr(task, 'decode', None)
+    task_states = decode is None or getattr(heuristic, 'accepts_bitset_states', False)
+    operators = task.operators
+    operator_index = {id(op): i for i, op in enumerate(operators)}
+    # state -> (g, parent state, index of the operator from the parent, -1 for the initial state)
+    closed: Dict[Any, Tuple[int, Any, int]] = {}
+    open_lists = [BucketOpenList(), BucketOpenList()] if preferred_operators else [BucketOpenList()]
+    # the open list popped next is the one with the lowest priority
+    priorities = [0] * len(open_lists)
+    best_h = float('inf')
+    # heuristic values of the states that can be reopened
+    h_values: Dict[Any, Tuple[float, Optional[Any]]] = {}
+
+    def evaluate(state, parent, action, g: int) -> Tuple[float, Optional[Any]]:
+        if task_states:
+            node = searchspace.SearchNode(state, searchspace.SearchNode(parent, None, None, g - 1), action, g)
+        else:
+            node = searchspace.SearchNode(decode(state), None, action, g)
+        if preferred_operators:
+            return heuristic.calc_h_with_plan(node)
+        return (heuristic(node), None)
+
+    def priority(h: float, g: int) -> Tuple[float, float]:
+        return (h, g) if weight is None else (g + weight * h, h)
+
+    def extract_solution(state) -> Tuple[List['pyperplan.task.Operator'], List[Any]]:
+        plan = []
+        states = [state]
+        _g, parent, op = closed[state]
+        while op >= 0:
+            plan.append(operators[op])
+            state = parent
+            states.append(state)
+            _g, parent, op = closed[state]
+        plan.reverse()
+        states.reverse()
+        return (plan, states)
+
+    open_lists[0].push((0, 0), (task.initial_state, 0, task.initial_state, -1))
+    while any(open_lists):
+        i = min((p, i) for i, p in enumerate(priorities) if open_lists[i])[1]
+        priorities[i] += 1
+        state, g, parent, op = open_lists[i].pop()
+        entry = closed.get(state, None)
+        if entry is not None and (not reopen or g >= entry[0]):
+            continue
+        closed[state] = (g, parent, op)
+        if task.goal_reached(state):
+            return extract_solution(state)
+        if entry is not None:
+            h, relaxed_plan = h_values[state]
+        else:
+            h, relaxed_plan = evaluate(state, parent, operators[op] if op >= 0 else None, g)
+            if reopen:
+                h_values[state] = (h, relaxed_plan)
+        if h == float('inf'):
+            continue
+        if h < best_h:
+            best_h = h
+            if preferred_operators:
+                priorities[1] -= PREFERRED_BOOST
+        for succ_op, succ_state in task.get_successor_states(state):
+            succ_entry = closed.get(succ_state, None)
+            if succ_entry is not None and (not reopen or g + 1 >= succ_entry[0]):
+                continue
+            entry = (succ_state, g + 1, state, operator_index[id(succ_op)])
+            open_lists[0].push(priority(h, g + 1), entry)
+            if relaxed_plan and succ_op.name in relaxed_plan:
+                open_lists[1].push(priority(h, g + 1), entry)
+    return None
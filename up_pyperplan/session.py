@@ -0,0 +1,176 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+import time
+import unified_planning as up
+from unified_planning.engines import PlanGenerationResultStatus
+from unified_planning.exceptions import UPUnsupportedProblemTypeError
+import pyperplan # type: ignore
+from pyperplan import grounding # type: ignore
+from pyperplan.task import Operator, Task # type: ignore
+from up_pyperplan.cache import domain_key, ground_operators, relevant_task
+from up_pyperplan.engine import EngineImpl
+from up_pyperplan.grounder import OperatorTable
+from up_pyperplan.monitor import SearchMemout, SearchMonitor, SearchTimeout
+from up_pyperplan.portfolio import PortfolioWorkerError
+
+
+# heuristics whose data structures only depend on the operators and on the goals of the task
+INIT_INDEPENDENT_HEURISTICS = ["hadd", "hmax", "hsa", "hff", "blind", "lmcut"]
+
+
+def _fact(fluent: 'up.model.FNode') -> str:
+    '''Returns the name of the pyperplan fact of the given fluent expression.'''
+    return grounding._get_grounded_string(fluent.fluent().name, [a.object().name for a in fluent.args])
+
+
+class PlanningSession:
+    """
+    Plans many times on a problem whose initial state and goals change between the calls, while
+    the domain and the objects stay the same.
+
+    The domain is converted and the problem grounded, without the relevance analysis, only once, by
+    the first call to replan. The next calls update the initial values and the goals and only
+    recompute what depends on them: the relevance analysis of the operators when the goals change,
+    the pruning, if the engine is configured with it, and the heuristic when its data structures
+    depend on what changed. The problem is grounded again only when the initial value of a static
+    fluent, that no action changes, is modified.
+
+    The session uses the engine it is created with, so it must not be used by other threads meanwhile.
+    """
+
+    def __init__(self, engine: EngineImpl, problem: 'up.model.Problem'):
+        self._engine = engine
+        self._problem = problem.clone()
+        self._operators_table = OperatorTable(self._problem)
+        self._init: Set[str] = set()
+        for fluent, value in self._problem.initial_values.items():
+            if not value.is_bool_constant():
+                raise UPUnsupportedProblemTypeError(f"Initial value: {value} of fluent: {fluent} is not True or False.")
+            if value.bool_constant_value():
+                self._init.add(_fact(fluent))
+        self._goals = self._goal_facts(self._problem.goals)
+        # set by the grounding, reset when a static fact changes
+        self._operators: Optional[List[Operator]] = None
+        self._operators_facts: FrozenSet[str] = frozenset()
+        self._statics: Set[str] = set()
+        # goals -> task with the relevant operators
+        self._relevant: Optional[Tuple[FrozenSet[str], Task]] = None
+        # ((search, heuristic name), operators, goals, initial state if the heuristic depends on it, heuristic)
+        self._heuristic: Optional[Tuple[Tuple[str, Optional[str]], List[Operator], FrozenSet[str], Optional[FrozenSet[str]], Any]] = None
+
+    @property
+    def problem(self) -> 'up.model.Problem':
+        '''The problem with the current initial values and goals; it must not be modified.'''
+        return self._problem
+
+    def _goal_facts(self, goals: Iterable['up.model.FNode']) -> FrozenSet[str]:
+        facts = set()
+        stack = list(goals)
+        while stack:
+            x = stack.pop()
+            if x.is_fluent_exp():
+                facts.add(_fact(x))
+            elif x.is_and():
+                stack.extend(x.args)
+            else:
+                raise UPUnsupportedProblemTypeError(f'The problem: {self._problem.name} has expression: {x} into his goals.\nPyperplan does not support that operand.')
+        return frozenset(facts)
+
+    def _update(self, initial_values: Dict['up.model.FNode', Union['up.model.FNode', bool]],
+                goals: Optional[Iterable['up.model.FNode']]):
+        '''Updates the problem and the facts of the session with the given initial values and goals.'''
+        em = self._problem.environment.expression_manager
+        for fluent_exp, value_exp in initial_values.items():
+            fluent, value = em.auto_promote(fluent_exp, value_exp)
+            if not value.is_bool_constant():
+                raise UPUnsupportedProblemTypeError(f"Initial value: {value} of fluent: {fluent} is not True or False.")
+            self._problem.set_initial_value(fluent, value)
+            fact = _fact(fluent)
+            if fluent.fluent().name in self._statics and (fact in self._init) != value.bool_constant_value():
+                self._operators = None
+            if value.bool_constant_value():
+                self._init.add(fact)
+            else:
+                self._init.discard(fact)
+        if goals is not None:
+            goals = list(goals)
+            new_goals = self._goal_facts(goals)
+            self._problem.clear_goals()
+            for g in goals:
+                self._problem.add_goal(g)
+            self._goals = new_goals
+
+    def _task(self, monitor: SearchMonitor) -> Task:
+        '''Returns the grounded task of the current initial state and goals, grounding the problem only if needed.'''
+        if self._operators is None:
+            with monitor.phase('grounding'):
+                key = domain_key(self._problem) if self._engine.grounding_cache is not None else None
+                prob = self._engine._convert(self._problem, key)
+                self._statics = set(grounding._get_statics(prob.domain.predicates.values(), prob.domain.actions.values()))
+                self._operators, self._operators_facts = ground_operators(prob)
+                self._relevant = None
+        init = frozenset(self._init)
+        if self._relevant is None or self._relevant[0] != self._goals:
+            with monitor.phase('grounding'):
+                task = relevant_task(self._problem.name, self._operators, self._operators_facts, init, self._goals)
+            self._relevant = (self._goals, task)
+        else:
+            # the operators of the relevance analysis only depend on the goals
+            relevant = self._relevant[1]
+            task = Task(relevant.name, relevant.facts, init & relevant.facts, relevant.goals, relevant.operators)
+        return self._engine._monitored_prune(task, monitor)
+
+    def _build_heuristic(self, task: Task, search: str, heuristic_name: Optional[str]):
+        '''Returns the heuristic heuristic_name, used by search, for task, reusing the last one if it does not
+        depend on what changed.'''
+        engine = self._engine
+        init_independent = heuristic_name in INIT_INDEPENDENT_HEURISTICS and engine._lgg == {}
+        init = None if init_independent else task.initial_state
+        # the "auto" search can choose another search and heuristic at every call
+        configuration = (search, heuristic_name)
+        if self._heuristic is not None:
+            h_configuration, operators, goals, h_init, h = self._heuristic
+            if h_configuration == configuration and operators is task.operators and goals == task.goals and h_init == init:
+                return h
+        h = engine._build_heuristic(task, search, heuristic_name)
+        self._heuristic = (configuration, task.operators, task.goals, init, h)
+        return h
+
+    def replan(self, initial_values: Optional[Dict['up.model.FNode', Union['up.model.FNode', bool]]] = None,
+               goals: Optional[Iterable['up.model.FNode']] = None,
+               timeout: Optional[float] = None) -> 'up.engines.results.PlanGenerationResult':
+        '''Updates the initial values of the given fluents and, if given, replaces the goals, then
+        solves the problem with the engine of the session, like its solve method.'''
+        engine = self._engine
+        monitor = engine._monitor(timeout)
+        try:
+            with monitor:
+                with monitor.phase('conversion'):
+                    self._update(initial_values or {}, goals)
+                start = time.time()
+                task = self._task(monitor)
+                solution, unsolvable_proven, winner, optimal = engine._search_grounded(self._problem, task, monitor, self._build_heuristic)
+        except SearchTimeout:
+            return engine._interrupted_result(PlanGenerationResultStatus.TIMEOUT, monitor)
+        except (SearchMemout, MemoryError):
+            monitor.counters.setdefault("limit_reached", "memory_limit")
+            return engine._interrupted_result(PlanGenerationResultStatus.MEMOUT, monitor)
+        except PortfolioWorkerError as e:
+            monitor.counters["error"] = str(e)
+            return engine._interrupted_result(PlanGenerationResultStatus.INTERNAL_ERROR, monitor)
+        return engine._plan_result(self._problem, self._operators_table, solution, unsolvable_proven, winner, monitor,
+                                   time.time() - start, optimal)
@@ -0,0 +1,311 @@
+# Copyright 2021 AIPlan4EU project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+NumPy implementations of the delete-relaxation heuristics hAdd, hMax and hFF.
+
+The grounded task is compiled once into CSR arrays (the preconditions and the add
+effects of every operator), then the relaxed costs of the facts are computed with
+array operations instead of a per-fact Dijkstra search in Python. The heuristic values
+are the same of the pyperplan implementations in pyperplan.heuristics.relaxation.
+"""
+
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+import pyperplan # type: ignore
+from pyperplan.heuristics.heuristic_base import Heuristic # type: ignore
+from pyperplan.search.searchspace import SearchNode # type: ignore
+import unified_planning as up
+
+try:
+    import numpy as np # type: ignore
+except ImportError:
+    np = None
+
+
+State = Union[int, FrozenSet[str], Set[str]]
+
+
+class _VectorizedRelaxationHeuristic(Heuristic):
+    """
+    Base class of the vectorized relaxation heuristics.
+
+    The states can be sets of fact names or the integer bitmasks of a BitsetTask built on
+    the same task; the fact ids are the positions of the facts in sorted(task.facts) in both.
+    """
+
+    # name of the numpy ufunc that aggregates the costs of the preconditions
+    _aggregate_name = 'add'
+
+    def __init__(self, task: 'pyperplan.task.Task'):
+        if np is None:
+            raise up.exceptions.UPUsageError('The vectorized heuristics require numpy, which is not installed!')
+        self._aggregate = getattr(np, self._aggregate_name)
+        self.goals = task.goals
+        self.fact_names: List[str] = sorted(task.facts)
+        self.fact_ids: Dict[str, int] = {f: i for i, f in enumerate(self.fact_names)}
+        self.operators = task.operators
+        n_facts = len(self.fact_names)
+        n_ops = len(task.operators)
+        self._n_facts = n_facts
+        self._goal_ids = np.array([self.fact_ids[g] for g in task.goals], dtype=np.int64)
+
+        # preconditions in CSR format, with the position of the operator in the list of the
+        # operators that have the same precondition (the pyperplan precondition_of lists)
+        pre_ptr = [0]
+        pre_idx: List[int] = []
+        pre_pos: List[int] = []
+        precondition_of_len = [0] * n_facts
+        no_pre_ops: List[int] = []
+        for i, op in enumerate(task.operators):
+            if not op.preconditions:
+                no_pre_ops.append(i)
+            for p in op.preconditions:
+                fid = self.fact_ids[p]
+                pre_idx.append(fid)
+                pre_pos.append(precondition_of_len[fid])
+                precondition_of_len[fid] += 1
+            pre_ptr.append(len(pre_idx))
+        self._pre_ptr = np.array(pre_ptr, dtype=np.int64)
+        self._pre_idx = np.array(pre_idx, dtype=np.int64)
+        self._pre_pos = np.array(pre_pos, dtype=np.int64)
+        self._pre_count = np.diff(self._pre_ptr)
+        self._pre_op = np.repeat(np.arange(n_ops, dtype=np.int64), self._pre_count)
+        self._with_pre = np.nonzero(self._pre_count)[0]
+        self._no_pre = np.array(no_pre_ops, dtype=np.int64)
+
+        # preconditions grouped by fact (CSC), to find the operators that use a fact
+        order = np.argsort(self._pre_idx, kind='stable')
+        self._csc_op = self._pre_op[order]
+        self._csc_ptr = np.zeros(n_facts + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._pre_idx, minlength=n_facts), out=self._csc_ptr[1:])
+
+        # add effects in CSR format, in the iteration order of the frozensets of the operators
+        add_ptr: List[int] = [0]
+        add_idx: List[int] = []
+        add_pos: List[int] = []
+        for op in task.operators:
+            for j, a in enumerate(op.add_effects):
+                add_idx.append(self.fact_ids[a])
+                add_pos.append(j)
+            add_ptr.append(len(add_idx))
+        self._add_ptr = np.array(add_ptr, dtype=np.int64)
+        self._add_idx = np.array(add_idx, dtype=np.int64)
+        self._add_pos = np.array(add_pos, dtype=np.int64)
+        self._add_op = np.repeat(np.arange(n_ops, dtype=np.int64), np.diff(self._add_ptr))
+
+        # add effects grouped by fact, for the min over the achievers of every fact
+        order = np.argsort(self._add_idx, kind='stable')
+        self._achiever_op = self._add_op[order]
+        achieved = self._add_idx[order]
+        self._achieved_facts, self._achiever_starts = np.unique(achieved, return_index=True)
+
+        # multipliers to build the integer keys that sort the events like the pyperplan Dijkstra search
+        self._pos_base = max(precondition_of_len + [len(no_pre_ops), 0]) + 1
+        self._add_base = max([len(op.add_effects) for op in task.operators] + [0]) + 1
+
+    def __call__(self, node: SearchNode):
+        return self.evaluate([node.state])[0]
+
+    def evaluate(self, states: Iterable[State]) -> List[Union[int, float]]:
+        '''Returns the heuristic values of all the given states, computed together.'''
+        states = list(states)
+        if not states:
+            return []
+        matrix = np.zeros((len(states), self._n_facts), dtype=bool)
+        for row, state in enumerate(states):
+            matrix[row, self._state_ids(state)] = True
+        distances = self._distances(matrix)
+        if self._goal_ids.size == 0:
+            return [0] * len(states)
+        goal_values = self._aggregate.reduce(distances[:, self._goal_ids], axis=1)
+        return [_to_value(v) for v in goal_values]
+
+    def _state_ids(self, state: State) -> 'np.ndarray':
+        if isinstance(state, int):
+            n_bytes = (self._n_facts + 7) // 8
+            bits = np.unpackbits(np.frombuffer(state.to_bytes(n_bytes, 'little'), dtype=np.uint8), bitorder='little')
+            return np.nonzero(bits[:self._n_facts])[0]
+        return np.array([self.fact_ids[f] for f in set(state)], dtype=np.int64)
+
+    def _distances(self, matrix: 'np.ndarray') -> 'np.ndarray':
+        '''Computes the relaxed costs of all the facts for every row of the boolean state matrix,
+        iterating the Bellman equations until the fixpoint; with positive operator costs it is
+        the same fixpoint reached by the pyperplan Dijkstra search.'''
+        distances = np.where(matrix, 0.0, np.inf)
+        costs = np.ones((matrix.shape[0], len(self.operators)))
+        while True:
+            if self._with_pre.size > 0:
+                pre_costs = self._aggregate.reduceat(distances[:, self._pre_idx], self._pre_ptr[self._with_pre], axis=1)
+                costs[:, self._with_pre] = pre_costs + 1
+            if self._achieved_facts.size == 0:
+                return distances
+            best = np.minimum.reduceat(costs[:, self._achiever_op], self._achiever_starts, axis=1)
+            updated = np.minimum(distances[:, self._achieved_facts], best)
+            if np.array_equal(updated, distances[:, self._achieved_facts]):
+                return distances
+            distances[:, self._achieved_facts] = updated
+
+
+def _gather(ptr: 'np.ndarray', ids: 'np.ndarray') -> 'np.ndarray':
+    '''Returns the concatenation of the ranges ptr[i]:ptr[i + 1] of all the ids.'''
+    starts = ptr[ids]
+    lengths = ptr[ids + 1] - starts
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+def _to_value(value: float) -> Union[int, float]:
+    '''The pyperplan heuristics return ints, or float("inf") for the dead ends.'''
+    return int(value) if value != np.inf else float('inf')
+
+
+class hAddVectorizedHeuristic(_VectorizedRelaxationHeuristic):
+    """Vectorized version of the pyperplan hAdd heuristic."""
+
+    # hAdd does not depend on the order of the facts, so it can work on BitsetTask states
+    accepts_bitset_states = True
+
+
+class hMaxVectorizedHeuristic(_VectorizedRelaxationHeuristic):
+    """Vectorized version of the pyperplan hMax heuristic."""
+
+    accepts_bitset_states = True
+
+    _aggregate_name = 'maximum'
+
+
+class hFFVectorizedHeuristic(_VectorizedRelaxationHeuristic):
+    """
+    Vectorized version of the pyperplan hFF heuristic.
+
+    The relaxed plan depends on the achiever chosen by the pyperplan Dijkstra search for every fact,
+    that is the first operator applied with the cheapest cost. To choose the same one, the facts are
+    finalized one cost level at a time and every operator application gets an integer key that
+    sorts it like the pyperplan priority queue does: by the position in the queue of the last
+    precondition popped, then by the position of the operator in the list of the operators that
+    have that precondition, then by the position of the fact in the add effects of the operator.
+    Since the first facts pushed are the ones of the state, in the iteration order of set(state),
+    the values are the same only for states given as sets of facts. The relaxed plans are extracted
+    one state at a time, so the vectorized_heuristics option of the engine keeps the pure hff.
+    """
+
+    def evaluate(self, states: Iterable[State]) -> List[Union[int, float]]:
+        return [self._relaxed_plan(state)[0] for state in states]
+
+    def calc_h_with_plan(self, node: SearchNode) -> Tuple[Union[int, float], Optional[Set[str]]]:
+        h, plan = self._relaxed_plan(node.state)
+        if plan is None:
+            return (h, None)
+        return (h, {self.operators[o].name for o in plan})
+
+    def _relaxed_plan(self, state: State) -> Tuple[Union[int, float], Optional[Set[int]]]:
+        n_ops = len(self.operators)
+        state_ids = self._state_ids(state)
+        distances = np.full(self._n_facts, np.inf)
+        distances[state_ids] = 0
+        finalized = np.zeros(self._n_facts, dtype=bool)
+        finalized[state_ids] = True
+        # position in which the facts are popped from the queue, the start fact is popped at 0
+        popped = np.full(self._n_facts, -1, dtype=np.int64)
+        popped[state_ids] = np.arange(1, state_ids.size + 1)
+        next_popped = state_ids.size + 1
+        best_cost = np.full(self._n_facts, np.inf)
+        best_key = np.full(self._n_facts, np.iinfo(np.int64).max, dtype=np.int64)
+        achiever = np.full(self._n_facts, -1, dtype=np.int64)
+        remaining = self._pre_count.copy()
+        goals_left = int(np.count_nonzero(~finalized[self._goal_ids]))
+
+        # the operators without preconditions are applied when the start fact is popped
+        self._apply(self._no_pre, np.arange(self._no_pre.size, dtype=np.int64), np.ones(self._no_pre.size),
+                    finalized, best_cost, best_key, achiever)
+        newly = state_ids
+        while goals_left > 0:
+            # the operators whose last precondition has just been popped are applied
+            if newly.size > 0:
+                users = self._csc_op[_gather(self._csc_ptr, newly)]
+                np.subtract.at(remaining, users, 1)
+                fired = np.unique(users[remaining[users] == 0])
+                if fired.size > 0:
+                    entries = _gather(self._pre_ptr, fired)
+                    counts = self._pre_count[fired]
+                    segments = np.concatenate(([0], np.cumsum(counts)[:-1]))
+                    owners = np.repeat(np.arange(fired.size), counts)
+                    entry_popped = popped[self._pre_idx[entries]]
+                    last_popped = np.maximum.reduceat(entry_popped, segments)
+                    is_last = entry_popped == last_popped[owners]
+                    keys = np.empty(fired.size, dtype=np.int64)
+                    keys[owners[is_last]] = last_popped[owners[is_last]] * self._pos_base + self._pre_pos[entries[is_last]]
+                    costs = np.add.reduceat(distances[self._pre_idx[entries]], segments) + 1
+                    self._apply(fired, keys, costs, finalized, best_cost, best_key, achiever)
+            # the facts with the next cost are popped, in the order they were pushed
+            open_costs = np.where(finalized, np.inf, best_cost)
+            level = open_costs.min() if open_costs.size > 0 else np.inf
+            if level == np.inf:
+                break
+            newly = np.nonzero(open_costs == level)[0]
+            newly = newly[np.argsort(best_key[newly], kind='stable')]
+            finalized[newly] = True
+            distances[newly] = level
+            popped[newly] = np.arange(next_popped, next_popped + newly.size)
+            next_popped += newly.size
+            goals_left = int(np.count_nonzero(~finalized[self._goal_ids]))
+
+        if goals_left > 0:
+            return (float('inf'), None)
+        relaxed_plan: Set[int] = set()
+        closed = set(int(g) for g in self._goal_ids)
+        queue = list(closed)
+        while queue:
+            o = int(achiever[queue.pop()])
+            if o >= 0 and o not in relaxed_plan:
+                for p in self._pre_idx[self._pre_ptr[o]:self._pre_ptr[o + 1]]:
+                    if p not in closed:
+                        closed.add(int(p))
+                        queue.append(int(p))
+                relaxed_plan.add(o)
+        return (len(relaxed_plan), relaxed_plan)
+
+    def _apply(self, ops: 'np.ndarray', keys: 'np.ndarray', costs: 'np.ndarray', finalized: 'np.ndarray',
+               best_cost: 'np.ndarray', best_key: 'np.ndarray', achiever: 'np.ndarray'):
+        '''Applies the given operators, with their keys and costs, pushing the add effects that improve the
+        cost of a fact that is not popped yet; among equal costs the first push, with the lowest key, wins.'''
+        if ops.size == 0:
+            return
+        entries = _gather(self._add_ptr, ops)
+        if entries.size == 0:
+            return
+        position = np.repeat(np.arange(ops.size), self._add_ptr[ops + 1] - self._add_ptr[ops])
+        facts = self._add_idx[entries]
+        entry_costs = costs[position]
+        entry_keys = keys[position] * self._add_base + self._add_pos[entries]
+        valid = ~finalized[facts]
+        facts, entry_costs, entry_keys, entry_ops = facts[valid], entry_costs[valid], entry_keys[valid], self._add_op[entries][valid]
+        if facts.size == 0:
+            return
+        order = np.lexsort((entry_keys, entry_costs, facts))
+        facts, entry_costs, entry_keys, entry_ops = facts[order], entry_costs[order], entry_keys[order], entry_ops[order]
+        first = np.ones(facts.size, dtype=bool)
+        first[1:] = facts[1:] != facts[:-1]
+        facts, entry_costs, entry_keys, entry_ops = facts[first], entry_costs[first], entry_keys[first], entry_ops[first]
+        better = (entry_costs < best_cost[facts]) | ((entry_costs == best_cost[facts]) & (entry_keys < best_key[facts]))
+        facts = facts[better]
+        best_cost[facts] = entry_costs[better]
+        best_key[facts] = entry_keys[better]
+        achiever[facts] = entry_ops[better]
+
+
+VECTORIZED_HEURISTICS = {"hadd": hAddVectorizedHeuristic,
+                         "hmax": hMaxVectorizedHeuristic,
+                         "hff": hFFVectorizedHeuristic}